@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the peak memory of FileInfo objects with the former implementation.
+
+Synthetic files in a realistic folder structure are created as FileInfo
+objects, as an environment or the evidence walker does, and kept alive in a
+list. The peak is measured with tracemalloc (Python 3.4 or later).
+
+Usage: python benchmarks/bench_file_info_memory.py [--files 1000000]
+
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from swid_generator.package_info import FileInfo  # noqa: E402
+
+
+class LegacyFileInfo(object):
+    """
+    The former FileInfo: a dict per object, the full path and its components stored eagerly.
+    """
+    def __init__(self, path, actual_path=True):
+        self.name = (os.path.split(path)[1]).strip()
+        self.location = (os.path.split(path)[0]).strip()
+        self.mutable = False
+        self.package_digests = None
+        self.package_stat = None
+        self.full_pathname = '/'.join((self.location, self.name))
+
+        splitted_location = self.full_pathname.split('/')
+        self.full_pathname_splitted = splitted_location[1:]
+
+        if actual_path:
+            self.actual_full_pathname = self.full_pathname
+            self.size = str(os.path.getsize(self.full_pathname))
+        else:
+            self.actual_full_pathname = ""
+
+
+def legacy_file_info(path):
+    # The synthetic files don't exist, the size is set as os.path.getsize would have
+    file_info = LegacyFileInfo(path, actual_path=False)
+    file_info.actual_full_pathname = file_info.full_pathname
+    file_info.size = '4096'
+    return file_info
+
+
+def file_info(path):
+    return FileInfo(path, size='4096')
+
+
+def create_paths(count, seed=1):
+    rng = random.Random(seed)
+    folders = ['/usr']
+    for index in range(count):
+        # Mostly reuse existing folders, sometimes descend into a new sub folder
+        folder = rng.choice(folders)
+        if folder.count('/') < 10 and rng.random() < 0.05:
+            folder = '%s/dir%d' % (folder, rng.randint(0, 20))
+            folders.append(folder)
+        # The paths are read one by one from a package database or a directory listing
+        yield '%s/file%d.so' % (folder, index)
+
+
+def measure(factory, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    files = [factory(path) for path in create_paths(count)]
+    elapsed = time.time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del files
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000000)
+    options = parser.parse_args()
+
+    print('%d files' % options.files)
+    for label, factory in (('legacy', legacy_file_info), ('slots', file_info)):
+        elapsed, peak = measure(factory, options.files)
+        print('%-7s peak %7.1f MB, %.2f s' % (label + ':', peak / 1024 / 1024, elapsed))
+
+
+if __name__ == '__main__':
+    main()
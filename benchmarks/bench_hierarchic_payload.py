@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the hierarchic payload builder with the former recursive implementation.
+
+Both build the Directory/File events of a synthetic package and must produce
+the same document. Hashing is left out, only the tree construction is measured.
+
+Usage: python benchmarks/bench_hierarchic_payload.py [--files 100000] [--depth 12]
+
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import groupby
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from swid_generator.generators.content_creator import hierarchic_content_events, _file_attributes  # noqa: E402
+from swid_generator.generators.xml_writer import START, END  # noqa: E402
+from swid_generator.package_info import PackageInfo  # noqa: E402
+
+
+class SyntheticFile(object):
+    def __init__(self, location, name):
+        self.location = location
+        self.name = name
+        self.mutable = False
+        self.size = '0'
+
+
+class NoHashEngine(object):
+    def hash_files(self, files):
+        return ({} for _ in files)
+
+
+def legacy_hierarchic_content_events(package_info):
+    """
+    The recursive implementation: one sort, groupby and list copy per folder level.
+    """
+    for file in package_info.files:
+        splitted_location = file.location.split('/')
+        splitted_location.append(file.name)
+
+        file.fullpathname_splitted = splitted_location[0:len(splitted_location)]
+
+    structure = []
+
+    def _file_hierarchy(filelist, top_level=False):
+        filelist.sort(key=_keyfunc)
+
+        for head, tail_of_file_iterator in groupby(filelist, _keyfunc):
+            if top_level:
+                structure.append((START, 'Directory', [('root', head)]))
+            else:
+                structure.append((START, 'Directory', [('name', head)]))
+            sub_files = list()
+            for file_info in tail_of_file_iterator:
+
+                if len(file_info.fullpathname_splitted) == 2:
+                    structure.append(file_info)
+                else:
+                    del file_info.fullpathname_splitted[0]
+                    sub_files.append(file_info)
+            if len(sub_files) > 0:
+                _file_hierarchy(sub_files)
+            structure.append((END, 'Directory'))
+
+    def _keyfunc(obj):
+        return obj.fullpathname_splitted[0]
+
+    _file_hierarchy(package_info.files, top_level=True)
+
+    for item in structure:
+        if isinstance(item, tuple):
+            yield item
+        else:
+            yield (START, 'File', _file_attributes(item, item.fullpathname_splitted[1], {}))
+            yield (END, 'File')
+
+
+def create_files(count, max_depth, seed=1):
+    rng = random.Random(seed)
+    folders = ['']
+    files = []
+    for index in range(count):
+        # Mostly reuse existing folders, sometimes descend into a new sub folder
+        folder = rng.choice(folders)
+        if folder.count('/') < max_depth and rng.random() < 0.2:
+            folder = '%s/dir%d' % (folder, rng.randint(0, 20))
+            folders.append(folder)
+        files.append(SyntheticFile(folder, 'file%d' % index))
+    return files
+
+
+def measure(function, files):
+    package_info = PackageInfo('synthetic', '1.0', list(files))
+    start = time.time()
+    events = list(function(package_info))
+    return time.time() - start, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--depth', type=int, default=12)
+    options = parser.parse_args()
+
+    files = create_files(options.files, options.depth)
+
+    legacy_time, legacy_events = measure(legacy_hierarchic_content_events, files)
+    trie_time, trie_events = measure(lambda package_info: hierarchic_content_events(package_info, 'sha256', NoHashEngine()),
+                                     files)
+
+    if legacy_events != trie_events:
+        print('Error: the implementations produce different documents')
+        sys.exit(1)
+
+    print('%d files, up to %d levels, %d events' % (options.files, options.depth, len(trie_events)))
+    print('recursive: %.3f s' % legacy_time)
+    print('trie:      %.3f s' % trie_time)
+
+
+if __name__ == '__main__':
+    main()
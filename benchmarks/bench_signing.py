@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare the throughput of the in-process signer with one xmlsec1 call per SWID tag.
+
+Both sign the same SWID tag (tests/dumps/signature/unsigned_tag.xml) repeatedly.
+The xmlsec1 path is skipped if xmlsec1 is not installed.
+
+Usage: python benchmarks/bench_signing.py [--tags 200] [--pkcs12 FILE] [--pkcs12-pwd PASSWORD]
+
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import argparse
+import os
+import sys
+import time
+from distutils.spawn import find_executable
+from glob import glob
+from shutil import rmtree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from swid_generator.print_functions import sign_xml  # noqa: E402
+from swid_generator.signer import XmlSigner, is_available  # noqa: E402
+
+
+def measure(signature_args, swid_tag, count):
+    start = time.time()
+    for _ in range(count):
+        sign_xml(swid_tag, signature_args)
+    return count / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tags', type=int, default=200)
+    parser.add_argument('--pkcs12', default='tests/dumps/swidgen.pfx')
+    parser.add_argument('--pkcs12-pwd', dest='password', default='Q1w2e3r4t5')
+    options = parser.parse_args()
+
+    with open('tests/dumps/signature/unsigned_tag.xml', 'rb') as unsigned_file:
+        swid_tag = unsigned_file.read()
+
+    signature_args = {
+        'pkcs12_file': options.pkcs12,
+        'pkcs12_password': options.password,
+        'signer': None
+    }
+
+    print('%d SWID tags of %d bytes' % (options.tags, len(swid_tag)))
+
+    if is_available():
+        start = time.time()
+        signature_args['signer'] = XmlSigner(options.pkcs12, options.password)
+        load_time = time.time() - start
+        print('in-process: %.1f tags/s (loading the key took %.3f s)' % (measure(signature_args, swid_tag, options.tags), load_time))
+        signature_args['signer'] = None
+    else:
+        print('in-process: skipped, lxml and cryptography are not installed')
+
+    if find_executable('xmlsec1'):
+        before = set(glob('/tmp/swid_*'))
+        print('xmlsec1:    %.1f tags/s' % measure(signature_args, swid_tag, options.tags))
+        for folder in set(glob('/tmp/swid_*')) - before:
+            rmtree(folder)
+    else:
+        print('xmlsec1:    skipped, xmlsec1 is not installed')
+
+
+if __name__ == '__main__':
+    main()
@@ -18,6 +18,10 @@ setup(name='swid_generator',
       license=meta.license,
       keywords='swid dpkg rpm pacman tnc',
       long_description=readme,
+      extras_require={
+          'sign': ['lxml', 'cryptography'],
+          'zstd': ['zstandard'],
+      },
       entry_points={
           'console_scripts': [
               '%s = swid_generator.main:main' % meta.title,
@@ -5,8 +5,10 @@ from argparse import ArgumentParser
 
 from . import settings, meta
 from .generators.swid_generator import all_matcher
-from swid_generator.argparser_helper import entity_name_string, regid_string, hash_string, os_string, arch_string
+from swid_generator.argparser_helper import entity_name_string, regid_string, hash_string, os_string, arch_string, positive_number
+from swid_generator.argparser_helper import non_negative_number
 from swid_generator.argparser_helper import RequirementCheckAction, TargetAction, package_path, certificate_path
+from swid_generator.argparser_helper import folder_path
 
 
 class MainArgumentParser(object):
@@ -65,6 +67,27 @@ class MainArgumentParser(object):
                                  help='Define the algorithm for the file hashes ("sha256", "sha384", "sha512"). '
                                  'Multiple hashes can be added with comma separated. ("sha256,sha384") '
                                  'Default is "%s"' % settings.DEFAULT_HASH_ALGORITHM)
+        swid_parser.add_argument('--jobs', dest='jobs', type=positive_number, default=settings.DEFAULT_JOBS,
+                                 help='The number of files which are hashed in parallel. With --package-dir or '
+                                      '--package-file-list, the number of package files which are processed in '
+                                      'parallel worker processes. Default is %d.' % settings.DEFAULT_JOBS)
+        swid_parser.add_argument('--hash-cache', dest='hash_cache', metavar='PATH', nargs='?',
+                                 const=settings.DEFAULT_HASH_CACHE, default=None,
+                                 help='Cache the file hashes between runs. Files are only hashed again if their '
+                                      'device, inode, size or modification time changed. '
+                                      'Default path is "%s".' % settings.DEFAULT_HASH_CACHE)
+        swid_parser.add_argument('--hash-cache-size', dest='hash_cache_size', type=positive_number,
+                                 default=settings.DEFAULT_HASH_CACHE_SIZE,
+                                 help='The maximum number of files in the hash cache. The least recently used '
+                                      'files are evicted first. Default is %d.' % settings.DEFAULT_HASH_CACHE_SIZE)
+        swid_parser.add_argument('--cache-stats', dest='cache_stats', action='store_true', default=False,
+                                 help='Print the hits and misses of --hash-cache and --package-tag-cache to stderr.')
+        swid_parser.add_argument('--package-digests', dest='package_digests', choices=['verify', 'trust'], default=None,
+                                 help='Take the file hashes of installed packages from the package database (rpm, pacman) '
+                                      'instead of reading the files, if it records the requested algorithm. '
+                                      'With "verify", size and modification time of the file must still match '
+                                      'the package database, otherwise the file is hashed. With --package-file, "trust" '
+                                      'takes the SHA256 hashes from the .MTREE of a pacman package.')
         swid_parser.add_argument('--pkcs12', dest='pkcs12', type=certificate_path,
                                  action=RequirementCheckAction,
                                  const=environment_registry,
@@ -72,6 +95,10 @@ class MainArgumentParser(object):
         swid_parser.add_argument('--pkcs12-pwd', dest='password',
                                  help='If the PKCS#12 file is password protected, '
                                       'the password needs to be provided.')
+        swid_parser.add_argument('--temp-dir', dest='temp_dir', metavar='PATH', type=folder_path, default=None,
+                                 help='The folder for temporary files, e.g. a tmpfs like /dev/shm. Every run uses '
+                                      'its own subfolder, which is removed at the end of the run. '
+                                      'Default is $TMPDIR or /tmp.')
 
         swid_parser.set_defaults(matcher=all_matcher)
 
@@ -90,6 +117,7 @@ class MainArgumentParser(object):
                                     'A Software-ID is made up as follows: "{regid}__{unique-id}". '
                                     'Example: '
                                     '"strongswan.org__Ubuntu_12.04-i686-strongswan-4.5.2-1.2". '
+                                    'May be given several times. '
                                     'If no matching package is found, the output is empty and the '
                                     'exit code is set to 1.')
         mutually_group.add_argument('--package', dest='package_name', metavar='PACKAGE',
@@ -97,15 +125,38 @@ class MainArgumentParser(object):
                                     help='Do a targeted request for the specified package name. '
                                          'The package name corresponds to a package name returned by the '
                                          'environment\'s package manager, e.g "glibc-headers" on a '
-                                         'dpkg managed environment. '
+                                         'dpkg managed environment. The packages are queried directly. '
+                                         'May be given several times. '
                                          'If no matching package is found, the output is empty and the '
                                          'exit code is set to 1.')
+        mutually_group.add_argument('--targets-from', dest='targets_from', metavar='FILE',
+                                    help='Do a targeted request for every package name or Software-ID listed in '
+                                         'FILE, one per line. "-" reads the list from stdin. The targets are matched '
+                                         'against a single package listing and the targets without a matching '
+                                         'package are reported on stderr. If no target matches, the output is '
+                                         'empty and the exit code is set to 1.')
         mutually_group.add_argument('--package-file', dest='file_path', type=package_path,
                                     action=RequirementCheckAction,
                                     const=environment_registry,
                                     help='Create SWID-Tag based on information of a Package-File. '
                                          'Rpm-Environment: *.rpm File, Dpkg-Environment: *.deb File, '
-                                         'Pacman-Environment: *.pgk.tar.xz File')
+                                         'Pacman-Environment: *.pkg.tar.xz or *.pkg.tar.zst File')
+        mutually_group.add_argument('--package-dir', dest='package_dir', metavar='PATH', type=folder_path,
+                                    help='Create a SWID tag for every package file (*.deb, *.rpm, *.pkg.tar.xz, '
+                                         '*.pkg.tar.zst) below the folder, e.g. the pool of a repository mirror. '
+                                         'The tags are written in the order of the sorted paths.')
+        mutually_group.add_argument('--package-file-list', dest='package_file_list', metavar='FILE',
+                                    help='Create a SWID tag for every package file listed in FILE, one path per '
+                                         'line, in the order of the list. "-" reads the list from stdin.')
+        targeted_group.add_argument('--package-tag-cache', dest='package_tag_cache', metavar='PATH', nargs='?',
+                                    const=settings.DEFAULT_PACKAGE_TAG_CACHE, default=None,
+                                    help='Cache the SWID tags of --package-dir and --package-file-list by the '
+                                         'checksum of the package file, so that a rerun only processes new packages. '
+                                         'Default path is "%s".' % settings.DEFAULT_PACKAGE_TAG_CACHE)
+        targeted_group.add_argument('--package-tag-cache-size', dest='package_tag_cache_size', type=positive_number,
+                                    default=settings.DEFAULT_PACKAGE_TAG_CACHE_SIZE,
+                                    help='The maximum number of SWID tags in the package tag cache. The least recently '
+                                         'used tags are evicted first. Default is %d.' % settings.DEFAULT_PACKAGE_TAG_CACHE_SIZE)
         targeted_group.add_argument('--evidence', dest='evidence_path', metavar='PATH',
                                     help='Create a SWID Tag from a directory on the filesystem. '
                                          'This changes the payload element to an evidence element.')
@@ -119,12 +170,116 @@ class MainArgumentParser(object):
                                     default=None,
                                     help='Change the displayed "root"-folder from the provided directory to '
                                          'a different path.')
+        targeted_group.add_argument('--exclude', dest='exclude', metavar='PATTERN', action='append', default=[],
+                                    help='Skip files and directories matching the glob PATTERN with --evidence. '
+                                         'Patterns without "/" match names, patterns with "/" match the path '
+                                         'relative to the evidence folder. May be given multiple times.')
+        targeted_group.add_argument('--max-depth', dest='max_depth', metavar='N', type=non_negative_number, default=None,
+                                    help='Descend at most N directory levels below the evidence folder.')
+        targeted_group.add_argument('--one-file-system', dest='one_file_system', action='store_true', default=False,
+                                    help='Skip directories on other file systems than the evidence folder.')
+        targeted_group.add_argument('--evidence-stats', dest='evidence_stats', action='store_true', default=False,
+                                    help='Print the number of files and directories walked for --evidence, '
+                                         'per second, to stderr.')
+
+        incremental_group = swid_parser.add_argument_group(
+            title='incremental inventory',
+            description='Record the generated SWID tags of all installed packages in a state file and '
+                        'compare the installed packages against it in the next run.')
+        incremental_group.add_argument('--since-state', dest='since_state', metavar='FILE', default=None,
+                                       help='Read the state of the previous run from FILE (if it exists) and '
+                                            'write the state of this run to it.')
+        incremental_group.add_argument('--changed-only', dest='changed_only', action='store_true', default=False,
+                                       help='Only output the SWID tags of packages which were added or upgraded '
+                                            'since the previous run. Requires --since-state. '
+                                            'An empty output sets the exit code to 0.')
+        incremental_group.add_argument('--removed-list', dest='removed_list', metavar='FILE', default=None,
+                                       help='Write the packages of the previous run which are no longer installed '
+                                            '(or were upgraded) as JSON list to FILE. Requires --since-state.')
+
         # Subparser for software-id command
         subparsers.add_parser('software-id', help='Software id output', parents=[parent_parser],
                               description='Generate Software-IDs.')
 
+        # Subparser for daemon command
+        daemon_parser = subparsers.add_parser('daemon', help='Serve requests over a Unix domain socket',
+                                              parents=[parent_parser],
+                                              description='Keep the package list, the file index and the generated SWID '
+                                                          'tags in memory and answer requests over a Unix domain socket. '
+                                                          'A request is one line with a JSON object, e.g. '
+                                                          '{"command": "swid", "package": "bash", "full": true}. The options '
+                                                          'below are the defaults of the requests.')
+        daemon_parser.add_argument('--socket', dest='socket', metavar='PATH', default=settings.DEFAULT_SOCKET,
+                                   help='The path of the Unix domain socket. Default is "%s".' % settings.DEFAULT_SOCKET)
+        daemon_parser.add_argument('--entity-name', dest='entity_name', type=entity_name_string,
+                                   default=entity_name_string(settings.DEFAULT_ENTITY_NAME),
+                                   help='The entity name used in the <Entity> XML tag. '
+                                        'Default is "%s".' % settings.DEFAULT_ENTITY_NAME)
+        daemon_parser.add_argument('--os', dest='os_string', type=os_string, default=None,
+                                   help='The OS string used in the tagId attribute. '
+                                        'Default is derived from the OS of the local host.')
+        daemon_parser.add_argument('--arch', dest='architecture', type=arch_string, default=None,
+                                   help='The HW architecture used in the tagId attribute. '
+                                        'Default is derived from the HW architecture of the local host.')
+        daemon_parser.add_argument('--full', action='store_true', default=False,
+                                   help='Dump the full SWID tags including directory/file tags for each package. '
+                                        'The file index is loaded at the start.')
+        daemon_parser.add_argument('--hash', dest='hash_algorithms', type=hash_string,
+                                   default=hash_string(settings.DEFAULT_HASH_ALGORITHM),
+                                   help='Define the algorithm for the file hashes. Default is "%s"' % settings.DEFAULT_HASH_ALGORITHM)
+        daemon_parser.add_argument('--jobs', dest='jobs', type=positive_number, default=settings.DEFAULT_JOBS,
+                                   help='The number of files which are hashed in parallel. '
+                                        'Default is %d.' % settings.DEFAULT_JOBS)
+        daemon_parser.add_argument('--hash-cache', dest='hash_cache', metavar='PATH', nargs='?',
+                                   const=settings.DEFAULT_HASH_CACHE, default=None,
+                                   help='Cache the file hashes in a SQLite database. '
+                                        'Default path is "%s".' % settings.DEFAULT_HASH_CACHE)
+        daemon_parser.add_argument('--hash-cache-size', dest='hash_cache_size', type=positive_number,
+                                   default=settings.DEFAULT_HASH_CACHE_SIZE,
+                                   help='The maximum number of files in the hash cache. '
+                                        'Default is %d.' % settings.DEFAULT_HASH_CACHE_SIZE)
+        daemon_parser.add_argument('--max-cached-tags', dest='max_cached_tags', type=positive_number,
+                                   default=settings.DEFAULT_MAX_CACHED_TAGS,
+                                   help='The maximum number of generated SWID tags kept in memory until the package '
+                                        'database changes. Default is %d.' % settings.DEFAULT_MAX_CACHED_TAGS)
+        daemon_parser.add_argument('--watch', dest='watch', choices=['auto', 'poll', 'off'], default='auto',
+                                   help='How modifications of the package database are detected in the background, '
+                                        'upon which the SWID tags of the modified packages are generated in advance. '
+                                        '"auto" uses inotify and falls back to polling. With "off" the database is '
+                                        'only checked when a request arrives. Default is "auto".')
+        daemon_parser.add_argument('--poll-interval', dest='poll_interval', metavar='SECONDS', type=positive_number,
+                                   default=settings.DEFAULT_POLL_INTERVAL,
+                                   help='The seconds between two checks of the package database when polling. '
+                                        'Default is %d.' % settings.DEFAULT_POLL_INTERVAL)
+
     def parse(self, arguments=None):
-        return self.arg_parser.parse_args(arguments)
+        options = self.arg_parser.parse_args(arguments)
+
+        if options.command == 'swid' and options.since_state is None:
+            if options.changed_only:
+                self.arg_parser.error('--changed-only requires --since-state')
+            if options.removed_list is not None:
+                self.arg_parser.error('--removed-list requires --since-state')
+
+        if options.command == 'swid' and options.evidence_path is None:
+            if options.exclude or options.max_depth is not None or options.one_file_system or options.evidence_stats:
+                self.arg_parser.error('--exclude, --max-depth, --one-file-system and --evidence-stats require --evidence')
+
+        if options.command == 'swid' and options.since_state is not None:
+            if options.file_path is not None or options.evidence_path is not None or options.version is not None:
+                self.arg_parser.error('--since-state can not be combined with --package-file, --evidence or --version-string')
+            if options.package_dir is not None or options.package_file_list is not None:
+                self.arg_parser.error('--since-state can not be combined with --package-dir or --package-file-list')
+
+        if options.command == 'swid' and options.package_dir is None and options.package_file_list is None:
+            if options.package_tag_cache is not None:
+                self.arg_parser.error('--package-tag-cache requires --package-dir or --package-file-list')
+
+        if options.command == 'swid' and options.cache_stats:
+            if options.hash_cache is None and options.package_tag_cache is None:
+                self.arg_parser.error('--cache-stats requires --hash-cache or --package-tag-cache')
+
+        return options
 
     def print_usage(self):
         self.arg_parser.print_usage()
@@ -6,16 +6,22 @@ import os
 from functools import partial
 from argparse import ArgumentTypeError, Action
 
-from .generators.swid_generator import software_id_matcher, package_name_matcher
+from .generators.swid_generator import targets_matcher
 from swid_generator.exceptions import RequirementsNotInstalledError
+from swid_generator.signer import is_available as signer_is_available
 
 
 class TargetAction(Action):
+    """
+    Collects the values of an option, which may be given several times, and sets the matcher for them.
+    """
     def __call__(self, parser, namespace, value, option_string=None):
+        values = (getattr(namespace, self.dest, None) or []) + [value]
+        setattr(namespace, self.dest, values)
         if option_string == '--software-id':
-            setattr(namespace, "matcher", partial(software_id_matcher, value=value))
+            setattr(namespace, "matcher", partial(targets_matcher, software_ids=frozenset(values)))
         elif option_string == '--package':
-            setattr(namespace, "matcher", partial(package_name_matcher, value=value))
+            setattr(namespace, "matcher", partial(targets_matcher, package_names=frozenset(values)))
 
 
 class RequirementCheckAction(Action):
@@ -27,7 +33,8 @@ class RequirementCheckAction(Action):
         try:
             if option_string == '--package-file':
                 actual_environment.check_requirements(package_file_execution=True)
-            if option_string == '--pkcs12':
+            # xmlsec1 is only needed if the tags can not be signed in-process
+            if option_string == '--pkcs12' and not signer_is_available():
                 actual_environment.check_requirements(sign_tag_execution=True)
             setattr(namespace, self.dest, values)
         except RequirementsNotInstalledError as e:
@@ -85,15 +92,41 @@ def arch_string(string):
         raise ArgumentTypeError("String '{0}' does not match required format".format(string))
 
 
+def positive_number(string):
+    try:
+        number = int(string)
+    except ValueError:
+        raise ArgumentTypeError("'{0}' is not a number".format(string))
+    if number < 1:
+        raise ArgumentTypeError("The number must be at least 1")
+    return number
+
+
+def non_negative_number(string):
+    try:
+        number = int(string)
+    except ValueError:
+        raise ArgumentTypeError("'{0}' is not a number".format(string))
+    if number < 0:
+        raise ArgumentTypeError("The number must not be negative")
+    return number
+
+
 def package_path(string=None):
     if not os.path.exists(string):
         raise ArgumentTypeError("The file '{0}' does not exist".format(string))
-    elif string.endswith('.deb') or string.endswith('.rpm') or string.endswith('.pkg.tar.xz'):
+    elif string.endswith(('.deb', '.rpm', '.pkg.tar.xz', '.pkg.tar.zst')):
         return string
     else:
         raise ArgumentTypeError("File '{0}' is not a valid Package.".format(string))
 
 
+def folder_path(string=None):
+    if not os.path.isdir(string):
+        raise ArgumentTypeError("The folder '{0}' does not exist".format(string))
+    return string
+
+
 def certificate_path(string=None):
     if not os.path.exists(string):
         raise ArgumentTypeError("The file '{0}' does not exist".format(string))
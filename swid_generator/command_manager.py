@@ -1,4 +1,5 @@
 
+import codecs
 import os
 import subprocess
 from .exceptions import CommandManagerError
@@ -46,6 +47,68 @@ class CommandManager(object):
         except BaseException as e:
             raise CommandManagerError(e)
 
+    @staticmethod
+    def run_command_records(command_argumentlist, separator='\n'):
+        """
+        Executes a command and yields its output record by record while the command is still running,
+        e.g. the lines of "pacman -Q". Records are split like ``output.split(separator)``, an empty
+        record after a trailing separator is dropped.
+        :param command_argumentlist: Command-Arguments
+        :param separator: The string between two records.
+        :return: Generator of the decoded records.
+        :raises CommandManagerError: If the command can not be executed or, after the last record,
+                                     if it returns a non-zero exit status.
+        """
+        try:
+            process = subprocess.Popen(command_argumentlist, stdout=subprocess.PIPE)
+        except BaseException as e:
+            raise CommandManagerError(e)
+
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        pending = ''
+        finished = False
+        try:
+            while True:
+                chunk = os.read(process.stdout.fileno(), 65536)
+                pending += decoder.decode(chunk, final=not chunk)
+                records = pending.split(separator)
+                pending = records.pop()
+                for record in records:
+                    yield record
+                if not chunk:
+                    break
+            if pending:
+                yield pending
+            finished = True
+        finally:
+            process.stdout.close()
+            if not finished and process.poll() is None:
+                # The records were not consumed to the end
+                process.kill()
+            return_code = process.wait()
+
+        if return_code != 0:
+            raise CommandManagerError('Command {0} returned non-zero exit status {1}'.format(command_argumentlist, return_code))
+
+    @staticmethod
+    def run_command_query_output(command_argumentlist):
+        """
+        Executes a query for several names, e.g. "rpm -q bash vim". Package managers fail if one of
+        the names is not installed, while the other names are still printed. Therefore the exit code
+        is not checked and the error output is discarded.
+        :param command_argumentlist: Command-Arguments
+        :return: Console-Output of the command.
+        """
+        with open(os.devnull, 'w') as devnull:
+            try:
+                process = subprocess.Popen(command_argumentlist, stdout=subprocess.PIPE, stderr=devnull)
+                output = process.communicate()[0]
+            except BaseException as e:
+                raise CommandManagerError(e)
+        if isinstance(output, bytes):
+            output = output.decode('utf-8')
+        return output
+
     @staticmethod
     def run_command_popen(command_argumentlist, stdout=None):
         """
@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import collections
+import errno
+import json
+import os
+import socket
+import sqlite3
+import stat
+import sys
+import threading
+from argparse import ArgumentTypeError
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+from .argparser_helper import arch_string, entity_name_string, hash_string, os_string, regid_string
+from .exceptions import CommandManagerError
+from .generators.swid_generator import all_matcher, create_swid_tags
+from .generators.utils import create_software_id, create_software_id_index, create_unique_id
+from .package_info import PackageInfo
+
+
+def boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError('{0!r} is not a boolean'.format(value))
+    return value
+
+
+class InventoryService(object):
+    """
+    The inventory of the installed packages, kept warm in memory between requests.
+
+    The package list, the file index of the environment and the generated
+    SWID tags are kept in memory. Before every request the modification
+    times of the database paths of the environment are compared, which costs
+    a few stat calls. If the package database was modified, only the entries
+    of the installed, upgraded or removed packages are updated. Targeted
+    requests are answered from an index by package name and by Software-ID.
+
+    The environments are not thread-safe, every use of the service from
+    several threads must hold ``lock``.
+
+    """
+
+    # The keys of a request, which influence the content of the SWID tags, and their validation
+    tag_options = {
+        'regid': regid_string,
+        'entity_name': entity_name_string,
+        'os': os_string,
+        'arch': arch_string,
+        'hash': hash_string,
+        'full': boolean,
+        'pretty': boolean,
+        'hierarchic': boolean
+    }
+    request_keys = set(['command', 'package', 'software_id', 'doc_separator', 'package_digests']) | set(tag_options)
+
+    def __init__(self, environment, defaults, jobs=1, hash_cache=None, max_cached_tags=10000):
+        """
+        :param environment: The package manager environment.
+        :param defaults: Dictionary with the default ``tag_options``, ``package_digests`` and ``doc_separator``
+                         of requests. ``os`` and ``arch`` are derived from the environment if they are None.
+        :param jobs: Number of files which are hashed in parallel.
+        :param hash_cache: Optional HashCache()-Object, shared by all requests.
+        :param max_cached_tags: Maximum number of SWID tags kept in memory. The oldest tags are evicted first.
+        """
+        self.environment = environment
+        self.defaults = dict(defaults)
+        self.jobs = jobs
+        self.hash_cache = hash_cache
+        self.max_cached_tags = max_cached_tags
+        self._database_state = None
+        self._packages = None
+        self._packages_by_name = {}
+        self._software_ids = {}
+        self._tags = collections.OrderedDict()
+        # Installed or upgraded packages, whose SWID tags are not generated yet
+        self._outdated = collections.OrderedDict()
+        self.lock = threading.RLock()
+
+        if self.defaults.get('os') is None:
+            self.defaults['os'] = environment.get_os_string()
+        if self.defaults.get('arch') is None:
+            self.defaults['arch'] = environment.get_architecture()
+
+    def _get_database_state(self):
+        state = []
+        for path in self.environment.get_database_paths():
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                state.append(None)
+                continue
+            state.append((stat_result.st_ino, stat_result.st_size, stat_result.st_mtime))
+        return state
+
+    def refresh(self):
+        """
+        Drop everything kept in memory, it is loaded again on the next request.
+        """
+        self.environment.clear_cache()
+        self._packages = None
+        self._packages_by_name = {}
+        self._software_ids = {}
+        self._tags.clear()
+        self._outdated.clear()
+
+    def update(self):
+        """
+        Update the inventory after the package database was modified.
+
+        The package list is queried again and compared with the one in
+        memory. Only the file indexes and the SWID tags of the installed,
+        upgraded or removed packages are dropped.
+
+        :return: List of the installed or upgraded packages.
+        """
+        self._database_state = self._get_database_state()
+        if self._packages is None:
+            return []
+
+        self.environment.reload_package_list()
+        packages = list(self.environment.get_package_list())
+        previous_entries = set((p.package, p.version, p.status) for p in self._packages)
+        entries = set((p.package, p.version, p.status) for p in packages)
+        package_names = set(entry[0] for entry in previous_entries ^ entries)
+        if not package_names:
+            return []
+
+        self.environment.refresh_packages(package_names)
+        self._set_packages(packages)
+        self._software_ids = {}
+        for key in [key for key in self._tags if key[0] in package_names]:
+            del self._tags[key]
+
+        changed = [package_info for package_info in packages if package_info.package in package_names]
+        for key in [key for key in self._outdated if key[0] in package_names]:
+            del self._outdated[key]
+        for package_info in changed:
+            self._outdated[(package_info.package, package_info.version)] = package_info
+        return changed
+
+    def refresh_if_changed(self):
+        """
+        Update the inventory if the package database was modified since the last request.
+
+        :return: List of the installed or upgraded packages.
+        """
+        if self._get_database_state() != self._database_state:
+            return self.update()
+        return []
+
+    def _set_packages(self, packages):
+        self._packages = packages
+        self._packages_by_name = {}
+        for package_info in packages:
+            self._packages_by_name.setdefault(package_info.package, []).append(package_info)
+
+    def get_packages(self):
+        """
+        Return the installed packages, they are queried only once until the package database changes.
+        """
+        if self._packages is None:
+            self._set_packages(list(self.environment.get_package_list()))
+        return self._packages
+
+    def warm_up(self, full=True):
+        """
+        Load the package list and, for full SWID tags, the file index of the environment.
+        """
+        self.refresh_if_changed()
+        self.get_packages()
+        if full:
+            self.environment.load_file_index()
+
+    def _get_software_ids(self, regid, os_string, architecture):
+        key = (regid, os_string, architecture)
+        if key not in self._software_ids:
+            self._software_ids[key] = create_software_id_index(self.get_packages(), regid, os_string, architecture)
+        return self._software_ids[key]
+
+    def _parse_request(self, request):
+        if not isinstance(request, dict):
+            raise ValueError('The request must be a JSON object')
+        unknown_keys = set(request) - self.request_keys
+        if unknown_keys:
+            raise ValueError('Unknown keys in the request: {0}'.format(', '.join(sorted(unknown_keys))))
+        if request.get('package') is not None and request.get('software_id') is not None:
+            raise ValueError('Only one of "package" and "software_id" may be given')
+        if request.get('package_digests') not in (None, 'verify', 'trust'):
+            raise ValueError('"package_digests" must be "verify" or "trust"')
+        if not isinstance(request.get('doc_separator', ''), type('')):
+            raise ValueError('"doc_separator" must be a string')
+
+        options = dict(self.defaults)
+        for key, validate in self.tag_options.items():
+            if request.get(key) is not None:
+                try:
+                    options[key] = validate(request[key])
+                except (ArgumentTypeError, ValueError) as e:
+                    raise ValueError('Invalid "{0}": {1}'.format(key, e))
+        for key in ('package', 'software_id', 'doc_separator', 'package_digests'):
+            if request.get(key) is not None:
+                options[key] = request[key]
+        return options
+
+    def _select_packages(self, options):
+        if options.get('package') is not None:
+            return list(self._packages_by_name.get(options['package'], []))
+        if options.get('software_id') is not None:
+            software_ids = self._get_software_ids(options['regid'], options['os'], options['arch'])
+            package_info = software_ids.get(options['software_id'])
+            return [package_info] if package_info is not None else []
+        return list(self.get_packages())
+
+    def _cache_tag(self, key, chunks):
+        """
+        Pass the chunks of a streamed SWID tag through and keep the tag once it is complete.
+        """
+        collected = []
+        for chunk in chunks:
+            collected.append(chunk)
+            yield chunk
+        self._tags[key] = b''.join(collected)
+        while len(self._tags) > self.max_cached_tags:
+            self._tags.popitem(last=False)
+
+    def _swid_tags(self, packages, options):
+        tag_options = tuple(sorted((key, options[key]) for key in list(self.tag_options) + ['package_digests']))
+        keys = [(package_info.package, package_info.version, package_info.architecture, tag_options)
+                for package_info in packages]
+        # The tags of this response must not be evicted while it is written
+        cached = dict((key, self._tags[key]) for key in keys if key in self._tags)
+        # The files are added to the PackageInfo()-Objects, the list of installed packages must stay without them
+        missing = [PackageInfo(package_info.package, package_info.version, status=package_info.status,
+                               architecture=package_info.architecture)
+                   for package_info, key in zip(packages, keys) if key not in cached]
+
+        # Listing the files of all packages at once is much cheaper than one query per package
+        if options['full'] and len(missing) > 1:
+            self.environment.load_file_index()
+
+        swid_tags = create_swid_tags(self.environment, options['entity_name'], options['regid'],
+                                     os_string=options['os'], architecture=options['arch'],
+                                     hash_algorithms=options['hash'], full=options['full'], matcher=all_matcher,
+                                     hierarchic=options['hierarchic'], jobs=self.jobs, hash_cache=self.hash_cache,
+                                     package_digests=options.get('package_digests'), streaming=True,
+                                     pretty=options['pretty'], packages=missing)
+        try:
+            for key in keys:
+                if key in cached:
+                    yield cached[key]
+                else:
+                    yield self._cache_tag(key, next(swid_tags))
+        finally:
+            swid_tags.close()
+
+    def precompute_next(self):
+        """
+        Generate the SWID tag with the default options of the next installed
+        or upgraded package and keep it in memory.
+
+        :return: False if no package was left.
+        """
+        if not self._outdated:
+            return False
+
+        _, package_info = self._outdated.popitem(last=False)
+        for document in self._swid_tags([package_info], self._parse_request({})):
+            if not isinstance(document, bytes):
+                b''.join(document)
+        return True
+
+    def handle(self, request):
+        """
+        Handle a request.
+
+        :param request: Dictionary, e.g. ``{"command": "swid", "package": "bash", "full": true}``.
+                        The commands are "swid", "software-id" and "refresh".
+        :return: Tuple of the exit code (as the command line tool) and the documents: an iterator of
+                 bytestrings or of iterators of bytestring chunks.
+        :raises ValueError: If the request is invalid.
+        """
+        options = self._parse_request(request)
+        command = request.get('command')
+        if command not in ('swid', 'software-id', 'refresh'):
+            raise ValueError('Unknown command {0!r}'.format(command))
+
+        if command == 'refresh':
+            self.refresh()
+            return 0, iter([])
+
+        self.refresh_if_changed()
+        self.get_packages()
+        packages = self._select_packages(options)
+        if not packages:
+            return 1, iter([])
+
+        if command == 'software-id':
+            return 0, (create_software_id(options['regid'], create_unique_id(package_info, options['os'], options['arch']))
+                       .encode('utf-8') for package_info in packages)
+
+        return 0, self._swid_tags(packages, options)
+
+    def close(self):
+        """
+        Write the hash cache to disk, when the daemon shuts down.
+        """
+        with self.lock:
+            if self.hash_cache is not None:
+                self.hash_cache.close()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Read one JSON request line and write the response.
+
+    The response starts with a JSON status line, e.g. ``{"status": 0}``, with
+    the same exit codes as the command line tool and an ``error`` message if
+    the status is not 0. The documents follow, written like the output of
+    the command line tool, and the connection is closed at the end.
+
+    """
+    # Seconds after which a client, which doesn't send its request or doesn't read the response, is dropped.
+    # Every client has its own thread, so other requests are served in the meantime.
+    timeout = 30
+
+    def _write_status(self, status, error=None):
+        response = {'status': status}
+        if error is not None:
+            response['error'] = error
+        self.wfile.write(json.dumps(response, sort_keys=True).encode('utf-8') + b'\n')
+
+    def handle(self):
+        service = self.server.service
+        try:
+            line = self.rfile.readline()
+        except socket.timeout:
+            return
+        if not line:
+            # The client closed the connection without a request, e.g. the check for a running daemon
+            return
+
+        try:
+            request = json.loads(line.decode('utf-8'))
+            # The database monitor uses the service at the same time
+            with service.lock:
+                status, documents = service.handle(request)
+        except ValueError as e:
+            self._write_status(2, str(e))
+            return
+        except CommandManagerError as e:
+            self._write_status(5, str(e))
+            return
+        except (OSError, IOError, sqlite3.Error) as e:
+            self._write_status(4, str(e))
+            return
+
+        separator = request.get('doc_separator')
+        if separator is None:
+            separator = service.defaults['doc_separator']
+
+        try:
+            self._write_status(status)
+            for index, document in enumerate(self._produce(service, documents)):
+                if index > 0:
+                    self.wfile.write(separator.encode('utf-8'))
+                self.wfile.write(document)
+            if status == 0:
+                self.wfile.write(b'\n')
+        except Exception as e:
+            # The status was already written, the response is cut off. A closed connection is no error.
+            if getattr(e, 'errno', None) not in (errno.EPIPE, errno.ECONNRESET):
+                print('Error: The request {0} failed: {1}'.format(json.dumps(request, sort_keys=True), e), file=sys.stderr)
+        finally:
+            if hasattr(documents, 'close'):
+                with service.lock:
+                    documents.close()
+
+    @staticmethod
+    def _produce(service, documents):
+        """
+        Generate the documents one after another while holding the lock of
+        the service, the lock is released while a document is written. A slow
+        client therefore doesn't block other requests and the database monitor.
+        """
+        while True:
+            with service.lock:
+                document = next(documents, None)
+                if document is None:
+                    return
+                if not isinstance(document, bytes):
+                    document = b''.join(document)
+            yield document
+
+
+class DatabaseMonitor(threading.Thread):
+    """
+    Background thread, which updates an InventoryService as soon as the
+    package database was modified and generates the SWID tags of the
+    installed or upgraded packages in advance. Requests are therefore not
+    delayed by the update, unless they arrive in the middle of it. The tags
+    are generated one package after another, so requests are served between them.
+    """
+
+    def __init__(self, service, watcher, timeout=1.0):
+        """
+        :param service: The InventoryService()-Object.
+        :param watcher: Watcher of the database paths of the environment, see ``watcher.create_watcher``.
+        :param timeout: Seconds after which the thread checks whether it was stopped.
+        """
+        threading.Thread.__init__(self, name='swid_generator-monitor')
+        self.daemon = True
+        self.service = service
+        self.watcher = watcher
+        self.timeout = timeout
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.is_set():
+                if self.watcher.wait(self.timeout):
+                    self._run_locked(self.service.refresh_if_changed)
+                while not self._stopped.is_set() and self._run_locked(self.service.precompute_next):
+                    pass
+        finally:
+            self.watcher.close()
+
+    def _run_locked(self, method):
+        try:
+            with self.service.lock:
+                return method()
+        except Exception as e:
+            # The next request or modification of the database tries again
+            print('Error: The inventory could not be updated: {0}'.format(e), file=sys.stderr)
+            return False
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class InventoryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix domain socket server for an InventoryService. Every connection is
+    served in its own thread, so a slow or silent client doesn't block the
+    others. The service is only used while holding its lock, since the
+    environments are not thread-safe.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, service):
+        """
+        :param socket_path: Path of the Unix domain socket. A stale socket is replaced.
+        :param service: The InventoryService()-Object.
+        :raises OSError: If the path exists and is no socket, or another daemon is listening on it.
+        """
+        self.service = service
+        remove_stale_socket(socket_path)
+        socketserver.UnixStreamServer.__init__(self, socket_path, RequestHandler)
+        stat_result = os.lstat(socket_path)
+        self._socket_id = (stat_result.st_dev, stat_result.st_ino)
+
+    def server_bind(self):
+        # The tags may only be read by the owner and the group of the socket, from the moment it is created
+        umask = os.umask(0o117)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        # Only the own socket is removed, not a file or the socket of another daemon, which replaced it
+        try:
+            stat_result = os.lstat(self.server_address)
+        except OSError:
+            return
+        if stat.S_ISSOCK(stat_result.st_mode) and (stat_result.st_dev, stat_result.st_ino) == self._socket_id:
+            os.unlink(self.server_address)
+
+
+def remove_stale_socket(socket_path):
+    """
+    Remove a socket, which was left behind by a daemon which is no longer running.
+
+    :param socket_path: Path of the Unix domain socket.
+    :raises OSError: If the path exists and is no socket, or a daemon is listening on it.
+    """
+    try:
+        stat_result = os.lstat(socket_path)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        raise
+    if not stat.S_ISSOCK(stat_result.st_mode):
+        raise OSError(errno.EEXIST, '{0} exists and is no socket'.format(socket_path))
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (OSError, IOError) as e:
+        if e.errno != errno.ECONNREFUSED:
+            raise
+    else:
+        raise OSError(errno.EADDRINUSE, 'A daemon is already listening on {0}'.format(socket_path))
+    finally:
+        client.close()
+    os.unlink(socket_path)
+
+
+def request(socket_path, request_data):
+    """
+    Send a request to a daemon and return the response.
+
+    :param socket_path: Path to the Unix domain socket of the daemon.
+    :param request_data: Dictionary with the request.
+    :return: Tuple of the status dictionary and the documents as one bytestring.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request_data).encode('utf-8') + b'\n')
+        response = client.makefile('rb')
+        status = json.loads(response.readline().decode('utf-8'))
+        return status, response.read()
+    finally:
+        client.close()
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import bz2
+import posixpath
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+try:
+    # Python 3.14 or later
+    from compression import zstd as _zstd
+
+    def _zstd_decompressor():
+        return _zstd.ZstdDecompressor()
+except ImportError:
+    try:
+        import zstandard as _zstd
+
+        def _zstd_decompressor():
+            return _zstd.ZstdDecompressor().decompressobj()
+    except ImportError:
+        _zstd_decompressor = None
+
+from ..exceptions import PackageFileError
+
+
+AR_MAGIC = b'!<arch>\n'
+AR_HEADER_SIZE = 60
+AR_HEADER_END = b'`\n'
+
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+LZMA_MAGIC = b'\x5d\x00\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+BLOCK_SIZE = 65536
+
+_decompression_errors = (IOError, EOFError, ValueError, zlib.error)
+if lzma is not None:
+    _decompression_errors += (lzma.LZMAError,)
+if _zstd_decompressor is not None:
+    _decompression_errors += (_zstd.ZstdError,)
+
+
+class BoundedReader(object):
+    """
+    A read-only file-like view on the next ``size`` bytes of a stream.
+    """
+
+    def __init__(self, fileobj, size):
+        self.fileobj = fileobj
+        self.remaining = size
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        if len(data) < size:
+            raise PackageFileError('Unexpected end of the package file')
+        self.remaining -= len(data)
+        return data
+
+    def skip(self):
+        """
+        Consume the remaining bytes of the view.
+        """
+        while self.remaining > 0:
+            self.read(BLOCK_SIZE)
+
+
+class PeekReader(object):
+    """
+    Wraps a stream to look at its first bytes without consuming them.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.buffer = b''
+
+    def peek(self, size):
+        if len(self.buffer) < size:
+            self.buffer += self.fileobj.read(size - len(self.buffer))
+        return self.buffer[:size]
+
+    def read(self, size=-1):
+        if not self.buffer:
+            return self.fileobj.read(size)
+        if size is None or size < 0:
+            data, self.buffer = self.buffer + self.fileobj.read(), b''
+        elif size <= len(self.buffer):
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        else:
+            data, self.buffer = self.buffer + self.fileobj.read(size - len(self.buffer)), b''
+        return data
+
+
+class DecompressingReader(object):
+    """
+    A read-only file-like object returning the decompressed content of a stream.
+
+    The compressed data is read in blocks and fed to a decompressor object
+    (with a ``decompress(data)`` method), so only a block of data is kept
+    in memory at a time.
+    """
+
+    def __init__(self, fileobj, decompressor):
+        self.fileobj = fileobj
+        self.decompressor = decompressor
+        self.buffer = b''
+        self.eof = False
+
+    def _fill(self, size):
+        chunks = [self.buffer]
+        available = len(self.buffer)
+        while not self.eof and (size < 0 or available < size):
+            data = self.fileobj.read(BLOCK_SIZE)
+            if not data:
+                self.eof = True
+                flush = getattr(self.decompressor, 'flush', None)
+                data = flush() if flush is not None else b''
+            else:
+                data = self.decompressor.decompress(data)
+            chunks.append(data)
+            available += len(data)
+        self.buffer = b''.join(chunks)
+
+    def read(self, size=-1):
+        if size is None:
+            size = -1
+        try:
+            self._fill(size)
+        except _decompression_errors as e:
+            raise PackageFileError('The package file could not be decompressed: {0}'.format(e))
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def _lzma_decompressor():
+    if lzma is None:
+        raise PackageFileError('The xz/lzma compressed package file can not be read without the lzma module')
+    return lzma.LZMADecompressor()
+
+
+def open_decompressed(fileobj):
+    """
+    Detect the compression of a stream by its magic bytes and return a
+    file-like object with the decompressed content.
+
+    Supported are gzip, bzip2, xz, lzma and, if the ``zstandard`` package is
+    installed (or on Python 3.14 or later), zstd. Uncompressed streams are
+    returned as they are.
+
+    :param fileobj: Stream with a ``read(size)`` method.
+    :return: Stream with a ``read(size)`` method.
+    """
+    fileobj = PeekReader(fileobj)
+    magic = fileobj.peek(6)
+
+    if magic.startswith(GZIP_MAGIC):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif magic.startswith(BZIP2_MAGIC):
+        decompressor = bz2.BZ2Decompressor()
+    elif magic.startswith(XZ_MAGIC) or magic.startswith(LZMA_MAGIC):
+        decompressor = _lzma_decompressor()
+    elif magic.startswith(ZSTD_MAGIC):
+        if _zstd_decompressor is None:
+            raise PackageFileError('The zstd compressed package file can not be read, please install the zstandard package')
+        decompressor = _zstd_decompressor()
+    else:
+        return fileobj
+
+    return DecompressingReader(fileobj, decompressor)
+
+
+def iter_ar_members(fileobj):
+    """
+    Iterate over the members of an ar archive (the container format of
+    Debian packages) without seeking.
+
+    A member has to be read (or skipped) before the next one is requested,
+    the rest of a partially read member is skipped automatically.
+
+    :param fileobj: Stream positioned at the start of the archive.
+    :return: Iterator of tuples with the member name and a ``BoundedReader`` of its content.
+    """
+    if fileobj.read(len(AR_MAGIC)) != AR_MAGIC:
+        raise PackageFileError('The package file is not an ar archive')
+
+    while True:
+        header = fileobj.read(AR_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) != AR_HEADER_SIZE or header[58:60] != AR_HEADER_END:
+            raise PackageFileError('Invalid ar member header')
+
+        try:
+            # GNU ar terminates the names with a slash
+            name = header[0:16].decode('ascii').rstrip().rstrip('/')
+        except UnicodeDecodeError:
+            raise PackageFileError('Invalid ar member name')
+        try:
+            size = int(header[48:58].decode('ascii').strip())
+        except ValueError:
+            raise PackageFileError('Invalid ar member size')
+
+        member = BoundedReader(fileobj, size)
+        yield name, member
+        member.skip()
+
+        # The members are aligned to an even offset
+        if size % 2 == 1:
+            fileobj.read(1)
+
+
+def normalize_member_path(name):
+    """
+    Convert the name of an archive member (e.g. ``./usr/bin/bash``) to an absolute path.
+    """
+    if name.startswith('./'):
+        name = name[2:]
+    return '/' + name.strip('/')
+
+
+def symlink_target(path, link_name):
+    """
+    Return the absolute, normalized target of the symbolic link ``path`` pointing to ``link_name``.
+    """
+    return posixpath.normpath(posixpath.join(posixpath.dirname(path), link_name))
+
+
+def resolve_links(files, links):
+    """
+    Resolve the links of a package to the regular files of the package.
+
+    :param files: Dictionary of the regular files (path -> tuple of size and digests).
+    :param links: Dictionary of the links (path -> absolute target path).
+    :return: Dictionary of the resolvable links (path -> tuple of size and digests of the target).
+    """
+    resolved = {}
+    for path, target in links.items():
+        # Follow chains of links, but not forever
+        for _ in range(40):
+            if target not in links:
+                break
+            target = links[target]
+        if target in files:
+            resolved[path] = files[target]
+    return resolved
@@ -6,6 +6,7 @@ import stat
 import platform
 from distutils.spawn import find_executable
 from swid_generator.package_info import FileInfo
+from swid_generator.generators.evidence_walker import EvidenceWalker
 from swid_generator.exceptions import RequirementsNotInstalledError
 from swid_generator.patches import unicode_patch
 
@@ -17,7 +18,9 @@ class CommonEnvironment(object):
     executable = None
     conffile_file_name = None
     control_archive = None
-    required_packages_for_package_file_method = None
+    # Package files are read natively by all environments, without external tools
+    required_packages_for_package_file_method = []
+    package_file_suffixes = ()
     required_packages_for_sign_method = None
 
     @staticmethod
@@ -37,9 +40,9 @@ class CommonEnvironment(object):
         return dist or system or platform.os.name or 'unknown'
 
     @staticmethod
-    def _is_file(path):
+    def _stat_file(path):
         """
-        Determine whether the specified path is an existing file.
+        Stat the specified path once and return the result if it is an existing file.
 
         This is needed because some package managers don't list only regular
         files, but also directories and message strings.
@@ -52,21 +55,89 @@ class CommonEnvironment(object):
                 The path to check.
 
         Returns:
-            True or False
+            The ``os.stat`` result (symlinks are followed) or None if the path
+            is not absolute, doesn't exist or is a directory.
 
         """
-        if path[0] != '/':
-            return False
+        if path[:1] != '/':
+            return None
 
         try:
-            mode = os.stat(path.encode('utf-8')).st_mode
+            stat_result = os.stat(path.encode('utf-8'))
         except OSError:
-            return False
+            return None
 
-        if stat.S_ISDIR(mode):
-            return False
+        if stat.S_ISDIR(stat_result.st_mode):
+            return None
 
-        return True
+        return stat_result
+
+    @classmethod
+    def _is_file(cls, path):
+        """
+        Determine whether the specified path is an existing file, see ``_stat_file``.
+        """
+        return cls._stat_file(path) is not None
+
+    @classmethod
+    def _classify_files(cls, file_paths, config_file_paths=(), is_mutable=None):
+        """
+        Create the FileInfo()-Objects of the candidate paths which are existing files.
+
+        Every path is stat'ed exactly once and the size is taken from the stat result.
+        The configuration files come first and are mutable, followed by the other files
+        in the given order. Paths which are listed more than once, also as configuration
+        file, are only returned once.
+
+        :param file_paths: Iterable of all paths of the package.
+        :param config_file_paths: Iterable of the paths of the configuration files.
+        :param is_mutable: Optional function which decides for a path that is no configuration file
+                           whether the file is mutable. Default is not mutable.
+        :return: List of FileInfo()-Objects
+        """
+        seen = set()
+        result = []
+
+        def add(path, mutable):
+            if path in seen:
+                return
+            seen.add(path)
+
+            stat_result = cls._stat_file(path)
+            if stat_result is None:
+                return
+
+            file_info = FileInfo(path, size=str(stat_result.st_size))
+            file_info.mutable = mutable
+            result.append(file_info)
+
+        for path in config_file_paths:
+            add(path, True)
+        for path in file_paths:
+            add(path, is_mutable is not None and is_mutable(path))
+
+        return result
+
+    @staticmethod
+    def _create_package_file_infos(files, config_file_paths, is_mutable=None):
+        """
+        Create the FileInfo()-Objects of the files read from a package file.
+
+        Nothing is extracted, the size and the digests are taken from the package.
+
+        :param files: Iterable of tuples (path, size, digests).
+        :param config_file_paths: Set of the paths of the configuration files, which are mutable.
+        :param is_mutable: Optional function which decides for a path that is no configuration file
+                           whether the file is mutable. Default is not mutable.
+        :return: List of FileInfo()-Objects in the order of the files
+        """
+        result = []
+        for path, size, digests in files:
+            file_info = FileInfo(path, actual_path=False, size=str(size))
+            file_info.digests = digests
+            file_info.mutable = path in config_file_paths or (is_mutable is not None and is_mutable(path))
+            result.append(file_info)
+        return result
 
     @classmethod
     def is_installed(cls):
@@ -74,26 +145,103 @@ class CommonEnvironment(object):
         return find_executable(cls.executable)
 
     @classmethod
-    def get_files_from_folder(cls, evidence_path, new_root_path):
+    def get_packages_by_name(cls, package_names):
+        """
+        Get the installed packages with the given names. Environments query
+        them directly from the package manager, without listing all packages.
+
+        :param package_names: List of package names.
+        :return: List of ``PackageInfo`` instances.
+        """
+        package_names = set(package_names)
+        return [package_info for package_info in cls.get_package_list() if package_info.package in package_names]
+
+    @classmethod
+    def get_database_paths(cls):
+        """
+        Return the paths of the package database, which are modified when a
+        package is installed, upgraded or removed.
+        """
+        return ()
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Drop the in-memory indexes of the package database, e.g. after it was
+        modified. Environments without such indexes ignore this.
+        """
+        pass
+
+    @classmethod
+    def reload_package_list(cls):
+        """
+        Make the next ``get_package_list`` read the modified package database,
+        while the file indexes are kept. Environments which query the package
+        manager on every call ignore this.
+        """
+        pass
+
+    @classmethod
+    def refresh_packages(cls, package_names):
+        """
+        Update the in-memory indexes of the package database for the given
+        packages only, which were installed, upgraded or removed since the
+        indexes were loaded. By default all indexes are dropped.
+
+        :param package_names: Set of the names of the modified packages.
+        """
+        cls.clear_cache()
+
+    @classmethod
+    def load_file_index(cls):
+        """
+        Prepare an in-memory index of the files of all installed packages, so
+        that ``get_files_for_package`` doesn't need to query the package
+        manager once per package. Environments without a bulk query ignore this.
+        """
+        pass
+
+    @classmethod
+    def add_package_digests(cls, package_info, files):
+        """
+        Attach the file digests recorded by the package manager to the given files.
+
+        Environments set ``package_digests`` (algorithm name -> hex digest) and
+        ``package_stat`` (size and modification time at installation, the
+        latter may be None) of each ``FileInfo`` for which the package
+        database holds a digest of a supported algorithm. Environments
+        without such digests ignore this.
+        """
+        pass
+
+    @classmethod
+    def get_files_from_folder(cls, evidence_path, new_root_path, walker=None):
         """
         Get all files from a path on the filesystem
 
         :param evidence_path: Path on the filesystem
-        :return: Lexicographical sorted List of FileInfo()-Objects
+        :param new_root_path: Path which replaces evidence_path in the SWID tag or None.
+        :param walker: Optional EvidenceWalker()-Object for evidence_path, e.g. with exclude patterns.
+        :return: List of FileInfo()-Objects, in the order of os.walk
         """
+        evidence_path = unicode_patch(evidence_path)
+        if new_root_path is not None:
+            new_root_path = unicode_patch(new_root_path)
+        if walker is None:
+            walker = EvidenceWalker(evidence_path)
+
         result_files = []
-        for dirpath, _, files in os.walk(evidence_path):
-            for file in files:
-                actual_path = '/'.join([unicode_patch(dirpath), unicode_patch(file)])
-                if new_root_path is not None:
-                    path_for_tag = actual_path.replace(unicode_patch(evidence_path), unicode_patch(new_root_path), 1)
-                    path_for_tag = path_for_tag.replace('//', '/')
-                    file_info = FileInfo(path_for_tag, actual_path=False)
-                    file_info.set_actual_path(actual_path)
-                else:
-                    file_info = FileInfo(actual_path)
-
-                result_files.append(file_info)
+        for actual_path, stat_result in walker.walk():
+            size = str(stat_result.st_size)
+            if new_root_path is not None:
+                path_for_tag = actual_path.replace(evidence_path, new_root_path, 1)
+                path_for_tag = path_for_tag.replace('//', '/')
+                file_info = FileInfo(path_for_tag, actual_path=False)
+                file_info.set_actual_path(actual_path, size)
+            else:
+                file_info = FileInfo(actual_path, size=size)
+
+            result_files.append(file_info)
         return result_files
 
     @classmethod
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import io
+import tarfile
+
+from ..exceptions import PackageFileError
+from ..generators.utils import create_hashes_from_stream
+from .archive import iter_ar_members, normalize_member_path, open_decompressed, resolve_links, symlink_target
+from .dpkg_database import DpkgDatabase
+
+
+class DebPackage(object):
+    """
+    Reader for Debian binary packages (``.deb``).
+
+    The package is read as a stream in a single pass, nothing is extracted
+    to the disk. A package is an ar archive with the members
+    ``debian-binary``, ``control.tar[.gz|.xz|.zst]`` and
+    ``data.tar[.gz|.bz2|.xz|.lzma|.zst]``.
+
+    The control archive is small and read into memory for the ``control``
+    and ``conffiles`` files. The regular files of the data archive are
+    hashed while the archive is decompressed. Symbolic and hard links are
+    reported with the size and the digests of their target, if the target
+    is a regular file of the package.
+
+    """
+    control_member_prefix = 'control.tar'
+    data_member_prefix = 'data.tar'
+    control_file_name = 'control'
+    conffiles_file_name = 'conffiles'
+
+    def __init__(self, path):
+        self.path = path
+        self.control = {}
+        self.conffiles = []
+        self.files = []
+
+    def read(self, hash_algorithms=None):
+        """
+        Read the package.
+
+        :param hash_algorithms: Tuple of the hash algorithms for the files of the package,
+                                if None only the control archive is read.
+        :return: self, with the ``control`` fields, the ``conffiles`` and, if hash algorithms are
+                 given, the ``files`` as list of tuples (path, size, digests) in archive order.
+        """
+        try:
+            with open(self.path, 'rb') as package_file:
+                for name, member in iter_ar_members(package_file):
+                    if name.startswith(self.control_member_prefix):
+                        self._read_control_archive(member)
+                        if hash_algorithms is None:
+                            break
+                    elif name.startswith(self.data_member_prefix) and hash_algorithms is not None:
+                        self._read_data_archive(member, hash_algorithms)
+        except tarfile.TarError as e:
+            raise PackageFileError('Invalid archive in {0}: {1}'.format(self.path, e))
+        except UnicodeDecodeError as e:
+            raise PackageFileError('Invalid control information in {0}: {1}'.format(self.path, e))
+
+        if not self.control:
+            raise PackageFileError('No control information found in {0}'.format(self.path))
+        return self
+
+    def _read_control_archive(self, member):
+        with tarfile.open(fileobj=io.BytesIO(open_decompressed(member).read()), mode='r:') as control_archive:
+            for tar_info in control_archive:
+                name = tar_info.name[2:] if tar_info.name.startswith('./') else tar_info.name
+                if not tar_info.isfile() or name not in (self.control_file_name, self.conffiles_file_name):
+                    continue
+                content = control_archive.extractfile(tar_info).read().decode('utf-8')
+                if name == self.control_file_name:
+                    self.control = next(DpkgDatabase._parse_stanzas(io.StringIO(content)), {})
+                else:
+                    self.conffiles = self._parse_conffiles(content)
+
+    @staticmethod
+    def _parse_conffiles(content):
+        conffiles = []
+        for line in content.split('\n'):
+            line = line.strip()
+            # Since dpkg 1.20.1 a line may be prefixed with the flag "remove-on-upgrade"
+            if line.startswith('remove-on-upgrade '):
+                continue
+            if len(line) > 0:
+                conffiles.append(line)
+        return conffiles
+
+    def _read_data_archive(self, member, hash_algorithms):
+        files = {}
+        links = {}
+        order = []
+
+        with tarfile.open(fileobj=open_decompressed(member), mode='r|') as data_archive:
+            for tar_info in data_archive:
+                path = normalize_member_path(tar_info.name)
+                if tar_info.isfile():
+                    digests = create_hashes_from_stream(data_archive.extractfile(tar_info), hash_algorithms)
+                    files[path] = (tar_info.size, digests)
+                elif tar_info.issym():
+                    links[path] = symlink_target(path, tar_info.linkname)
+                elif tar_info.islnk():
+                    links[path] = normalize_member_path(tar_info.linkname)
+                else:
+                    continue
+                order.append(path)
+
+        files.update(resolve_links(files, links))
+        self.files = [(path, files[path][0], files[path][1]) for path in order if path in files]
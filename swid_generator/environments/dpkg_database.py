@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import io
+import os
+
+from ..package_info import PackageInfo
+
+
+class DpkgDatabase(object):
+    """
+    In-memory index of the dpkg administrative directory (``/var/lib/dpkg``).
+
+    The ``status`` file is parsed once into a list of packages and their
+    configuration files. The ``info/<package>.list`` files are read on first
+    request and kept in memory, so every file list is read at most once per
+    run and no ``dpkg-query`` process has to be spawned.
+
+    A multiarch package may be installed for several architectures (e.g.
+    ``libc6:amd64`` and ``libc6:i386``), each with its own conffiles and
+    ``info/<package>:<architecture>.list`` file. The packages are therefore
+    identified by name and architecture.
+
+    """
+    status_file_name = 'status'
+    info_folder_name = 'info'
+    not_installed_state = 'not-installed'
+    obsolete_conffile_flags = ('obsolete', 'remove-on-upgrade')
+
+    def __init__(self, admin_dir):
+        self.admin_dir = admin_dir
+        self.status_path = os.path.join(admin_dir, self.status_file_name)
+        self.info_path = os.path.join(admin_dir, self.info_folder_name)
+        self._packages = None
+        # (package name, architecture) => conffiles
+        self._records = {}
+        # Package name => architecture of its first record
+        self._architectures = {}
+        # (package name, architecture) => paths of the .list file
+        self._file_lists = {}
+
+    @classmethod
+    def is_available(cls, admin_dir):
+        """
+        Check whether the status file and the info folder of the given
+        dpkg administrative directory are readable.
+        """
+        status_path = os.path.join(admin_dir, cls.status_file_name)
+        info_path = os.path.join(admin_dir, cls.info_folder_name)
+        return os.access(status_path, os.R_OK) and os.path.isdir(info_path)
+
+    @staticmethod
+    def _parse_stanzas(stream):
+        """
+        Parse a deb822 formatted stream into dictionaries.
+
+        Continuation lines (starting with a space) are appended to the
+        previous field, separated by a newline.
+
+        """
+        stanza = {}
+        field = None
+        for line in stream:
+            line = line.rstrip('\n')
+            if not line.strip():
+                if stanza:
+                    yield stanza
+                stanza = {}
+                field = None
+            elif line[0] in ' \t':
+                if field is not None:
+                    stanza[field] += '\n' + line
+            else:
+                field, _, value = line.partition(':')
+                stanza[field] = value.strip()
+        if stanza:
+            yield stanza
+
+    def _parse_conffiles(self, field):
+        """
+        Extract the paths of the conffiles field. Each line consists of the
+        path and its md5 sum, optionally followed by an obsolete flag.
+        """
+        conffiles = []
+        for line in field.split('\n'):
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            path, _, flag = line.rpartition(' ')
+            if flag in self.obsolete_conffile_flags:
+                continue
+            conffiles.append(path)
+        return conffiles
+
+    def _load(self):
+        packages = []
+        with io.open(self.status_path, 'r', encoding='utf-8') as status_file:
+            for stanza in self._parse_stanzas(status_file):
+                status = stanza.get('Status', '')
+                if 'Package' not in stanza or status.endswith(self.not_installed_state):
+                    continue
+
+                package_info = PackageInfo(package=stanza['Package'],
+                                           version=stanza.get('Version', ''),
+                                           status=status,
+                                           architecture=stanza.get('Architecture', ''))
+                packages.append((package_info, self._parse_conffiles(stanza.get('Conffiles', ''))))
+
+        # Same order as dpkg-query: by package name, then by architecture
+        packages.sort(key=lambda p: (p[0].package, p[0].architecture))
+
+        self._packages = [package_info for package_info, _ in packages]
+        for package_info, conffiles in packages:
+            self._records[(package_info.package, package_info.architecture)] = conffiles
+            self._architectures.setdefault(package_info.package, package_info.architecture)
+
+    def _get_key(self, package_name, architecture):
+        """
+        Return the key of a package. Without an architecture, the first one of the package name is taken.
+        """
+        self.get_packages()
+        if architecture is None:
+            architecture = self._architectures.get(package_name)
+        return package_name, architecture
+
+    def reload(self):
+        """
+        Parse the status file again on the next request. The file lists are kept.
+        """
+        self._packages = None
+        self._records = {}
+        self._architectures = {}
+
+    def drop_file_lists(self, package_names):
+        """
+        Forget the file lists of the given packages, they are read again on the next request.
+        """
+        for key in list(self._file_lists):
+            if key[0] in package_names:
+                del self._file_lists[key]
+
+    def get_packages(self):
+        """
+        Return all packages of the status database as ``PackageInfo`` instances.
+        """
+        if self._packages is None:
+            self._load()
+        return self._packages
+
+    def has_package(self, package_name, architecture=None):
+        return self._get_key(package_name, architecture) in self._records
+
+    def get_conffile_paths(self, package_name, architecture=None):
+        """
+        Return the paths of the (non-obsolete) configuration files of the package.
+        """
+        return self._records[self._get_key(package_name, architecture)]
+
+    def get_file_paths(self, package_name, architecture=None):
+        """
+        Return all paths listed in the ``.list`` file of the package. Paths
+        of multiarch packages are looked up by their architecture qualified name.
+        """
+        key = self._get_key(package_name, architecture)
+        if key in self._file_lists:
+            return self._file_lists[key]
+
+        candidates = ['{0}:{1}.list'.format(*key), '{0}.list'.format(package_name)]
+
+        paths = []
+        for candidate in candidates:
+            list_path = os.path.join(self.info_path, candidate)
+            if os.path.exists(list_path):
+                with io.open(list_path, 'r', encoding='utf-8') as list_file:
+                    paths = [line.rstrip('\n') for line in list_file if len(line.strip()) > 0]
+                break
+
+        self._file_lists[key] = paths
+        return paths
@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
-import subprocess
-import ntpath
+import os
 
-from swid_generator.generators.utils import create_temp_folder
+from swid_generator.generators.utils import HASH_ALGORITHMS, get_hash_algorithms
 from swid_generator.command_manager import CommandManager as CM
 from .common import CommonEnvironment
-from ..package_info import PackageInfo, FileInfo
+from .deb_package import DebPackage
+from .dpkg_database import DpkgDatabase
+from ..package_info import PackageInfo
 
 
 class DpkgEnvironment(CommonEnvironment):
@@ -21,39 +22,98 @@ class DpkgEnvironment(CommonEnvironment):
     """
     executable_query = 'dpkg-query'
     executable = 'dpkg'
+    admin_dir = '/var/lib/dpkg'
     md5_hash_length = 32
-    conffile_file_name = './conffiles'
-    control_archive = 'control.tar.gz'
+    package_file_suffixes = ('.deb',)
 
     installed_states = {
         'install ok installed': True,
         'deinstall ok config-files': False
     }
 
-    required_packages_for_package_file_method = [
-        "tar",
-        "ar"
-    ]
+    _database = None
 
     required_packages_for_sign_method = [
         "xmlsec1"
     ]
 
+    @classmethod
+    def _get_database(cls):
+        """
+        Return the in-memory index of the dpkg administrative directory or
+        ``None`` if the database can not be read directly.
+        """
+        if cls._database is None and DpkgDatabase.is_available(cls.admin_dir):
+            cls._database = DpkgDatabase(cls.admin_dir)
+        return cls._database
+
+    @classmethod
+    def get_database_paths(cls):
+        return (os.path.join(cls.admin_dir, DpkgDatabase.status_file_name),
+                os.path.join(cls.admin_dir, DpkgDatabase.info_folder_name))
+
+    @classmethod
+    def clear_cache(cls):
+        cls._database = None
+
+    @classmethod
+    def reload_package_list(cls):
+        if cls._database is not None:
+            cls._database.reload()
+
+    @classmethod
+    def refresh_packages(cls, package_names):
+        if cls._database is not None:
+            cls._database.drop_file_lists(package_names)
+
     @classmethod
     def get_package_list(cls):
         """
-        Get list of installed packages.
+        Get the installed packages.
+
+        The status database is read directly if possible, otherwise
+        the output of ``dpkg-query`` is parsed while it is still running.
 
         Returns:
-            List of ``PackageInfo`` instances.
+            Generator of ``PackageInfo`` instances.
 
         """
-        result = []
-        command_args = [cls.executable_query, '-W', '-f=${Package}\\n${Version}\\n${Status}\\n${conffiles}\\t']
+        database = cls._get_database()
+        if database is not None:
+            result = database.get_packages()
+        else:
+            result = cls._query_package_list()
 
-        command_output = CM.run_command_check_output(command_args)
+        for r in result:
+            if cls._package_installed(r):
+                yield r
 
-        line_list = command_output.split('\t')
+    @classmethod
+    def get_packages_by_name(cls, package_names):
+        """
+        Get the installed packages with the given names from the status
+        database, or with a single ``dpkg-query`` for all names.
+        """
+        if not package_names:
+            return []
+
+        database = cls._get_database()
+        if database is not None:
+            package_names = set(package_names)
+            result = [p for p in database.get_packages() if p.package in package_names]
+        else:
+            result = cls._query_package_list(package_names)
+
+        return [r for r in result if cls._package_installed(r)]
+
+    @classmethod
+    def _query_package_list(cls, package_names=None):
+        command_args = [cls.executable_query, '-W', '-f=${Package}\\n${Version}\\n${Status}\\n${conffiles}\\t']
+
+        if package_names is None:
+            line_list = CM.run_command_records(command_args, separator='\t')
+        else:
+            line_list = CM.run_command_query_output(command_args + sorted(package_names)).split('\t')
 
         for line in line_list:
             split_line = line.split('\n')
@@ -64,15 +124,16 @@ class DpkgEnvironment(CommonEnvironment):
                 package_info.version = split_line[1]
                 package_info.status = split_line[2]
 
-                result.append(package_info)
-
-        return [r for r in result if cls._package_installed(r)]
+                yield package_info
 
     @classmethod
     def get_files_for_package(cls, package_info):
         """
         Get list of files related to the specified package.
 
+        The file list and the configuration files are taken from the
+        in-memory database index if possible, otherwise ``dpkg-query`` is used.
+
         Args:
             package_info (PackageInfo):
                 The ``PackageInfo`` instance for the query.
@@ -81,38 +142,41 @@ class DpkgEnvironment(CommonEnvironment):
             List of ``FileInfo`` instances.
 
         """
+        database = cls._get_database()
+        if database is not None and database.has_package(package_info.package, package_info.architecture):
+            lines = database.get_file_paths(package_info.package, package_info.architecture)
+            stripped_lines = database.get_conffile_paths(package_info.package, package_info.architecture)
+        else:
+            lines, stripped_lines = cls._query_files_for_package(package_info)
+
+        result = cls._classify_files(lines, stripped_lines)
+        return sorted(result, key=lambda f: f.full_pathname)
+
+    @classmethod
+    def _query_files_for_package(cls, package_info):
+        """
+        Query the file list and the configuration files of a package with ``dpkg-query``.
+
+        Returns:
+            A tuple with the list of all paths and the list of configuration file paths.
 
-        result = []
+        """
         stripped_lines = []
 
         command_args_normal_files = [cls.executable_query, '-L', package_info.package]
         command_normal_file_output = CM.run_command_check_output(command_args_normal_files)
 
         lines = command_normal_file_output.rstrip().split('\n')
-        normal_files = filter(cls._is_file, lines)
 
         command_args_config_files = [cls.executable_query, '-W', '-f=${conffiles}\\n', package_info.package]
         command_config_file_output = CM.run_command_check_output(command_args_config_files)
 
-        lines = command_config_file_output.split('\n')
-
-        for line in lines:
+        for line in command_config_file_output.split('\n'):
             if len(line) != 0:
                 path_without_md5 = line.strip()[:len(line.strip()) - cls.md5_hash_length].strip()
                 stripped_lines.append(path_without_md5)
 
-        config_files = filter(cls._is_file, stripped_lines)
-
-        for config_file_path in config_files:
-            file_info = FileInfo(config_file_path)
-            file_info.mutable = True
-            result.append(file_info)
-
-        for file_path in normal_files:
-            if file_path not in config_files:
-                result.append(FileInfo(file_path))
-
-        return sorted(result, key=lambda f: f.full_pathname)
+        return lines, stripped_lines
 
     @classmethod
     def _package_installed(cls, package_info):
@@ -133,108 +197,40 @@ class DpkgEnvironment(CommonEnvironment):
         return cls.installed_states.get(package_info.status, True)
 
     @classmethod
-    def get_files_from_packagefile(cls, file_pathname):
+    def get_files_from_packagefile(cls, file_pathname, hash_algorithms=None, package_digests=None):
         """
         Extract all information of a .deb package.
         - List of all files
         - List of all Configuration-files
 
-        This Method extract all the information in a temporary directory. The Debian package
-        is extracted to the temporary directory, this because the files are needed to compute the File-Hash.
+        The package is read natively in a single pass, nothing is extracted to the disk.
+        The regular files (and links to regular files of the package) are hashed while
+        the data archive is read, the digests are stored in the ``FileInfo``.
 
         :param file_pathname: Path to the .deb package
+        :param hash_algorithms: Comma separated list of the hash algorithms. Default: all supported algorithms.
+        :param package_digests: Not used, dpkg only records MD5 sums.
         :return: Lexicographical sorted List of FileInfo()-Objects (Conffiles and normal Files)
         """
-        save_options = create_temp_folder(file_pathname)
-
-        result = []
-        result_help_list = []  # needed to check duplications
-
-        command_args_unpack_package = [cls.executable, '-x', save_options['absolute_package_path'], save_options['save_location']]
-        command_args_extract_controlpackage = ["ar", "x", save_options['absolute_package_path'], cls.control_archive]
-        command_args_extract_conffile = ["tar", "-zxf", "/".join((save_options['save_location'], cls.control_archive)), cls.conffile_file_name]
-        command_args_file_list = [cls.executable, '-c', file_pathname]
-
-        def _add_to_result_list(file_path, actual_path, mutable=False):
-            result_help_list.append(file_path)
-            file_info = FileInfo(file_path, actual_path=False)
-            file_info.set_actual_path(actual_path)
-            file_info.mutable = mutable
-            result.append(file_info)
-
-        # Extraction of all needed Files (Store Files into tmp folder), extract Configuration-Files entries
-        try:
-            CM.run_command(command_args_unpack_package)
-            CM.run_command(command_args_extract_controlpackage, working_directory=save_options['save_location'])
-            CM.run_command(command_args_extract_conffile, working_directory=save_options['save_location'])
-
-            temp_conffile_save_location = "/".join((save_options['save_location'], cls.conffile_file_name))
-
-            with open(temp_conffile_save_location, 'rb') as afile:
-                file_content = afile.read().encode('utf-8')
-
-        except(IOError, subprocess.CalledProcessError):
-            # If no file extracted from command -> no .conffile-File exists
-            file_content = None
-            config_file_paths = []
-
-        # Extract Configuration-Files-Entries from output
-        if file_content is not None:
-            config_file_paths = filter(lambda path: len(path) > 0, file_content.split('\n'))
-
-            for config_file_path in config_file_paths:
-                _add_to_result_list(config_file_path, save_options['save_location'] + config_file_path, mutable=True)
-
-        # Extraction of file-list
-        output_file_list = CM.run_command_check_output(command_args_file_list)
-        line_list = output_file_list.split('\n')
-
-        for line in line_list:
-
-            splitted_line = line.split(' ')
-            directory_or_file_path = splitted_line[-1]
-
-            if "->" in splitted_line:
-                # symbol-link
-                symbol_link = (splitted_line[-3])[1:]
-                temp_save_location_symbol_link = "/".join((save_options['save_location'], symbol_link))
-                head, _ = ntpath.split(symbol_link)
-
-                if "../" in directory_or_file_path:
-                    root, _ = ntpath.split(head)
-                    directory_or_file_path = root + directory_or_file_path[2:]
-                else:
-                    directory_or_file_path = "/".join((head, directory_or_file_path))
-
-                if cls._is_file(temp_save_location_symbol_link):
-                    if symbol_link not in config_file_paths and symbol_link not in result_help_list:
-                        _add_to_result_list(symbol_link, temp_save_location_symbol_link)
-            else:
-                directory_or_file_path = directory_or_file_path[1:]
-
-            temp_save_location_file = "/".join((save_options['save_location'], directory_or_file_path))
-
-            if cls._is_file(temp_save_location_file):
-                if directory_or_file_path not in config_file_paths and directory_or_file_path not in result_help_list:
-                    _add_to_result_list(directory_or_file_path, temp_save_location_file)
+        if hash_algorithms is None:
+            hash_algorithms = ','.join(HASH_ALGORITHMS)
+        package = DebPackage(file_pathname).read(get_hash_algorithms(hash_algorithms))
 
+        result = cls._create_package_file_infos(package.files, set(package.conffiles))
         return sorted(result, key=lambda f: f.full_pathname)
 
     @classmethod
     def get_packageinfo_from_packagefile(cls, file_path):
         """
-        Extract the Package-Name and the Package-Version from the Debian-Package.
+        Extract the Package-Name and the Package-Version from the control file of the Debian-Package.
 
         :param file_path: Path to the Debian-Package
         :return: A PackageInfo()-Object with Package-Version and Package-Name.
         """
-        command_args_packagename = [cls.executable, '-f', file_path, 'Package']
-        command_args_version = [cls.executable, '-f', file_path, 'Version']
-        package_name = CM.run_command_check_output(command_args_packagename)
-        package_version = CM.run_command_check_output(command_args_version)
+        package = DebPackage(file_path).read()
 
         package_info = PackageInfo()
-        package_info.package = package_name.strip()
-        package_info.version = package_version.strip()
+        package_info.package = package.control.get('Package', '')
+        package_info.version = package.control.get('Version', '')
 
         return package_info
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
-from ..exceptions import AutodetectionError, EnvironmentNotInstalledError
+from ..exceptions import AutodetectionError, EnvironmentNotInstalledError, PackageFileError
 
 
 class EnvironmentRegistry(object):
@@ -76,3 +76,40 @@ class EnvironmentRegistry(object):
             return env
         else:
             raise EnvironmentNotInstalledError('Environment "%s" is not installed. ' % environment_string)
+
+    def get_package_file_suffixes(self):
+        """
+        Return the file name suffixes of the package files which can be read.
+
+        Returns:
+            Tuple of suffixes, e.g. ``('.deb', '.rpm')``.
+
+        """
+        suffixes = set()
+        for environment in self.environments.values():
+            suffixes.update(environment.package_file_suffixes)
+        return tuple(sorted(suffixes))
+
+    def get_package_file_environment(self, file_path):
+        """
+        Get the environment which reads the given package file, chosen by
+        the file name suffix. The environment does not need to be installed,
+        since package files are read natively.
+
+        Args:
+            file_path (str):
+                Path to the package file.
+
+        Returns:
+            Class representing the package manager environment.
+
+        Raises:
+            PackageFileError:
+                Raised if no environment reads package files with this suffix.
+
+        """
+        for environment_name in sorted(self.environments):
+            environment = self.environments[environment_name]
+            if environment.package_file_suffixes and file_path.endswith(environment.package_file_suffixes):
+                return environment
+        raise PackageFileError('Unknown type of package file: {0}'.format(file_path))
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
-from swid_generator.generators.utils import create_temp_folder
+import gzip
+import io
+import os
+
+from swid_generator.generators.utils import HASH_ALGORITHMS, get_hash_algorithms
 from swid_generator.command_manager import CommandManager as CM
 from .common import CommonEnvironment
-from ..package_info import PackageInfo, FileInfo
+from .pacman_package import PacmanPackage, parse_mtree
+from ..package_info import PackageInfo
 
 
 class PacmanEnvironment(CommonEnvironment):
@@ -14,123 +19,235 @@ class PacmanEnvironment(CommonEnvironment):
 
     """
     executable = 'pacman'
+    local_db_path = '/var/lib/pacman/local'
+    package_file_suffixes = ('.pkg.tar.xz', '.pkg.tar.zst')
 
-    required_packages_for_package_file_method = [
-        "tar"
-    ]
+    _file_index = None
 
     required_packages_for_sign_method = [
         "xmlsec1"
     ]
 
+    @classmethod
+    def get_database_paths(cls):
+        return (cls.local_db_path,)
+
+    @classmethod
+    def clear_cache(cls):
+        cls._file_index = None
+
+    @classmethod
+    def refresh_packages(cls, package_names):
+        """
+        Read the entries of the modified packages in the local pacman database
+        again. Without a readable local database they are removed from the file
+        index and queried package by package.
+        """
+        if cls._file_index is None:
+            return
+
+        for package_name in package_names:
+            cls._file_index.pop(package_name, None)
+        if os.path.isdir(cls.local_db_path):
+            cls._file_index.update(cls._read_local_db_file_index(package_names))
+
     @classmethod
     def get_package_list(cls):
         """
-        Get list of installed packages.
+        Get the installed packages, parsed while ``pacman`` is still printing them.
 
         Returns:
-            List of ``PackageInfo`` instances.
+            Generator of ``PackageInfo`` instances.
 
         """
 
         command_args_packages = [cls.executable, '-Q', '--color', 'never']
-        packages_output = CM.run_command_check_output(command_args_packages)
-        lines = filter(None, packages_output.rstrip().split('\n'))
-        result = []
-        for line in lines:
+        for line in CM.run_command_records(command_args_packages):
+            if not line.strip():
+                continue
             split_line = line.split()
             assert len(split_line) == 2, repr(split_line)
             info = PackageInfo()
             info.package = split_line[0]
             info.version = split_line[1]
-            result.append(info)
+            yield info
+
+    @classmethod
+    def get_packages_by_name(cls, package_names):
+        """
+        Get the installed packages with the given names with a single ``pacman -Q``.
+        """
+        if not package_names:
+            return []
+
+        command_args = [cls.executable, '-Q', '--color', 'never'] + sorted(package_names)
+        package_names = set(package_names)
+        result = []
+        for line in CM.run_command_query_output(command_args).split('\n'):
+            split_line = line.split()
+            if len(split_line) == 2 and split_line[0] in package_names:
+                result.append(PackageInfo(package=split_line[0], version=split_line[1]))
         return result
 
     @classmethod
-    def get_files_for_package(cls, package_info):
+    def load_file_index(cls):
         """
-        Get list of files related to the specified package.
+        Build an index of the files of all installed packages.
 
-        Caching could be implemented by using `Ql` without any package name.
+        The ``files`` entries of the local pacman database are read directly
+        if possible, otherwise a single ``pacman -Ql`` without package name is run.
 
-        Args:
-            package_name (str):
-                The package name as string (e.g. ``cowsay``).
+        """
+        if cls._file_index is not None:
+            return
+
+        if os.path.isdir(cls.local_db_path):
+            cls._file_index = cls._read_local_db_file_index()
+        else:
+            cls._file_index = cls._query_file_index()
+
+    @classmethod
+    def _read_local_db_file_index(cls, package_names=None):
+        """
+        Read the ``%FILES%`` section of every ``<name>-<pkgver>-<pkgrel>/files``
+        entry in the local pacman database.
+
+        :param package_names: Optional set of package names, only their entries are read.
 
         Returns:
-            List of ``FileInfo`` instances.
+            Dictionary with the package name as key and the list of paths as value.
+
+        """
+        file_index = {}
+        for entry in sorted(os.listdir(cls.local_db_path)):
+            files_path = os.path.join(cls.local_db_path, entry, 'files')
+            if not os.path.isfile(files_path):
+                continue
+
+            # Neither pkgver nor pkgrel may contain hyphens
+            package_name = entry.rsplit('-', 2)[0]
+            if package_names is not None and package_name not in package_names:
+                continue
+            paths = file_index.setdefault(package_name, [])
+
+            with io.open(files_path, 'r', encoding='utf-8') as files_file:
+                in_files_section = False
+                for line in files_file:
+                    line = line.rstrip('\n')
+                    if line.startswith('%') and line.endswith('%'):
+                        in_files_section = line == '%FILES%'
+                    elif in_files_section and len(line) > 0:
+                        paths.append('/' + line)
+        return file_index
+
+    @classmethod
+    def _query_file_index(cls):
+        """
+        List the files of all installed packages with a single ``pacman -Ql``.
+
+        Returns:
+            Dictionary with the package name as key and the list of paths as value.
 
         """
-        command_args_files = [cls.executable, '-Ql', package_info.package]
+        command_args_files = [cls.executable, '-Ql', '--color', 'never']
         files_output = CM.run_command_check_output(command_args_files)
-        lines = filter(None, files_output.rstrip().split('\n'))
-        result = []
-        for line in lines:
+        file_index = {}
+        for line in filter(None, files_output.rstrip().split('\n')):
             split_line = line.split(' ', 1)
             assert len(split_line) == 2, repr(split_line)
-            file_path = split_line[1]
-            if cls._is_file(file_path):
-                file_info = FileInfo(file_path)
-                # With the assumption that files in the '/etc'-Folders are mostly Configuration-Files
-                if file_path.startswith("/etc/"):
-                    file_info.mutable = True
-                result.append(file_info)
-        return result
+            file_index.setdefault(split_line[0], []).append(split_line[1])
+        return file_index
+
+    @staticmethod
+    def _is_config_path(path):
+        # With the assumption that files in the '/etc'-Folders are mostly Configuration-Files
+        return path.startswith("/etc/")
 
     @classmethod
-    def get_files_from_packagefile(cls, file_fullpathname):
+    def get_files_for_package(cls, package_info):
         """
-        Extract all information of a .pkg.tar.xz package.
-        - List of all files
-        - List of all Configuration-files
+        Get list of files related to the specified package.
 
-        This Method extract all the information in a temporary directory. The Debian package
-        is extracted to the temporary directory, this because the files are needed to compute the File-Hash.
+        If the file index was loaded, the files are taken from it, otherwise
+        ``pacman -Ql`` is run for the package.
+
+        Args:
+            package_name (str):
+                The package name as string (e.g. ``cowsay``).
+
+        Returns:
+            List of ``FileInfo`` instances.
 
-        :param file_pathname: Path to the .pkg.tar.xz package
-        :return: Lexicographical sorted List of FileInfo()-Objects (Conffiles and normal Files)
         """
-        all_files = []
+        if cls._file_index is not None and package_info.package in cls._file_index:
+            file_paths = cls._file_index[package_info.package]
+        else:
+            command_args_files = [cls.executable, '-Ql', package_info.package]
+            files_output = CM.run_command_check_output(command_args_files)
+            file_paths = []
+            for line in filter(None, files_output.rstrip().split('\n')):
+                split_line = line.split(' ', 1)
+                assert len(split_line) == 2, repr(split_line)
+                file_paths.append(split_line[1])
+
+        return cls._classify_files(file_paths, is_mutable=cls._is_config_path)
 
-        save_options = create_temp_folder(file_fullpathname)
+    @classmethod
+    def add_package_digests(cls, package_info, files):
+        """
+        Attach the SHA256 digests of the ``mtree`` entry in the local pacman
+        database to the given files.
+        """
+        mtree_path = os.path.join(cls.local_db_path, '-'.join((package_info.package, package_info.version)), 'mtree')
+        if not os.path.isfile(mtree_path):
+            return
 
-        command_args_extract_package = ['tar', '-xf', save_options['absolute_package_path']]
-        command_args_files = [cls.executable, '-Qlp', file_fullpathname]
+        with gzip.open(mtree_path, 'rb') as mtree_file:
+            mtree_entries = parse_mtree(mtree_file)
 
-        files_output = CM.run_command_check_output(command_args_files)
+        for file_info in files:
+            entry = mtree_entries.get(file_info.full_pathname)
+            if entry is not None and 'sha256digest' in entry:
+                file_info.package_digests = {'sha256': entry['sha256digest']}
+                mtime = int(float(entry['time'])) if 'time' in entry else None
+                file_info.package_stat = (int(entry.get('size', -1)), mtime)
 
-        lines = files_output.split('\n')
-        lines = filter(lambda l: len(l) > 0, lines)
+    @classmethod
+    def get_files_from_packagefile(cls, file_fullpathname, hash_algorithms=None, package_digests=None):
+        """
+        Extract all information of a .pkg.tar.xz or .pkg.tar.zst package.
+        - List of all files
+        - List of all Configuration-files (backup files of the package and files in /etc)
 
-        CM.run_command(command_args_extract_package, working_directory=save_options['save_location'])
+        The package is read natively in a single pass, nothing is extracted to the disk.
+        The regular files (and links to regular files of the package) are hashed while
+        the archive is read, the digests are stored in the ``FileInfo``.
 
-        for line in lines:
-            path = line.split(' ')[1]
-            temporary_path = save_options['save_location'] + path
-            if cls._is_file(temporary_path):
-                file_info = FileInfo(path, actual_path=False)
-                file_info.set_actual_path(temporary_path)
-                # With the assumption that files in the '/etc'-Folders are mostly Configuration-Files
-                if path.startswith("/etc/"):
-                    file_info.mutable = True
-                all_files.append(file_info)
+        :param file_fullpathname: Path to the pacman package
+        :param hash_algorithms: Comma separated list of the hash algorithms. Default: all supported algorithms.
+        :param package_digests: With "trust" the SHA256 digests of the .MTREE file are used instead of
+                                hashing the files, if only SHA256 is requested.
+        :return: List of FileInfo()-Objects in archive order
+        """
+        if hash_algorithms is None:
+            hash_algorithms = ','.join(HASH_ALGORITHMS)
+        package = PacmanPackage(file_fullpathname).read(get_hash_algorithms(hash_algorithms),
+                                                        trust_mtree=package_digests == 'trust')
 
-        return all_files
+        return cls._create_package_file_infos(package.files, set(package.backup), is_mutable=cls._is_config_path)
 
     @classmethod
     def get_packageinfo_from_packagefile(cls, file_path):
         """
-        Extract the Package-Name and the Package-Version from the Pacman-Package.
+        Extract the Package-Name and the Package-Version from the .PKGINFO of the Pacman-Package.
 
         :param file_path: Path to the Pacman-Package
         :return: A PackageInfo()-Object with Package-Version and Package-Name.
         """
-        command_args_packageinfo = [cls.executable, '--query', '--file', file_path]
-        package_info_output = CM.run_command_check_output(command_args_packageinfo)
-        line_split = package_info_output.split(' ')
+        package = PacmanPackage(file_path).read()
 
         package_info = PackageInfo()
-        package_info.package = line_split[0]
-        package_info.version = line_split[1].rstrip()
+        package_info.package = package.info.get('pkgname', '')
+        package_info.version = package.info.get('pkgver', '')
 
         return package_info
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import gzip
+import io
+import re
+import tarfile
+
+from ..exceptions import PackageFileError
+from ..generators.utils import create_hashes_from_stream
+from .archive import normalize_member_path, open_decompressed, resolve_links, symlink_target
+
+
+mtree_escape_re = re.compile(br'\\([0-7]{3})')
+
+
+def parse_mtree(lines):
+    """
+    Parse the lines of a mtree file as written by makepkg.
+
+    :param lines: Iterable of bytestrings.
+    :return: Dictionary with the absolute path as key and a dictionary of the keywords as value.
+    """
+    entries = {}
+    defaults = {}
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 0 or fields[0].startswith(b'#'):
+            continue
+
+        keywords = dict(field.decode('utf-8').split('=', 1) for field in fields[1:] if b'=' in field)
+        if fields[0] == b'/set':
+            defaults.update(keywords)
+        elif fields[0] == b'/unset':
+            for field in fields[1:]:
+                defaults.pop(field.decode('utf-8'), None)
+        elif fields[0].startswith(b'./'):
+            # Special characters in paths are escaped as backslash followed by three octal digits
+            path = mtree_escape_re.sub(lambda m: bytes(bytearray([int(m.group(1), 8)])), fields[0][1:])
+            entry = dict(defaults)
+            entry.update(keywords)
+            entries[path.decode('utf-8')] = entry
+    return entries
+
+
+class PacmanPackage(object):
+    """
+    Reader for pacman packages (``.pkg.tar.xz``, ``.pkg.tar.zst``).
+
+    The package is a compressed tar archive, which is read as a stream in a
+    single pass. Nothing is extracted to the disk. The metadata files at the
+    start of the archive are parsed: ``.PKGINFO`` for name, version and the
+    backup files and ``.MTREE`` for the SHA256 digests recorded by makepkg.
+    The regular files are hashed while the archive is decompressed, symbolic
+    and hard links get the size and the digests of their target.
+
+    """
+    pkginfo_path = '/.PKGINFO'
+    mtree_path = '/.MTREE'
+    # Metadata files of makepkg, which are not installed
+    metadata_paths = ('/.PKGINFO', '/.MTREE', '/.BUILDINFO', '/.INSTALL', '/.CHANGELOG')
+
+    def __init__(self, path):
+        self.path = path
+        self.info = {}
+        self.backup = []
+        self.mtree = {}
+        self.files = []
+
+    def read(self, hash_algorithms=None, trust_mtree=False):
+        """
+        Read the package.
+
+        :param hash_algorithms: Tuple of the hash algorithms for the files of the package,
+                                if None only the metadata is read.
+        :param trust_mtree: Take the digests from ``.MTREE`` instead of hashing the files, if only
+                            SHA256 is requested.
+        :return: self, with the ``info`` of ``.PKGINFO``, the paths of the ``backup`` files, the
+                 ``mtree`` entries and, if hash algorithms are given, the ``files`` as list of tuples
+                 (path, size, digests) in archive order.
+        """
+        trust_mtree = trust_mtree and hash_algorithms == ('sha256',)
+        files = {}
+        links = {}
+        order = []
+
+        try:
+            with open(self.path, 'rb') as package_file:
+                with tarfile.open(fileobj=open_decompressed(package_file), mode='r|') as package_archive:
+                    for tar_info in package_archive:
+                        path = normalize_member_path(tar_info.name)
+                        if path == self.pkginfo_path:
+                            self._read_pkginfo(package_archive.extractfile(tar_info).read())
+                            if hash_algorithms is None:
+                                break
+                            continue
+                        if path == self.mtree_path:
+                            with gzip.GzipFile(fileobj=io.BytesIO(package_archive.extractfile(tar_info).read())) as mtree_file:
+                                self.mtree = parse_mtree(mtree_file)
+                            continue
+                        if hash_algorithms is None or path in self.metadata_paths:
+                            continue
+
+                        if tar_info.isfile():
+                            mtree_entry = self.mtree.get(path, {})
+                            if trust_mtree and 'sha256digest' in mtree_entry:
+                                digests = {'sha256': mtree_entry['sha256digest']}
+                            else:
+                                digests = create_hashes_from_stream(package_archive.extractfile(tar_info), hash_algorithms)
+                            files[path] = (tar_info.size, digests)
+                        elif tar_info.issym():
+                            links[path] = symlink_target(path, tar_info.linkname)
+                        elif tar_info.islnk():
+                            links[path] = normalize_member_path(tar_info.linkname)
+                        else:
+                            continue
+                        order.append(path)
+        except (tarfile.TarError, IOError, ValueError) as e:
+            raise PackageFileError('Invalid pacman package {0}: {1}'.format(self.path, e))
+
+        if not self.info:
+            raise PackageFileError('No .PKGINFO found in {0}'.format(self.path))
+
+        files.update(resolve_links(files, links))
+        self.files = [(path, files[path][0], files[path][1]) for path in order if path in files]
+        return self
+
+    def _read_pkginfo(self, content):
+        for line in content.decode('utf-8').split('\n'):
+            if line.startswith('#') or ' = ' not in line:
+                continue
+            key, _, value = line.partition(' = ')
+            if key == 'backup':
+                self.backup.append('/' + value)
+            else:
+                self.info.setdefault(key, value)
@@ -3,10 +3,12 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 
 import subprocess
 
-from swid_generator.generators.utils import create_temp_folder
+from swid_generator.generators.utils import HASH_ALGORITHMS, get_hash_algorithms
 from swid_generator.command_manager import CommandManager as CM
+from swid_generator.exceptions import CommandManagerError
 from .common import CommonEnvironment
-from ..package_info import PackageInfo, FileInfo
+from .rpm_package import RpmPackage
+from ..package_info import PackageInfo
 
 
 class RpmEnvironment(CommonEnvironment):
@@ -19,22 +21,53 @@ class RpmEnvironment(CommonEnvironment):
 
     """
     executable = 'rpm'
-    conffile_file_name = 'conffiles'
-    control_archive = 'control.tar.gz'
-
-    required_packages_for_package_file_method = [
-        "rpm2cpio",
-        "cpio"
-    ]
+    config_file_flag = 1 << 0  # RPMFILE_CONFIG
+    package_file_suffixes = ('.rpm',)
+    # The rpmdb of rpm >= 4.16 (sqlite) and of older versions (Berkeley DB), in both locations
+    database_paths = ('/var/lib/rpm/rpmdb.sqlite', '/var/lib/rpm/Packages',
+                      '/usr/lib/sysimage/rpm/rpmdb.sqlite', '/usr/lib/sysimage/rpm/Packages')
+    file_index_queryformat = '[%{=NAME}\t%{=FILEDIGESTALGO}\t%{FILENAMES}\t%{FILEFLAGS}\t%{FILESIZES}\t%{FILEMTIMES}\t%{FILEDIGESTS}\n]'
+
+    # Values of the FILEDIGESTALGO tag (PGPHASHALGO_*) which match a supported hash algorithm
+    digest_algorithms = {
+        '8': 'sha256',
+        '9': 'sha384',
+        '10': 'sha512'
+    }
+
+    _file_index = None
 
     required_packages_for_sign_method = [
         "xmlsec1"
     ]
 
+    @classmethod
+    def get_database_paths(cls):
+        return cls.database_paths
+
+    @classmethod
+    def clear_cache(cls):
+        cls._file_index = None
+
+    @classmethod
+    def refresh_packages(cls, package_names):
+        """
+        Remove the modified packages from the file index. Their files are
+        queried package by package, so the rest of the index stays valid.
+        """
+        if cls._file_index is not None:
+            for package_name in package_names:
+                cls._file_index.pop(package_name, None)
+
     @classmethod
     def get_package_list(cls):
         """
-        Get list of installed packages.
+        Get the installed packages, parsed while ``rpm`` is still printing them.
+
+        ``rpm`` holds a lock on the rpm database until its output is read to
+        the end. Unlike the other environments, the (short) package list is
+        therefore read completely before it is returned, so the database isn't
+        locked while the files of the packages are queried and hashed.
 
         Returns:
             List of ``PackageInfo`` instances.
@@ -43,12 +76,9 @@ class RpmEnvironment(CommonEnvironment):
 
         command_args_package_list = [cls.executable, '-qa', '--queryformat',
                                      '\t%{name} %{version}-%{release}']
-        package_list_output = CM.run_command_check_output(command_args_package_list)
 
-        line_list = package_list_output.split('\t')
         result = []
-
-        for line in line_list:
+        for line in CM.run_command_records(command_args_package_list, separator='\t'):
             split_line = line.replace('\n', " ").split()
             if len(split_line) >= 2:
                 package_info = PackageInfo()
@@ -57,11 +87,100 @@ class RpmEnvironment(CommonEnvironment):
                 result.append(package_info)
         return result
 
+    @classmethod
+    def get_packages_by_name(cls, package_names):
+        """
+        Get the installed packages with the given names with a single ``rpm -q``.
+        Names which are not installed are reported by rpm on stdout, without the tab.
+        """
+        if not package_names:
+            return []
+
+        command_args = [cls.executable, '-q', '--queryformat', '%{name}\t%{version}-%{release}\n'] + sorted(package_names)
+        package_names = set(package_names)
+        result = []
+        for line in CM.run_command_query_output(command_args).split('\n'):
+            split_line = line.split('\t')
+            if len(split_line) == 2 and split_line[0] in package_names:
+                result.append(PackageInfo(package=split_line[0], version=split_line[1]))
+        return result
+
+    @classmethod
+    def load_file_index(cls):
+        """
+        Query the files of all installed packages with a single ``rpm`` invocation.
+
+        For every file the name of the owning package, the path, the file flags,
+        the size, the modification time and the digest is printed on one line.
+        The output is parsed while ``rpm`` is still running and stored per package name.
+
+        """
+        if cls._file_index is None:
+            cls._file_index = cls._query_file_index([cls.executable, '-qa', '--queryformat', cls.file_index_queryformat])
+
+    @classmethod
+    def _query_file_index(cls, command_args_file_index):
+        """
+        Run an ``rpm`` query with the file index queryformat and parse its output.
+
+        Returns:
+            Dictionary with the package name as key. The value holds the digest
+            algorithm and the list of ``(path, flags, size, mtime, digest)`` tuples.
+
+        """
+        process = CM.run_command_popen(command_args_file_index, stdout=subprocess.PIPE)
+
+        file_index = {}
+        for line in process.stdout:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            split_line = line.rstrip('\n').split('\t')
+            if len(split_line) != 7:
+                continue
+            package_name, digest_algorithm, path, flags, size, mtime, digest = split_line
+            entry = file_index.setdefault(package_name, {'digest_algorithm': digest_algorithm, 'files': []})
+            entry['files'].append((path, int(flags), int(size), int(mtime), digest))
+
+        if process.wait() != 0:
+            raise CommandManagerError('Command {0} returned non-zero exit status'.format(command_args_file_index))
+
+        return file_index
+
+    @classmethod
+    def add_package_digests(cls, package_info, files):
+        """
+        Attach the file digests stored in the rpm header to the given files.
+
+        The digests are only usable if the package was built with one of the
+        supported algorithms (rpm >= 4.6 uses SHA256 by default, older packages MD5).
+
+        """
+        if cls._file_index is not None and package_info.package in cls._file_index:
+            entry = cls._file_index[package_info.package]
+        else:
+            command_args = [cls.executable, '-q', '--queryformat', cls.file_index_queryformat, package_info.package]
+            entry = cls._query_file_index(command_args).get(package_info.package)
+
+        if entry is None or entry['digest_algorithm'] not in cls.digest_algorithms:
+            return
+
+        algorithm = cls.digest_algorithms[entry['digest_algorithm']]
+        indexed_files = dict((path, (size, mtime, digest)) for path, _, size, mtime, digest in entry['files'] if digest)
+
+        for file_info in files:
+            if file_info.full_pathname in indexed_files:
+                size, mtime, digest = indexed_files[file_info.full_pathname]
+                file_info.package_digests = {algorithm: digest}
+                file_info.package_stat = (size, mtime)
+
     @classmethod
     def get_files_for_package(cls, package_info):
         """
         Get list of files related to the specified package.
 
+        If the file index was loaded, the files are taken from it, otherwise
+        ``rpm`` is queried for the package.
+
         Args:
             package_info (PackageInfo):
                 The ``PackageInfo`` instance for the query.
@@ -70,96 +189,71 @@ class RpmEnvironment(CommonEnvironment):
             List of ``FileInfo`` instances.
 
         """
-        result = []
+        if cls._file_index is not None and package_info.package in cls._file_index:
+            indexed_files = cls._file_index[package_info.package]['files']
+            files = [path for path, _, _, _, _ in indexed_files]
+            config_files = [path for path, flags, _, _, _ in indexed_files if flags & cls.config_file_flag]
+        else:
+            files, config_files = cls._query_files_for_package(package_info)
+
+        return cls._classify_files(files, config_files)
+
+    @classmethod
+    def _query_files_for_package(cls, package_info):
+        """
+        Query the file list and the configuration files of a package with ``rpm``.
+
+        Returns:
+            A tuple with the list of all paths and the list of configuration file paths.
 
+        """
         command_args_file_list = [cls.executable, '-ql', package_info.package]
         command_args_package_list = [cls.executable, '-qa', '--queryformat', '%{name}\n', '-c', package_info.package]
 
         file_list_output = CM.run_command_check_output(command_args_file_list)
-        lines_file_list = file_list_output.rstrip().split('\n')
-        files = filter(cls._is_file, lines_file_list)
+        files = file_list_output.rstrip().split('\n')
 
         config_file_list_output = CM.run_command_check_output(command_args_package_list)
-        config_files = config_file_list_output.split('\n')
-        config_files = (filter(lambda f: len(f) > 0, config_files))
+        config_files = [f for f in config_file_list_output.split('\n') if len(f) > 0]
 
-        for conf_file_path in config_files:
-            if cls._is_file(conf_file_path):
-                file_info = FileInfo(conf_file_path)
-                file_info.mutable = True
-                result.append(file_info)
-
-        for file_path in files:
-            if cls._is_file(file_path) and file_path not in config_files:
-                file_info = FileInfo(file_path)
-                result.append(file_info)
-
-        return result
+        return files, config_files
 
     @classmethod
-    def get_files_from_packagefile(cls, file_path):
+    def get_files_from_packagefile(cls, file_path, hash_algorithms=None, package_digests=None):
         """
         Extract all information of a .rpm package.
         - List of all files
         - List of all Configuration-files
 
-        This Method extract all the information in a temporary directory. The Rpm package
-        is extracted to the temporary directory, this because the files are needed to compute the File-Hash.
+        The package is read natively in a single pass, nothing is extracted to the disk.
+        The regular files (and links to regular files of the package) are hashed while
+        the payload is decompressed, the digests are stored in the ``FileInfo``.
 
-        :param file_pathname: Path to the .rpm package
-        :return: Lexicographical sorted List of FileInfo()-Objects (Conffiles and normal Files)
+        :param file_path: Path to the .rpm package
+        :param hash_algorithms: Comma separated list of the hash algorithms. Default: all supported algorithms.
+        :param package_digests: Not used, the files are always hashed.
+        :return: List of FileInfo()-Objects, the configuration files first
         """
-        all_file_info = []
-
-        save_options = create_temp_folder(file_path)
+        if hash_algorithms is None:
+            hash_algorithms = ','.join(HASH_ALGORITHMS)
+        package = RpmPackage(file_path).read(get_hash_algorithms(hash_algorithms))
 
-        command_args_file_list = [cls.executable, "--query", "--package", file_path, '-l']
-        command_args_conffile_list = [cls.executable, "--query", "--package", file_path, '-c']
-        command_args_rpm2cpio = ["rpm2cpio", file_path]
-        command_args_cpio = ["cpio", "-id", "--quiet"]
-
-        file_list_output = CM.run_command_check_output(command_args_file_list)
-        conffile_list_output = CM.run_command_check_output(command_args_conffile_list)
-
-        normal_files = filter(lambda fp: len(fp) > 0, file_list_output.split('\n'))
-        config_files = filter(lambda fp: len(fp) > 0, conffile_list_output.split('\n'))
-
-        rpm2cpio = CM.run_command_popen(command_args_rpm2cpio, stdout=subprocess.PIPE)
-        CM.run_command_check_output(command_args_cpio, stdin=rpm2cpio.stdout, working_directory=save_options['save_location'])
-
-        for file_path in config_files:
-            temporary_path = save_options['save_location'] + file_path
-            if cls._is_file(temporary_path):
-                file_info = FileInfo(file_path, actual_path=False)
-                file_info.set_actual_path(temporary_path)
-                file_info.mutable = True
-                all_file_info.append(file_info)
-
-        for file_path in normal_files:
-            temporary_path = save_options['save_location'] + file_path
-            if cls._is_file(temporary_path) and file_path not in config_files:
-                file_info = FileInfo(file_path, actual_path=False)
-                file_info.set_actual_path(temporary_path)
-                all_file_info.append(file_info)
-
-        return all_file_info
+        config_file_paths = set(package.config_files)
+        files = sorted(package.files, key=lambda f: f[0] not in config_file_paths)
+        return cls._create_package_file_infos(files, config_file_paths)
 
     @classmethod
     def get_packageinfo_from_packagefile(cls, file_path):
         """
-        Extract the Package-Name and the Package-Version from the Debian-Package.
+        Extract the Package-Name and the Package-Version from the header of the Rpm-Package.
 
         :param file_path: Path to the Rpm-Package
         :return: A PackageInfo()-Object with Package-Version and Package-Name.
         """
-        command_args_package_name = [cls.executable, "--query", "--package", "--queryformat", "%{name}", file_path]
-        command_args_package_version = [cls.executable, "--query", "--package", "--queryformat", "%{version}", file_path]
-
-        package_name_output = CM.run_command_check_output(command_args_package_name)
-        package_version_output = CM.run_command_check_output(command_args_package_version)
+        package = RpmPackage(file_path).read()
 
         package_info = PackageInfo()
-        package_info.package = package_name_output
-        package_info.version = package_version_output
+        package_info.package = package.name
+        package_info.version = package.version
 
         return package_info
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import stat
+import struct
+
+from ..exceptions import PackageFileError
+from ..generators.utils import create_hashes_from_stream
+from .archive import BoundedReader, normalize_member_path, open_decompressed, resolve_links, symlink_target
+
+
+class RpmHeader(object):
+    """
+    The index and the data store of a header structure of an RPM package.
+
+    Only the entries which are requested are converted to Python values.
+    """
+    magic = b'\x8e\xad\xe8\x01'
+    intro_size = 16
+    index_entry_size = 16
+    # The limits of rpm itself (hdrchkTags and hdrchkData)
+    max_index_length = 0xffff
+    max_store_size = 0x0fffffff
+
+    TYPE_INT16 = 3
+    TYPE_INT32 = 4
+    TYPE_INT64 = 5
+    TYPE_STRING = 6
+    TYPE_STRING_ARRAY = 8
+    TYPE_I18NSTRING = 9
+
+    integer_formats = {
+        TYPE_INT16: 'H',
+        TYPE_INT32: 'I',
+        TYPE_INT64: 'Q'
+    }
+
+    def __init__(self, entries, store):
+        self.entries = entries
+        self.store = store
+
+    @classmethod
+    def read(cls, stream, aligned=False):
+        """
+        Read a header structure from the stream.
+
+        :param stream: Stream positioned at the start of the header.
+        :param aligned: Whether the header is padded to a multiple of 8 bytes (the signature header).
+        :return: RpmHeader()-Object
+        """
+        intro = stream.read(cls.intro_size)
+        if len(intro) != cls.intro_size or intro[:4] != cls.magic:
+            raise PackageFileError('Invalid RPM header')
+        index_length, store_size = struct.unpack('>II', intro[8:16])
+        if index_length > cls.max_index_length or store_size > cls.max_store_size:
+            raise PackageFileError('The RPM header is too large')
+
+        index = stream.read(index_length * cls.index_entry_size)
+        store = stream.read(store_size)
+        if len(index) != index_length * cls.index_entry_size or len(store) != store_size:
+            raise PackageFileError('Unexpected end of the RPM header')
+        if aligned:
+            stream.read((8 - store_size % 8) % 8)
+
+        entries = {}
+        for position in range(0, len(index), cls.index_entry_size):
+            tag, tag_type, offset, count = struct.unpack('>IIII', index[position:position + cls.index_entry_size])
+            entries[tag] = (tag_type, offset, count)
+        return cls(entries, store)
+
+    def _strings(self, offset, count):
+        strings = []
+        for _ in range(count):
+            end = self.store.index(b'\x00', offset)
+            strings.append(self.store[offset:end].decode('utf-8'))
+            offset = end + 1
+        return strings
+
+    def get(self, tag, default=None):
+        """
+        Return the value of a tag: a string, a list of strings or a list of integers.
+        """
+        if tag not in self.entries:
+            return default
+        tag_type, offset, count = self.entries[tag]
+
+        if tag_type in self.integer_formats:
+            item_format = '>{0}{1}'.format(count, self.integer_formats[tag_type])
+            if offset + struct.calcsize(item_format) > len(self.store):
+                raise PackageFileError('RPM header tag {0} exceeds the data store'.format(tag))
+            return list(struct.unpack_from(item_format, self.store, offset))
+        if tag_type == self.TYPE_STRING_ARRAY:
+            return self._strings(offset, count)
+        if tag_type in (self.TYPE_STRING, self.TYPE_I18NSTRING):
+            # Only the first translation of an I18N string is used
+            return self._strings(offset, 1)[0]
+        raise PackageFileError('Unsupported type {0} of RPM header tag {1}'.format(tag_type, tag))
+
+    def get_typed(self, tag, tag_types, default=None):
+        """
+        Return the value of a tag like ``get``, after checking its type.
+
+        :param tag_types: The allowed types of the tag, e.g. ``(TYPE_STRING_ARRAY,)``.
+        :raises PackageFileError: If the tag has another type.
+        """
+        if tag in self.entries and self.entries[tag][0] not in tag_types:
+            raise PackageFileError('Unexpected type {0} of RPM header tag {1}'.format(self.entries[tag][0], tag))
+        return self.get(tag, default)
+
+
+class RpmPackage(object):
+    """
+    Reader for RPM packages (``.rpm``).
+
+    The package is read as a stream in a single pass, nothing is extracted
+    to the disk. A package consists of the lead, the signature header, the
+    header and the compressed cpio payload. The name, the version, the
+    file list with flags and modes are taken from the header. The regular
+    files of the payload are hashed while it is decompressed, symbolic and
+    hard links get the size and the digests of their target.
+
+    Both the ``newc`` cpio format and the stripped format of rpm >= 4.12
+    (used for packages with files larger than 4 GiB) are supported.
+
+    """
+    lead_size = 96
+    lead_magic = b'\xed\xab\xee\xdb'
+
+    newc_magics = (b'070701', b'070702')
+    stripped_magic = b'07070X'
+    newc_header_size = 110
+    stripped_header_size = 14
+    cpio_trailer = 'TRAILER!!!'
+
+    RPMTAG_NAME = 1000
+    RPMTAG_VERSION = 1001
+    RPMTAG_RELEASE = 1002
+    RPMTAG_OLDFILENAMES = 1027
+    RPMTAG_FILESIZES = 1028
+    RPMTAG_FILEMODES = 1030
+    RPMTAG_FILELINKTOS = 1036
+    RPMTAG_FILEFLAGS = 1037
+    RPMTAG_FILEDEVICES = 1095
+    RPMTAG_FILEINODES = 1096
+    RPMTAG_DIRINDEXES = 1116
+    RPMTAG_BASENAMES = 1117
+    RPMTAG_DIRNAMES = 1118
+    RPMTAG_PAYLOADFORMAT = 1124
+    RPMTAG_LONGFILESIZES = 5008
+
+    RPMFILE_CONFIG = 1 << 0
+
+    def __init__(self, path):
+        self.path = path
+        self.name = ''
+        self.version = ''
+        self.release = ''
+        self.file_entries = []
+        self.config_files = []
+        self.files = []
+
+    def read(self, hash_algorithms=None):
+        """
+        Read the package.
+
+        :param hash_algorithms: Tuple of the hash algorithms for the files of the package,
+                                if None only the header is read.
+        :return: self, with ``name``, ``version``, ``release``, the ``file_entries`` of the header as
+                 list of tuples (path, flags, mode, size), the paths of the ``config_files`` and, if
+                 hash algorithms are given, the ``files`` as list of tuples (path, size, digests)
+                 in header order.
+        """
+        try:
+            with open(self.path, 'rb') as package_file:
+                lead = package_file.read(self.lead_size)
+                if len(lead) != self.lead_size or lead[:4] != self.lead_magic:
+                    raise PackageFileError('The package file is not an RPM package')
+
+                RpmHeader.read(package_file, aligned=True)
+                header = RpmHeader.read(package_file)
+                self._load_header(header)
+
+                if hash_algorithms is not None:
+                    if header.get(self.RPMTAG_PAYLOADFORMAT, 'cpio') != 'cpio':
+                        raise PackageFileError('Unsupported RPM payload format {0}'.format(header.get(self.RPMTAG_PAYLOADFORMAT)))
+                    self._read_payload(open_decompressed(package_file), header, hash_algorithms)
+        except (struct.error, IndexError, KeyError, ValueError) as e:
+            raise PackageFileError('Invalid RPM package {0}: {1}'.format(self.path, e))
+        return self
+
+    def _load_header(self, header):
+        string = (RpmHeader.TYPE_STRING, RpmHeader.TYPE_I18NSTRING)
+        strings = (RpmHeader.TYPE_STRING_ARRAY,)
+        integers = tuple(RpmHeader.integer_formats)
+
+        self.name = header.get_typed(self.RPMTAG_NAME, string, '')
+        self.version = header.get_typed(self.RPMTAG_VERSION, string, '')
+        self.release = header.get_typed(self.RPMTAG_RELEASE, string, '')
+        base_names = header.get_typed(self.RPMTAG_BASENAMES, strings)
+        if base_names is not None:
+            dir_names = header.get_typed(self.RPMTAG_DIRNAMES, strings)
+            dir_indexes = header.get_typed(self.RPMTAG_DIRINDEXES, integers)
+            if dir_names is None or dir_indexes is None or len(dir_indexes) != len(base_names) or \
+                    any(dir_index >= len(dir_names) for dir_index in dir_indexes):
+                raise PackageFileError('Inconsistent file list in the RPM header of {0}'.format(self.path))
+            paths = [dir_names[dir_index] + base_name for dir_index, base_name in zip(dir_indexes, base_names)]
+        else:
+            paths = header.get_typed(self.RPMTAG_OLDFILENAMES, strings, [])
+
+        count = len(paths)
+        flags = header.get_typed(self.RPMTAG_FILEFLAGS, integers, [0] * count)
+        modes = header.get_typed(self.RPMTAG_FILEMODES, integers, [0] * count)
+        sizes = header.get_typed(self.RPMTAG_LONGFILESIZES, integers) or \
+            header.get_typed(self.RPMTAG_FILESIZES, integers, [0] * count)
+
+        self.file_entries = list(zip(paths, flags, modes, sizes))
+        self.config_files = [path for path, file_flags, _, _ in self.file_entries if file_flags & self.RPMFILE_CONFIG]
+
+    @classmethod
+    def _hard_link_groups(cls, header, count):
+        """
+        Return for every file the key of its hard link group, the device and inode number.
+        """
+        integers = tuple(RpmHeader.integer_formats)
+        devices = header.get_typed(cls.RPMTAG_FILEDEVICES, integers, [0] * count)
+        inodes = header.get_typed(cls.RPMTAG_FILEINODES, integers, list(range(count)))
+        return list(zip(devices, inodes))
+
+    def _read_payload(self, payload, header, hash_algorithms):
+        indexes = dict((path, index) for index, (path, _, _, _) in enumerate(self.file_entries))
+        groups = self._hard_link_groups(header, len(self.file_entries))
+        # The content of a set of hard links is stored with the last file of the set
+        content_indexes = dict((group, index) for index, group in enumerate(groups))
+        group_digests = {}
+        position = 0
+
+        while True:
+            magic = payload.read(6)
+            if magic in self.newc_magics:
+                fields = payload.read(self.newc_header_size - 6)
+                file_size, name_size = int(fields[48:56], 16), int(fields[88:96], 16)
+                name = payload.read(name_size)[:-1].decode('utf-8')
+                position += self.newc_header_size + name_size
+                if name == self.cpio_trailer:
+                    break
+                index = indexes.get(normalize_member_path(name))
+            elif magic == self.stripped_magic:
+                index = int(payload.read(8), 16)
+                position += self.stripped_header_size
+                # Only regular files and symbolic links (the target) have content
+                _, _, mode, size = self.file_entries[index]
+                has_content = stat.S_ISLNK(mode) or (stat.S_ISREG(mode) and content_indexes[groups[index]] == index)
+                file_size = size if has_content else 0
+            else:
+                raise PackageFileError('Invalid cpio header in the RPM payload')
+
+            # The header and the data are aligned to 4 bytes
+            padding = -position % 4
+            payload.read(padding)
+            position += padding
+
+            member = BoundedReader(payload, file_size)
+            # Hard links without content have a size of 0 in the payload
+            _, _, mode, size = self.file_entries[index] if index is not None else (None, 0, 0, 0)
+            if stat.S_ISREG(mode) and file_size == size:
+                group_digests[groups[index]] = create_hashes_from_stream(member, hash_algorithms)
+            member.skip()
+
+            padding = -(position + file_size) % 4
+            payload.read(padding)
+            position += file_size + padding
+
+        self._collect_files(header, groups, group_digests)
+
+    def _collect_files(self, header, groups, group_digests):
+        files = {}
+        links = {}
+        link_names = header.get_typed(self.RPMTAG_FILELINKTOS, (RpmHeader.TYPE_STRING_ARRAY,), [''] * len(self.file_entries))
+
+        for index, (path, _, mode, size) in enumerate(self.file_entries):
+            if stat.S_ISREG(mode) and groups[index] in group_digests:
+                files[path] = (size, group_digests[groups[index]])
+            elif stat.S_ISLNK(mode):
+                links[path] = symlink_target(path, link_names[index])
+
+        files.update(resolve_links(files, links))
+        self.files = [(path, files[path][0], files[path][1]) for path, _, _, _ in self.file_entries if path in files]
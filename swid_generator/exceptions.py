@@ -28,3 +28,10 @@ class CommandManagerError(RuntimeError):
     Raised when CommandManager cannot run command.
     """
     pass
+
+
+class PackageFileError(RuntimeError):
+    """
+    Raised when a package file cannot be read.
+    """
+    pass
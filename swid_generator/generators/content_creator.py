@@ -3,48 +3,58 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 
 import ntpath
 
-from .utils import create_sha256_hash, create_sha384_hash, create_sha512_hash
-from itertools import groupby
-from xml.etree import ElementTree as ET
+from .utils import HASH_ALGORITHMS
+from .hash_engine import HashEngine
+from .xml_writer import START, END, append_elements
 
 
-def _add_hashes(file_info, file_tag, hash_algorithms):
-    if 'sha256' in hash_algorithms:
-        file_tag.set('SHA256:hash', create_sha256_hash(file_info.actual_full_pathname))
-    if 'sha384' in hash_algorithms:
-        file_tag.set('SHA384:hash', create_sha384_hash(file_info.actual_full_pathname))
-    if 'sha512' in hash_algorithms:
-        file_tag.set('SHA512:hash', create_sha512_hash(file_info.actual_full_pathname))
+def _file_attributes(file_info, file_name, digests):
+    attributes = [('name', file_name)]
+    if file_info.mutable:
+        attributes.append(('n8060:mutable', "true"))
+    attributes.append(('size', file_info.size))
+    for algorithm in HASH_ALGORITHMS:
+        if algorithm in digests:
+            attributes.append((algorithm.upper() + ':hash', digests[algorithm]))
+    return attributes
 
 
-def _sort_files(files):
-    def _lenfunc(obj):
-        return len(obj.full_pathname_splitted)
-
-    def _keyfunc(file, i):
-        return file.full_pathname_splitted[i - 1]
+def _sort_key(file_info):
+    """
+    The folder components of the path. Trailing empty components are dropped, so that paths
+    like "a//b" are grouped with the folder "a", as shorter paths were padded with empty strings before.
+    """
+    folder = file_info.full_pathname_splitted[:-1]
+    while folder and folder[-1] == '':
+        folder.pop()
+    return tuple(folder)
 
-    longest_path_length = len(max(files, key=_lenfunc).full_pathname_splitted) - 1
 
-    for file_info in files:
-        del file_info.full_pathname_splitted[-1]
+def _sort_files(files):
+    """
+    Sort the files by their folder, component by component. Files in the same
+    folder keep their order. The sort is stable and the FileInfo objects are not modified.
+    """
+    files.sort(key=_sort_key)
+    return files
 
-        path_length = len(file_info.full_pathname_splitted)
-        file_info.full_pathname_splitted.extend([''] * (longest_path_length - path_length))
 
-    for path_length in range(longest_path_length, 0, -1):
-        files.sort(key=lambda f, i=path_length: _keyfunc(f, i))
-    return files
+def flat_content_events(package_info, hash_algorithms, hash_engine=None):
+    """
+    Generate the events (see ``xml_writer``) of the Directory and File elements of a flat payload or evidence tag.
+    One Directory element is created for each folder which directly contains files.
 
+    The files are hashed while the events are consumed.
+    """
+    last_full_pathname = None
 
-def create_flat_content_tag(root_element, package_info, hash_algorithms):
-    last_full_pathname = ""
-    last_directory_tag = ""
+    if hash_engine is None:
+        hash_engine = HashEngine(hash_algorithms)
 
     if len(package_info.files) > 0:
         package_info.files = _sort_files(package_info.files)
 
-    for file_info in package_info.files:
+    for file_info, digests in zip(package_info.files, hash_engine.hash_files(package_info.files)):
 
         head, file_name = ntpath.split(file_info.full_pathname)
         root, folder_name = ntpath.split(head)
@@ -53,68 +63,101 @@ def create_flat_content_tag(root_element, package_info, hash_algorithms):
 
         full_pathname = root + folder_name
 
-        if last_full_pathname == full_pathname:
-            file_tag = ET.SubElement(last_directory_tag, 'File')
-            file_tag.set('name', file_name)
-        else:
-            directory_tag = ET.SubElement(root_element, 'Directory')
-            directory_tag.set('root', root)
-            directory_tag.set('name', folder_name)
-            file_tag = ET.SubElement(directory_tag, 'File')
-            file_tag.set('name', file_name)
+        if last_full_pathname != full_pathname:
+            if last_full_pathname is not None:
+                yield (END, 'Directory')
+            yield (START, 'Directory', [('root', root), ('name', folder_name)])
             last_full_pathname = full_pathname
-            last_directory_tag = directory_tag
-
-        if file_info.mutable:
-            file_tag.set('n8060:mutable', "true")
-
-        file_tag.set('size', file_info.size)
 
-        _add_hashes(file_info, file_tag, hash_algorithms)
+        yield (START, 'File', _file_attributes(file_info, file_name, digests))
+        yield (END, 'File')
 
-    return root_element
+    if last_full_pathname is not None:
+        yield (END, 'Directory')
 
 
-def create_hierarchic_content_tag(root_element, package_info, hash_algorithms):
-    for file in package_info.files:
-        splitted_location = file.location.split('/')
-        splitted_location.append(file.name)
+class _DirectoryNode(object):
+    __slots__ = ('children', 'files')
 
-        file.fullpathname_splitted = splitted_location[0:len(splitted_location)]
+    def __init__(self):
+        self.children = {}
+        self.files = []
 
-    def _file_hierarchy(filelist, payload_tag=None, last_tag=None):
-        filelist.sort(key=_keyfunc)
 
-        for head, tail_of_file_iterator in groupby(filelist, _keyfunc):
-            if payload_tag is not None:
-                current_tag = ET.SubElement(payload_tag, 'Directory')
-                current_tag.set('root', head)
-                last_tag = payload_tag
-            else:
-                current_tag = ET.SubElement(last_tag, 'Directory')
-                current_tag.set('name', head)
-            sub_files = list()
-            for file_info in tail_of_file_iterator:
+def _build_directory_tree(files):
+    """
+    Build a trie of the folders of the files in a single pass. Every node holds its
+    sub folders by name and its files in the order of the given list.
+    """
+    root = _DirectoryNode()
+    nodes = {}
 
-                if len(file_info.fullpathname_splitted) == 2:
-                    file_tag = ET.SubElement(current_tag, 'File')
-                    file_tag.set('name', file_info.fullpathname_splitted[1])
-                    if file_info.mutable:
-                        file_tag.set('n8060:mutable', "true")
-                    file_tag.set('size', file_info.size)
-
-                    _add_hashes(file_info, file_tag, hash_algorithms)
+    for file_info in files:
+        node = nodes.get(file_info.location)
+        if node is None:
+            node = root
+            for component in file_info.location.split('/'):
+                child = node.children.get(component)
+                if child is None:
+                    child = node.children[component] = _DirectoryNode()
+                node = child
+            nodes[file_info.location] = node
+        node.files.append(file_info)
+
+    return root
+
+
+def _walk_directory_tree(root):
+    """
+    Traverse the trie without recursion: yields the Directory events and, in place of
+    their File elements, the FileInfo objects in document order. The files of a
+    folder come first, then its sub folders sorted by name.
+    """
+    stack = [(name, root.children[name], 'root') for name in sorted(root.children, reverse=True)]
+
+    while stack:
+        item = stack.pop()
+        if item is None:
+            yield (END, 'Directory')
+            continue
+
+        name, node, attribute = item
+        yield (START, 'Directory', [(attribute, name)])
+        for file_info in node.files:
+            yield file_info
+
+        stack.append(None)
+        stack.extend((child_name, node.children[child_name], 'name') for child_name in sorted(node.children, reverse=True))
+
+
+def hierarchic_content_events(package_info, hash_algorithms, hash_engine=None):
+    """
+    Generate the events (see ``xml_writer``) of the nested Directory and File elements
+    of a hierarchic payload or evidence tag. The top-level Directory elements carry
+    the first path component as root, all nested ones their folder name.
+
+    The structure is determined first, then the files are hashed in the order
+    of their File elements while the events are consumed.
+    """
+    if hash_engine is None:
+        hash_engine = HashEngine(hash_algorithms)
+
+    tree = _build_directory_tree(package_info.files)
+
+    files = [item for item in _walk_directory_tree(tree) if not isinstance(item, tuple)]
+    digests = hash_engine.hash_files(files)
+
+    for item in _walk_directory_tree(tree):
+        if isinstance(item, tuple):
+            yield item
+        else:
+            yield (START, 'File', _file_attributes(item, item.name, next(digests)))
+            yield (END, 'File')
 
-                    del file_info
-                else:
-                    del file_info.fullpathname_splitted[0]
-                    sub_files.append(file_info)
-            if len(sub_files) > 0:
-                _file_hierarchy(sub_files, last_tag=current_tag)
 
-    def _keyfunc(obj):
-        return obj.fullpathname_splitted[0]
+def create_flat_content_tag(root_element, package_info, hash_algorithms, hash_engine=None):
+    return append_elements(root_element, flat_content_events(package_info, hash_algorithms, hash_engine))
 
-    _file_hierarchy(package_info.files, payload_tag=root_element)
 
-    return root_element
+def create_hierarchic_content_tag(root_element, package_info, hash_algorithms, hash_engine=None):
+    return append_elements(root_element, hierarchic_content_events(package_info, hash_algorithms, hash_engine))
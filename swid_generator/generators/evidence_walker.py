@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import stat
+import time
+from fnmatch import fnmatch
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+
+class _DirEntry(object):
+    """
+    Minimal replacement of ``os.DirEntry`` for Pythons without ``scandir``.
+    """
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._lstat = None
+        self._stat = None
+
+    def stat(self, follow_symlinks=True):
+        if not follow_symlinks:
+            if self._lstat is None:
+                self._lstat = os.lstat(self.path)
+            return self._lstat
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+    def is_symlink(self):
+        return stat.S_ISLNK(self.stat(follow_symlinks=False).st_mode)
+
+    def is_dir(self):
+        try:
+            return stat.S_ISDIR(self.stat().st_mode)
+        except OSError:
+            return False
+
+
+def _scandir(path):
+    if scandir is not None:
+        return list(scandir(path))
+    return [_DirEntry(path, name) for name in os.listdir(path)]
+
+
+class EvidenceWalker(object):
+    """
+    Lists the files below a folder for evidence SWID tags.
+
+    The files are returned in the order of ``os.walk`` (top-down, in directory
+    order), with the same paths. Every file costs exactly one ``stat`` call,
+    whose result is taken from the directory entry, the type of an entry is
+    usually known without any call. Directories which can not be read are
+    skipped, as ``os.walk`` does. Symbolic links to directories are not followed.
+
+    Exclude patterns without a slash are matched against the names of files
+    and directories, patterns with a slash against their path relative to the
+    walked folder (e.g. ``var/cache/*``). Excluded directories are not entered.
+
+    """
+
+    def __init__(self, root, exclude=None, max_depth=None, one_file_system=False):
+        """
+        :param root: The folder to walk.
+        :param exclude: List of glob patterns of files and directories to skip.
+        :param max_depth: Maximum number of directory levels to descend below ``root``. None (default) for no limit.
+        :param one_file_system: Don't enter directories on other file systems than ``root``.
+        """
+        self.root = root
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.one_file_system = one_file_system
+
+        self.files = 0
+        self.directories = 0
+        self.excluded = 0
+        self.errors = 0
+        self._start_time = None
+        self._end_time = None
+
+    def _is_excluded(self, relative_path, name):
+        for pattern in self.exclude:
+            if fnmatch(relative_path if '/' in pattern else name, pattern):
+                return True
+        return False
+
+    def walk(self):
+        """
+        Walk the folder lazily.
+
+        :return: Iterator of (path, stat result) tuples of all files. The stat result follows symbolic links.
+        """
+        self._start_time = time.time()
+        self._end_time = None
+        root_device = os.stat(self.root).st_dev if self.one_file_system else None
+
+        # (path, path relative to root, depth)
+        stack = [(self.root, '', 0)]
+        while stack:
+            dirpath, relative_dirpath, depth = stack.pop()
+            try:
+                entries = _scandir(dirpath)
+            except OSError:
+                self.errors += 1
+                continue
+            self.directories += 1
+
+            subdirectories = []
+            for entry in entries:
+                relative_path = relative_dirpath + entry.name
+                if self.exclude and self._is_excluded(relative_path, entry.name):
+                    self.excluded += 1
+                    continue
+
+                if entry.is_dir():
+                    if entry.is_symlink() or (self.max_depth is not None and depth >= self.max_depth):
+                        continue
+                    if root_device is not None and entry.stat(follow_symlinks=False).st_dev != root_device:
+                        continue
+                    subdirectories.append((entry.path, relative_path + '/', depth + 1))
+                    continue
+
+                self.files += 1
+                yield '/'.join((dirpath, entry.name)), entry.stat()
+
+            stack.extend(reversed(subdirectories))
+
+        self._end_time = time.time()
+
+    @property
+    def elapsed(self):
+        """
+        Seconds spent walking so far.
+        """
+        if self._start_time is None:
+            return 0.0
+        return (self._end_time or time.time()) - self._start_time
+
+    def get_stats(self):
+        """
+        :return: Dictionary with the numbers of files, directories, excluded entries and unreadable
+                 directories, the elapsed time and the files and directories per second.
+        """
+        elapsed = self.elapsed
+        return {
+            'files': self.files,
+            'directories': self.directories,
+            'excluded': self.excluded,
+            'errors': self.errors,
+            'elapsed': elapsed,
+            'files_per_second': self.files / elapsed if elapsed > 0 else 0.0,
+            'directories_per_second': self.directories / elapsed if elapsed > 0 else 0.0
+        }
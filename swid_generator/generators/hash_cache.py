@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import sqlite3
+import time
+
+from .utils import HASH_ALGORITHMS
+
+
+class HashCache(object):
+    """
+    Persistent cache of file digests, stored in a SQLite database.
+
+    The digests of a file are stored under the identity of its stat result
+    (device, inode, size and modification time in nanoseconds). As long as
+    none of these change, the file is assumed to be unchanged and doesn't
+    need to be hashed again.
+
+    The number of cached files is bounded: when the cache is closed, the
+    entries which have not been used for the longest time are evicted.
+
+    Several runs may share the cache. New digests are written in short
+    transactions of ``batch_size`` files, so the database is never locked
+    while files are hashed. If the database stays locked by another run for
+    longer than ``timeout`` seconds, the cache is skipped: the file is hashed
+    or its digests are not stored.
+
+    """
+    batch_size = 1000
+    timeout = 1.0
+
+    def __init__(self, path, max_entries):
+        """
+        :param path: Path to the SQLite database. Missing parent folders are created.
+        :param max_entries: Maximum number of files kept in the cache.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._used_keys = []
+        # Stat identity => digests, which are not written yet
+        self._pending = {}
+        self._timestamp = int(time.time())
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            # A daemon shares the cache between its threads, which never use it at the same time
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS file_hashes ('
+                'device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, '
+                'sha256 TEXT, sha384 TEXT, sha512 TEXT, last_used INTEGER, '
+                'PRIMARY KEY (device, inode, size, mtime_ns))')
+        return self._connection
+
+    @staticmethod
+    def get_key(file_path):
+        """
+        Return the stat identity of a file, used as cache key.
+        """
+        stat_result = os.stat(file_path)
+        mtime_ns = getattr(stat_result, 'st_mtime_ns', None)
+        if mtime_ns is None:
+            mtime_ns = int(stat_result.st_mtime * 1000000000)
+        return stat_result.st_dev, stat_result.st_ino, stat_result.st_size, mtime_ns
+
+    def _select(self, key):
+        return self._connect().execute(
+            'SELECT sha256, sha384, sha512 FROM file_hashes '
+            'WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?', key).fetchone()
+
+    def lookup(self, key, hash_algorithms):
+        """
+        Look up the digests of a file.
+
+        :param key: The stat identity of the file, see ``get_key``.
+        :param hash_algorithms: Names of the required algorithms.
+        :return: Dictionary (algorithm name -> hex digest) or None if not all digests are cached.
+        """
+        cached = dict(self._pending.get(tuple(key), {}))
+        if not all(algorithm in cached for algorithm in hash_algorithms):
+            try:
+                row = self._select(key)
+            except sqlite3.OperationalError:
+                # Locked by another run, the file is hashed instead
+                row = None
+            if row is not None:
+                cached.update((algorithm, digest) for algorithm, digest in zip(HASH_ALGORITHMS, row)
+                              if digest is not None and algorithm not in cached)
+
+        if all(algorithm in cached for algorithm in hash_algorithms):
+            self.hits += 1
+            self._used_keys.append(key)
+            return dict((algorithm, cached[algorithm]) for algorithm in hash_algorithms)
+
+        self.misses += 1
+        return None
+
+    def store(self, key, digests):
+        """
+        Store the digests of a file. Digests of other algorithms cached before are kept.
+        The digests are written with the next batch, see ``flush``.
+
+        :param key: The stat identity of the file, see ``get_key``.
+        :param digests: Dictionary (algorithm name -> hex digest).
+        """
+        self._pending.setdefault(tuple(key), {}).update(digests)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _write(self, statements):
+        """
+        Run the statements in one transaction, nothing is written if the database stays locked.
+
+        :param statements: Function, which executes the statements on the connection.
+        """
+        try:
+            connection = self._connect()
+            statements(connection)
+            connection.commit()
+        except sqlite3.OperationalError:
+            if self._connection is not None:
+                self._connection.rollback()
+
+    def flush(self):
+        """
+        Write the pending digests to the database.
+        """
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        def insert(connection):
+            for key, digests in pending.items():
+                row = self._select(key)
+                if row is None:
+                    row = (None,) * len(HASH_ALGORITHMS)
+                values = [digests.get(algorithm, cached) for algorithm, cached in zip(HASH_ALGORITHMS, row)]
+                connection.execute('INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   key + tuple(values) + (self._timestamp,))
+        self._write(insert)
+
+    def close(self):
+        """
+        Write the pending digests, mark the used entries, evict the least recently used entries
+        and write the cache to disk.
+        """
+        self.flush()
+        if self._connection is None:
+            return
+
+        used_keys, self._used_keys = self._used_keys, []
+
+        def evict(connection):
+            connection.executemany(
+                'UPDATE file_hashes SET last_used = ? '
+                'WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?',
+                ((self._timestamp,) + tuple(key) for key in used_keys))
+            connection.execute(
+                'DELETE FROM file_hashes WHERE rowid IN ('
+                'SELECT rowid FROM file_hashes ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+        self._write(evict)
+        self._connection.close()
+        self._connection = None
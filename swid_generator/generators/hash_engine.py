@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+from multiprocessing.pool import ThreadPool
+
+from .utils import create_hashes, get_hash_algorithms
+
+
+class HashEngine(object):
+    """
+    Computes the file digests for the payload of a SWID tag.
+
+    Every file is read only once, regardless of the number of requested
+    algorithms. With more than one job the files are spread across a pool of
+    threads. ``hashlib`` releases the GIL while hashing, so the threads run in
+    parallel. The digests are always returned in the order of the given files.
+
+    If a ``HashCache`` is given, only files which are not found in the cache
+    are read. The cache is only accessed from the calling thread, and it is
+    closed by its creator, since it may be shared by several engines.
+
+    Optionally the digests recorded by the package manager (``package_digests``
+    of the ``FileInfo``) are used instead of reading the file, if they cover
+    all requested algorithms. In ``verify`` mode this is only done as long as
+    size and modification time of the file match the package database.
+
+    Files with precomputed ``digests`` (e.g. from a package file, hashed while
+    the package is read) are not read again.
+
+    """
+    chunksize = 16
+    package_digest_modes = ('verify', 'trust')
+
+    def __init__(self, hash_algorithms, jobs=1, hash_cache=None, package_digests=None):
+        """
+        :param hash_algorithms: Comma separated list of the hash algorithms (e.g. "sha256,sha512").
+        :param jobs: Number of files which are hashed in parallel.
+        :param hash_cache: Optional HashCache()-Object with the digests of previous runs.
+        :param package_digests: None, "verify" or "trust". Whether to use the digests of the package database.
+        """
+        assert package_digests is None or package_digests in self.package_digest_modes
+        self.hash_algorithms = get_hash_algorithms(hash_algorithms)
+        self.jobs = jobs
+        self.hash_cache = hash_cache
+        self.package_digests = package_digests
+        self._pool = None
+
+    def _hash_file(self, file_info):
+        if file_info.digests is not None:
+            return dict((algorithm, file_info.digests[algorithm]) for algorithm in self.hash_algorithms)
+        return create_hashes(file_info.actual_full_pathname, self.hash_algorithms)
+
+    def hash_files(self, files):
+        """
+        Compute the digests of all given files.
+
+        :param files: Iterable of FileInfo()-Objects.
+        :return: Iterator of dictionaries (algorithm name -> hex digest), in the order of the files.
+        """
+        if self.hash_cache is not None or self.package_digests is not None:
+            return self._hash_files_with_lookup(files)
+        return self._hash_files(files)
+
+    def _hash_files(self, files):
+        if self.jobs <= 1:
+            return (self._hash_file(file_info) for file_info in files)
+
+        if self._pool is None:
+            self._pool = ThreadPool(self.jobs)
+        return self._pool.imap(self._hash_file, files, self.chunksize)
+
+    def _get_package_digests(self, file_info):
+        """
+        Return the digests of the package database, if they can be used for the file.
+        """
+        package_digests = file_info.package_digests
+        if package_digests is None or not all(algorithm in package_digests for algorithm in self.hash_algorithms):
+            return None
+
+        if self.package_digests == 'verify':
+            size, mtime = file_info.package_stat
+            stat_result = os.stat(file_info.actual_full_pathname)
+            if stat_result.st_size != size or (mtime is not None and int(stat_result.st_mtime) != mtime):
+                return None
+
+        return dict((algorithm, package_digests[algorithm]) for algorithm in self.hash_algorithms)
+
+    def _lookup(self, file_info):
+        """
+        Look up the digests of a file without reading it.
+
+        :return: Tuple of the digests (or None) and the hash cache key (or None).
+        """
+        if self.package_digests is not None:
+            digests = self._get_package_digests(file_info)
+            if digests is not None:
+                return digests, None
+
+        if self.hash_cache is not None:
+            key = self.hash_cache.get_key(file_info.actual_full_pathname)
+            return self.hash_cache.lookup(key, self.hash_algorithms), key
+
+        return None, None
+
+    def _hash_files_with_lookup(self, files):
+        files = list(files)
+        lookups = [self._lookup(file_info) for file_info in files]
+
+        missing_files = [file_info for file_info, (digests, _) in zip(files, lookups) if digests is None]
+        computed_digests = self._hash_files(missing_files)
+
+        for digests, key in lookups:
+            if digests is None:
+                digests = next(computed_digests)
+                if key is not None:
+                    self.hash_cache.store(key, digests)
+            yield digests
+
+    def close(self):
+        """
+        Shut down the thread pool, if one was started, and write the new digests to the hash cache.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self.hash_cache is not None:
+            self.hash_cache.flush()
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import io
+import json
+import os
+
+
+class InventoryState(object):
+    """
+    The state of the SWID inventory at the end of a run.
+
+    For every installed package the name, the version, the Software-ID and
+    the SHA256 digest of the generated SWID tag are stored in a JSON file.
+    The next run compares the installed packages against it to find the
+    added, upgraded and removed packages.
+
+    If the options which influence the content of the tags (e.g. regid or
+    ``--full``) differ from the previous run, or the state file can not be
+    parsed or has an unexpected structure, all packages count as added.
+
+    """
+    format_version = 1
+
+    def __init__(self, path, options=None):
+        """
+        :param path: Path to the state file. It does not need to exist.
+        :param options: Dictionary with the options which influence the content of the tags.
+        """
+        self.path = path
+        self.options = options or {}
+        self.previous = {}
+        self.current = {}
+
+        if os.path.exists(path):
+            with io.open(path, 'r', encoding='utf-8') as state_file:
+                try:
+                    state = json.load(state_file)
+                except ValueError:
+                    state = None
+            if self._is_valid(state) and state['format'] == self.format_version and state['options'] == self.options:
+                self.previous = state['packages']
+
+    @staticmethod
+    def _is_valid(state):
+        """
+        Check the structure of a parsed state file, e.g. one written by hand or by another program.
+        """
+        if not isinstance(state, dict) or 'format' not in state or 'options' not in state:
+            return False
+        packages = state.get('packages')
+        if not isinstance(packages, dict):
+            return False
+        for entries in packages.values():
+            if not isinstance(entries, list):
+                return False
+            for entry in entries:
+                if not isinstance(entry, dict) or 'version' not in entry or 'software_id' not in entry:
+                    return False
+        return True
+
+    def _get_previous_entry(self, package_info):
+        for entry in self.previous.get(package_info.package, []):
+            if entry['version'] == package_info.version:
+                return entry
+        return None
+
+    def is_changed(self, package_info):
+        """
+        Whether the package was added or upgraded since the previous run.
+        """
+        return self._get_previous_entry(package_info) is None
+
+    def carry_over(self, package_info):
+        """
+        Keep the entry of the previous run for a package which is still installed.
+        """
+        entry = self._get_previous_entry(package_info)
+        if entry is not None:
+            self.current.setdefault(package_info.package, []).append(entry)
+
+    def record(self, package_info, software_id, digest):
+        """
+        Record the SWID tag generated for a package in this run.
+
+        :param package_info: The PackageInfo()-Object of the package.
+        :param software_id: The Software-ID of the SWID tag.
+        :param digest: The SHA256 hex digest of the SWID tag.
+        """
+        self.current.setdefault(package_info.package, []).append({
+            'version': package_info.version,
+            'software_id': software_id,
+            'digest': digest
+        })
+
+    def get_removed(self):
+        """
+        Return the entries of the previous run whose package is no longer installed
+        or was upgraded to another version.
+
+        :return: List of dictionaries with the keys ``package``, ``version`` and ``software_id``.
+        """
+        removed = []
+        for package_name in sorted(self.previous):
+            current_versions = [entry['version'] for entry in self.current.get(package_name, [])]
+            for entry in self.previous[package_name]:
+                if entry['version'] not in current_versions:
+                    removed.append({'package': package_name,
+                                    'version': entry['version'],
+                                    'software_id': entry['software_id']})
+        return removed
+
+    def save(self):
+        """
+        Write the state of this run. The file is replaced atomically.
+        """
+        state = {
+            'format': self.format_version,
+            'options': self.options,
+            'packages': self.current
+        }
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'wb') as state_file:
+            state_file.write(json.dumps(state, sort_keys=True).encode('utf-8'))
+        os.rename(temporary_path, self.path)
+
+
+def write_removed_list(path, removed):
+    """
+    Write the list of removed packages as JSON document.
+
+    :param path: Path to the output file.
+    :param removed: List as returned by ``InventoryState.get_removed``.
+    """
+    with open(path, 'wb') as removed_file:
+        removed_file.write(json.dumps(removed, sort_keys=True, indent=2, separators=(',', ': ')).encode('utf-8') + b'\n')
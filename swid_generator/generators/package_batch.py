@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import collections
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+
+from ..exceptions import PackageFileError
+from .hash_cache import HashCache
+from .swid_generator import create_swid_tags
+from .utils import create_hashes
+
+
+def find_package_files(folder, suffixes):
+    """
+    Return the paths of all package files below a folder, e.g. the pool of a
+    repository mirror, in sorted order. Symbolic links to folders are not followed.
+
+    :param folder: The folder to search.
+    :param suffixes: Tuple of the file name suffixes of package files.
+    :return: Sorted list of paths.
+    """
+    paths = []
+    for dir_path, _, file_names in os.walk(folder):
+        paths.extend(os.path.join(dir_path, file_name) for file_name in file_names if file_name.endswith(suffixes))
+    return sorted(paths)
+
+
+class PackageTagCache(object):
+    """
+    Persistent cache of the SWID tags generated from package files, stored in
+    a SQLite database.
+
+    A tag is stored under the SHA256 digest of the package file and the
+    options which influence the content of the tag. A package file with the
+    same content is only hashed, but not read again, so rerunning over a
+    repository mirror only processes the new packages. The digest of a
+    package file is remembered under its stat identity (see
+    ``HashCache.get_key``), unchanged package files are therefore not even
+    hashed.
+
+    The number of cached tags is bounded: when the cache is closed, the tags
+    which have not been used for the longest time are evicted, together with
+    the digests of package files without a cached tag. At most as many
+    digests as tags are kept.
+
+    Several runs may share the cache. Every tag is written in its own short
+    transaction. If the database stays locked by another run for longer than
+    ``timeout`` seconds, the cache is skipped for the package file.
+
+    """
+    timeout = 1.0
+
+    def __init__(self, path, options, max_entries):
+        """
+        :param path: Path to the SQLite database. Missing parent folders are created.
+        :param options: Dictionary with the options which influence the content of the tags.
+        :param max_entries: Maximum number of tags kept in the cache, for all options together.
+        """
+        self.path = path
+        self.options = json.dumps(options, sort_keys=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._used_digests = []
+        self._timestamp = int(time.time())
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS package_digests ('
+                'device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, sha256 TEXT, '
+                'PRIMARY KEY (device, inode, size, mtime_ns))')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS package_tags ('
+                'sha256 TEXT, options TEXT, tag BLOB, last_used INTEGER, '
+                'PRIMARY KEY (sha256, options))')
+        return self._connection
+
+    def lookup_digest(self, key):
+        """
+        Look up the SHA256 digest of a package file by its stat identity.
+
+        :param key: The stat identity of the package file, see ``HashCache.get_key``.
+        :return: The digest or None.
+        """
+        rows = self._read('SELECT sha256 FROM package_digests '
+                          'WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?', key)
+        return rows[0][0] if rows else None
+
+    def store_digest(self, key, digest):
+        """
+        Remember the SHA256 digest of a package file under its stat identity.
+        """
+        self._write(lambda connection: connection.execute('INSERT OR REPLACE INTO package_digests VALUES (?, ?, ?, ?, ?)',
+                                                           tuple(key) + (digest,)))
+
+    def get_tag_digests(self):
+        """
+        Return the set of the digests of the package files, whose tags are stored with the options of this cache.
+        """
+        return frozenset(row[0] for row in self._read('SELECT sha256 FROM package_tags WHERE options = ?', (self.options,)))
+
+    def _read(self, query, parameters):
+        """
+        Return the rows of a query, no rows if the database stays locked.
+        """
+        try:
+            return self._connect().execute(query, parameters).fetchall()
+        except sqlite3.OperationalError:
+            return []
+
+    def _write(self, statements):
+        """
+        Run the statements in one transaction, nothing is written if the database stays locked.
+
+        :param statements: Function, which executes the statements on the connection.
+        """
+        try:
+            connection = self._connect()
+            statements(connection)
+            connection.commit()
+        except sqlite3.OperationalError:
+            if self._connection is not None:
+                self._connection.rollback()
+
+    def lookup(self, digest):
+        """
+        Look up the SWID tag of a package file.
+
+        :param digest: The SHA256 digest of the package file.
+        :return: The SWID tag as bytestring or None.
+        """
+        rows = self._read('SELECT tag FROM package_tags WHERE sha256 = ? AND options = ?', (digest, self.options))
+        if not rows:
+            return None
+
+        self.hits += 1
+        self._used_digests.append(digest)
+        return bytes(rows[0][0])
+
+    def store(self, digest, swidtag):
+        """
+        Store the SWID tag of a package file.
+
+        :param digest: The SHA256 digest of the package file.
+        :param swidtag: The SWID tag as bytestring.
+        """
+        self.misses += 1
+        self._write(lambda connection: connection.execute('INSERT OR REPLACE INTO package_tags VALUES (?, ?, ?, ?)',
+                                                          (digest, self.options, sqlite3.Binary(swidtag), self._timestamp)))
+
+    def close(self):
+        """
+        Mark the used tags, evict the least recently used tags and write the cache to disk.
+        """
+        if self._connection is None:
+            return
+
+        used_digests, self._used_digests = self._used_digests, []
+
+        def evict(connection):
+            connection.executemany(
+                'UPDATE package_tags SET last_used = ? WHERE sha256 = ? AND options = ?',
+                ((self._timestamp, digest, self.options) for digest in used_digests))
+            connection.execute(
+                'DELETE FROM package_tags WHERE rowid IN ('
+                'SELECT rowid FROM package_tags ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+            # Copies of a package file in other places (e.g. snapshots of a mirror) share the tag, the newest are kept
+            connection.execute('DELETE FROM package_digests WHERE sha256 NOT IN (SELECT sha256 FROM package_tags)')
+            connection.execute(
+                'DELETE FROM package_digests WHERE rowid IN ('
+                'SELECT rowid FROM package_digests ORDER BY rowid DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+        self._write(evict)
+        self._connection.close()
+        self._connection = None
+
+
+# Set in every worker process by _init_worker
+_worker_context = {}
+
+
+def _init_worker(environment_registry, swid_args, tag_digests=frozenset()):
+    _worker_context['environment_registry'] = environment_registry
+    _worker_context['swid_args'] = swid_args
+    _worker_context['tag_digests'] = tag_digests
+
+
+def _create_tag(file_path, hash_file=False):
+    """
+    Create the SWID tag of a package file.
+
+    :param hash_file: Whether the SHA256 digest of the package file is needed for the tag cache.
+    :return: Tuple of the digest (or None) and the SWID tag. The tag is None, if the
+             digest shows that the tag was cached by a previous run.
+    """
+    digest = None
+    if hash_file:
+        digest = create_hashes(file_path, ('sha256',))['sha256']
+        if digest in _worker_context['tag_digests']:
+            return digest, None
+
+    environment = _worker_context['environment_registry'].get_package_file_environment(file_path)
+    swid_tags = create_swid_tags(environment=environment, file_path=file_path, **_worker_context['swid_args'])
+    try:
+        return digest, next(swid_tags)
+    finally:
+        swid_tags.close()
+
+
+def create_package_file_tags(file_paths, environment_registry, swid_args, jobs=1, tag_cache=None, errors=None):
+    """
+    Return the SWID tags of many package files, e.g. of a repository mirror.
+
+    The package files are processed by ``jobs`` worker processes. At most
+    twice as many package files as workers are in flight, and the tags are
+    returned in the order of ``file_paths``, independent of which worker
+    finishes first.
+
+    :param file_paths: List of paths to the package files.
+    :param environment_registry: EnvironmentRegistry()-Object, which chooses the environment by the file name suffix.
+    :param swid_args: Dictionary with the keyword arguments of ``create_swid_tags`` for every package file,
+                      without ``environment`` and ``file_path``. The ``os_string`` and the ``architecture``
+                      should be given, since the environment of a package file may not be installed.
+    :param jobs: Number of worker processes. With 1, the package files are processed in this process.
+    :param tag_cache: Optional PackageTagCache()-Object with the tags of previous runs.
+    :param errors: Optional list. Package files which can not be read, for whatever reason, are skipped
+                   and appended to it as tuple (path, error message). Without a list the error is raised.
+
+    Returns:
+        A generator object for the SWID tags as UTF-8 encoded bytestrings.
+
+    """
+    swid_args = dict(swid_args, jobs=1, hash_cache=None, streaming=False, inventory_state=None)
+    # The workers hash the package files with an unknown stat identity and skip those with a cached tag
+    tag_digests = tag_cache.get_tag_digests() if tag_cache is not None else frozenset()
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, _init_worker, (environment_registry, swid_args, tag_digests))
+    else:
+        pool = None
+        _init_worker(environment_registry, swid_args, tag_digests)
+
+    pending = collections.deque()
+    remaining = iter(file_paths)
+
+    def submit(file_path):
+        key = digest = cached = result = None
+        try:
+            if tag_cache is not None:
+                key = HashCache.get_key(file_path)
+                digest = tag_cache.lookup_digest(key)
+                if digest is not None:
+                    cached = tag_cache.lookup(digest)
+            if cached is None and pool is not None:
+                result = pool.apply_async(_create_tag, (file_path, tag_cache is not None and digest is None))
+        except (IOError, OSError) as e:
+            # Raised when the tag of this package file is requested
+            result = e
+        pending.append((file_path, key, digest, cached, result))
+
+    def fill():
+        while len(pending) < 2 * jobs:
+            file_path = next(remaining, None)
+            if file_path is None:
+                return
+            submit(file_path)
+
+    try:
+        fill()
+        while pending:
+            file_path, key, digest, swidtag, result = pending.popleft()
+            fill()
+
+            if swidtag is None:
+                try:
+                    if isinstance(result, Exception):
+                        raise result
+                    if result is not None:
+                        file_digest, swidtag = result.get()
+                    else:
+                        file_digest, swidtag = _create_tag(file_path, tag_cache is not None and digest is None)
+                    cached = swidtag is None
+                    if cached:
+                        swidtag = tag_cache.lookup(file_digest)
+                    if swidtag is None:
+                        # The cache is locked by another run, or the tag was evicted since the tag digests were read
+                        cached = False
+                        _, swidtag = _create_tag(file_path)
+                except (PackageFileError, IOError, OSError) as e:
+                    if errors is None:
+                        raise
+                    errors.append((file_path, str(e)))
+                    continue
+                except Exception as e:
+                    # A corrupt package file, which the reader doesn't detect, must not end the batch
+                    if errors is None:
+                        raise
+                    errors.append((file_path, 'Unexpected error {0}: {1}'.format(type(e).__name__, e)))
+                    continue
+
+                if tag_cache is not None:
+                    if digest is None:
+                        digest = file_digest
+                        tag_cache.store_digest(key, digest)
+                    if not cached:
+                        tag_cache.store(digest, swidtag)
+
+            yield swidtag
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if tag_cache is not None:
+            tag_cache.close()
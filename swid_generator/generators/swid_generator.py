@@ -1,40 +1,47 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
+import hashlib
+from functools import partial
+from itertools import chain
 from xml.etree import ElementTree as ET
 from swid_generator.signature_template import SIGNATURE
 from swid_generator.package_info import PackageInfo
 from .utils import create_unique_id, create_software_id, create_system_id
 from .content_creator import create_flat_content_tag, create_hierarchic_content_tag
+from .content_creator import flat_content_events, hierarchic_content_events
+from .xml_writer import START, END, build_element, element_events, serialize_events, serialize_events_pretty
+from .hash_engine import HashEngine
 
 ROLE = 'tagCreator'
 VERSION_SCHEME = 'alphanumeric'
 XMLNS = 'http://standards.iso.org/iso/19770/-2/2015/schema.xsd'
 XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>'
+DSIG_NS = 'http://www.w3.org/2000/09/xmldsig#'
 N8060 = 'http://csrc.nist.gov/schema/swid/2015-extensions/swid-2015-extensions-1.0.xsd'
 SHA256NS = 'http://www.w3.org/2001/04/xmlenc#sha256'
 SHA384NS = 'http://www.w3.org/2001/04/xmldsig-more#sha384'
 SHA512NS = 'http://www.w3.org/2001/04/xmlenc#sha512'
 
 
-def _create_flat_payload_tag(package_info, hash_algorithms):
+def _create_flat_payload_tag(package_info, hash_algorithms, hash_engine=None):
     payload = ET.Element('Payload')
-    return create_flat_content_tag(payload, package_info, hash_algorithms)
+    return create_flat_content_tag(payload, package_info, hash_algorithms, hash_engine)
 
 
-def _create_flat_evidence_tag(package_info, hash_algorithms):
+def _create_flat_evidence_tag(package_info, hash_algorithms, hash_engine=None):
     evidence = ET.Element('Evidence')
-    return create_flat_content_tag(evidence, package_info, hash_algorithms)
+    return create_flat_content_tag(evidence, package_info, hash_algorithms, hash_engine)
 
 
-def _create_hierarchic_payload_tag(package_info, hash_algorithms):
+def _create_hierarchic_payload_tag(package_info, hash_algorithms, hash_engine=None):
     payload = ET.Element('Payload')
-    return create_hierarchic_content_tag(payload, package_info, hash_algorithms)
+    return create_hierarchic_content_tag(payload, package_info, hash_algorithms, hash_engine)
 
 
-def _create_hierarchic_evidence_tag(package_info, hash_algorithms):
+def _create_hierarchic_evidence_tag(package_info, hash_algorithms, hash_engine=None):
     evidence = ET.Element('Evidence')
-    return create_hierarchic_content_tag(evidence, package_info, hash_algorithms)
+    return create_hierarchic_content_tag(evidence, package_info, hash_algorithms, hash_engine)
 
 
 def all_matcher(ctx):
@@ -51,65 +58,125 @@ def software_id_matcher(ctx, value):
     return software_id == value
 
 
-def create_software_identity_element(ctx, from_package_file=False, from_folder=False):
+def targets_matcher(ctx, package_names=frozenset(), software_ids=frozenset()):
+    if ctx['package_info'].package in package_names:
+        return True
+    if software_ids:
+        unique_id = create_unique_id(ctx['package_info'], ctx['os_string'], ctx['architecture'])
+        return create_software_id(ctx['regid'], unique_id) in software_ids
+    return False
+
+
+def software_identity_events(ctx, from_package_file=False, from_folder=False):
     """
-    This method creates the SoftwareIdentity-Tag for the SWID.
+    This method generates the events (see ``xml_writer``) of the SoftwareIdentity-Tag for the SWID.
+    The file list is collected when the first event is requested, the files are hashed
+    while the events of the Payload- or Evidence-Tag are consumed.
     :param from_folder: Root-Folder for the Evidence-Tag.
     :param ctx: Information of package and arguments given by User (example: full-flag, regid, etc.)
     :param from_package_file: Flag if the File-List comes from a Package-File or a local installed Package.
-    :return: Whole Identification-Tag with all Information given.
+    :return: Generator of the events of the whole Identification-Tag with all Information given.
     """
-    software_identity = ET.Element('SoftwareIdentity')
-    software_identity.set('xmlns', XMLNS)
-    software_identity.set('xmlns:n8060', N8060)
-    software_identity.set('name', ctx['package_info'].package)
-    software_identity.set('tagId', create_unique_id(ctx['package_info'], ctx['os_string'], ctx['architecture']))
-    software_identity.set('version', ctx['package_info'].version)
-    software_identity.set('versionScheme', VERSION_SCHEME)
-
-    entity = ET.SubElement(software_identity, 'Entity')
-    entity.set('name', ctx['entity_name'])
-    entity.set('regid', ctx['regid'])
-    entity.set('role', ROLE)
-
-    product_meta = ET.SubElement(software_identity, 'Meta')
-    product_meta.set('product', create_system_id(ctx['os_string'], ctx['architecture']))
+    software_identity = [
+        ('xmlns', XMLNS),
+        ('xmlns:n8060', N8060),
+        ('name', ctx['package_info'].package),
+        ('tagId', create_unique_id(ctx['package_info'], ctx['os_string'], ctx['architecture'])),
+        ('version', ctx['package_info'].version),
+        ('versionScheme', VERSION_SCHEME)
+    ]
 
     if ctx['full']:
 
         if 'sha256' in ctx['hash_algorithms']:
-            software_identity.set('xmlns:SHA256', SHA256NS)
+            software_identity.append(('xmlns:SHA256', SHA256NS))
         if 'sha384' in ctx['hash_algorithms']:
-            software_identity.set('xmlns:SHA384', SHA384NS)
+            software_identity.append(('xmlns:SHA384', SHA384NS))
         if 'sha512' in ctx['hash_algorithms']:
-            software_identity.set('xmlns:SHA512', SHA512NS)
+            software_identity.append(('xmlns:SHA512', SHA512NS))
 
         if from_package_file:
-            ctx['package_info'].files.extend(ctx['environment'].get_files_from_packagefile(ctx['file_path']))
+            ctx['package_info'].files.extend(ctx['environment'].get_files_from_packagefile(ctx['file_path'],
+                                                                                          ctx['hash_algorithms'],
+                                                                                          ctx['package_digests']))
         elif from_folder:
-            ctx['package_info'].files.extend(ctx['environment'].get_files_from_folder(ctx['evidence_path'], ctx['new_root_path']))
+            ctx['package_info'].files.extend(ctx['environment'].get_files_from_folder(ctx['evidence_path'], ctx['new_root_path'],
+                                                                                     ctx['evidence_walker']))
         else:
-            ctx['package_info'].files.extend(ctx['environment'].get_files_for_package(ctx['package_info']))
+            files = ctx['environment'].get_files_for_package(ctx['package_info'])
+            if ctx['package_digests'] is not None:
+                ctx['environment'].add_package_digests(ctx['package_info'], files)
+            ctx['package_info'].files.extend(files)
+
+    yield (START, 'SoftwareIdentity', software_identity)
 
+    yield (START, 'Entity', [('name', ctx['entity_name']), ('regid', ctx['regid']), ('role', ROLE)])
+    yield (END, 'Entity')
+
+    yield (START, 'Meta', [('product', create_system_id(ctx['os_string'], ctx['architecture']))])
+    yield (END, 'Meta')
+
+    if ctx['full']:
+        content_tag = 'Evidence' if from_folder else 'Payload'
         if ctx['hierarchic']:
-            if from_folder:
-                content_tag = _create_hierarchic_evidence_tag(ctx['package_info'], ctx['hash_algorithms'])
-            else:
-                content_tag = _create_hierarchic_payload_tag(ctx['package_info'], ctx['hash_algorithms'])
+            content_events = hierarchic_content_events(ctx['package_info'], ctx['hash_algorithms'], ctx.get('hash_engine'))
         else:
-            if from_folder:
-                content_tag = _create_flat_evidence_tag(ctx['package_info'], ctx['hash_algorithms'])
-            else:
-                content_tag = _create_flat_payload_tag(ctx['package_info'], ctx['hash_algorithms'])
+            content_events = flat_content_events(ctx['package_info'], ctx['hash_algorithms'], ctx.get('hash_engine'))
+
+        yield (START, content_tag, [])
+        for event in content_events:
+            yield event
+        yield (END, content_tag)
+
+    yield (END, 'SoftwareIdentity')
+
+
+def create_software_identity_element(ctx, from_package_file=False, from_folder=False):
+    """
+    This method creates the SoftwareIdentity-Tag for the SWID.
+    :param from_folder: Root-Folder for the Evidence-Tag.
+    :param ctx: Information of package and arguments given by User (example: full-flag, regid, etc.)
+    :param from_package_file: Flag if the File-List comes from a Package-File or a local installed Package.
+    :return: Whole Identification-Tag with all Information given.
+    """
+    return build_element(software_identity_events(ctx, from_package_file, from_folder))
 
-        software_identity.append(content_tag)
 
-    return software_identity
+def _serialize_swid_tag(ctx, pkcs12_file, streaming, from_package_file=False, from_folder=False):
+    """
+    Serialize the SWID tag of the current package of the context.
+
+    :return: The SWID tag as bytestring or, if streaming, an iterator of bytestring chunks.
+    """
+    # The events are consumed lazily, later changes of the context must not affect them
+    events = software_identity_events(dict(ctx), from_package_file, from_folder)
+
+    if pkcs12_file is None:
+        if ctx['pretty']:
+            chunks = chain([XML_DECLARATION.encode('utf-8') + b'\n'], serialize_events_pretty(events))
+        else:
+            chunks = chain([XML_DECLARATION.encode('utf-8')], serialize_events(events))
+        return chunks if streaming else b''.join(chunks)
+
+    software_identity = build_element(events)
+
+    ET.register_namespace('dsig', DSIG_NS)
+    signature_template_tree = ET.fromstring(SIGNATURE)
+    software_identity.append(signature_template_tree)
+
+    if ctx['pretty']:
+        swidtag = b''.join(serialize_events_pretty(element_events(software_identity, {DSIG_NS: 'dsig'})))
+        return XML_DECLARATION.encode('utf-8') + b'\n' + swidtag
+
+    swidtag = ET.tostring(software_identity, encoding='utf-8').replace(b'\n', b'')
+    return XML_DECLARATION.encode('utf-8') + swidtag
 
 
 def create_swid_tags(environment, entity_name, regid, os_string=None, architecture=None, hash_algorithms='sha256',
                      full=False, matcher=all_matcher, hierarchic=False, file_path=None, evidence_path=None,
-                     name=None, version=None, new_root_path=None, pkcs12_file=None):
+                     name=None, version=None, new_root_path=None, pkcs12_file=None, jobs=1, hash_cache=None,
+                     package_digests=None, inventory_state=None, changed_only=False, streaming=False, pretty=False,
+                     evidence_walker=None, packages=None):
     """
     Return SWID tags as utf8-encoded xml bytestrings for all available
     packages.
@@ -127,6 +194,24 @@ def create_swid_tags(environment, entity_name, regid, os_string=None, architectu
     :param hash_algorithms: Comma separated list of the hash algorithms to include in the SWID tag,
     :param full: Whether to include file payload. Default is False.
     :param matcher: A function that defines whether to return a tag or not. Default is a function that returns ``True`` for all tags.
+    :param jobs: Number of files which are hashed in parallel. Default is 1.
+    :param hash_cache: Optional HashCache()-Object with the file digests of previous runs.
+                       It is not used for package files, since their content is extracted anew on every run.
+    :param package_digests: Use the file digests of the package database instead of reading the files of installed
+                            packages. None (default), "verify" (only if size and modification time are unchanged)
+                            or "trust".
+    :param inventory_state: Optional InventoryState()-Object. The SWID tags of all installed packages are recorded in it.
+    :param changed_only: Only return the SWID tags of packages which were added or upgraded since the
+                         run recorded in ``inventory_state``.
+    :param streaming: Return every SWID tag as iterator of bytestring chunks, which are serialized while the
+                      files are hashed, instead of building the whole document in memory. Not possible with
+                      ``pkcs12_file``, since the signature needs the whole document. Every iterator must be
+                      consumed before the next SWID tag is requested.
+    :param pretty: Whether to write the SWID tags indented, one element per line. Default is False.
+    :param evidence_walker: Optional EvidenceWalker()-Object which lists the files of ``evidence_path``.
+    :param packages: Optional list of PackageInfo()-Objects of installed packages, which is used instead of
+                     ``environment.get_package_list()``, e.g. the packages of a targeted request or a list kept in
+                     memory between requests. The file index of the environment is not loaded for them.
 
     Returns:
         A generator object for all available SWID XML strings. The XML strings
@@ -145,29 +230,38 @@ def create_swid_tags(environment, entity_name, regid, os_string=None, architectu
         'hierarchic': hierarchic,
         'file_path': file_path,
         'evidence_path': evidence_path,
-        'new_root_path': new_root_path
+        'new_root_path': new_root_path,
+        'evidence_walker': evidence_walker,
+        'package_digests': package_digests,
+        'pretty': pretty,
+        'hash_engine': HashEngine(hash_algorithms, jobs, hash_cache if file_path is None else None, package_digests),
+        'packages': packages
     }
 
-    if os_string is None:
-        ctx['os_string'] = ctx['environment'].get_os_string()
+    try:
+        for swidtag in _create_swid_tags(ctx, matcher, name, version, pkcs12_file, inventory_state, changed_only, streaming):
+            yield swidtag
+    finally:
+        ctx['hash_engine'].close()
 
-    if architecture is None:
-        ctx['architecture'] = ctx['environment'].get_architecture()
+
+def _create_swid_tags(ctx, matcher, name, version, pkcs12_file, inventory_state=None, changed_only=False, streaming=False):
+    environment = ctx['environment']
+    file_path = ctx['file_path']
+    evidence_path = ctx['evidence_path']
+
+    if ctx['os_string'] is None:
+        ctx['os_string'] = environment.get_os_string()
+
+    if ctx['architecture'] is None:
+        ctx['architecture'] = environment.get_architecture()
 
     if file_path is not None:
         pi = environment.get_packageinfo_from_packagefile(file_path)
 
         ctx['package_info'] = pi
 
-        software_identity = create_software_identity_element(ctx, from_package_file=True)
-
-        if pkcs12_file is not None:
-            ET.register_namespace('dsig', "http://www.w3.org/2000/09/xmldsig#")
-            signature_template_tree = ET.fromstring(SIGNATURE)
-            software_identity.append(signature_template_tree)
-
-        swidtag = ET.tostring(software_identity, encoding='utf-8').replace(b'\n', b'')
-        yield XML_DECLARATION.encode('utf-8') + swidtag
+        yield _serialize_swid_tag(ctx, pkcs12_file, streaming, from_package_file=True)
 
     elif evidence_path is not None:
         pi = PackageInfo()
@@ -176,15 +270,7 @@ def create_swid_tags(environment, entity_name, regid, os_string=None, architectu
 
         ctx['package_info'] = pi
 
-        software_identity = create_software_identity_element(ctx, from_folder=True)
-
-        if pkcs12_file is not None:
-            ET.register_namespace('dsig', "http://www.w3.org/2000/09/xmldsig#")
-            signature_template_tree = ET.fromstring(SIGNATURE)
-            software_identity.append(signature_template_tree)
-
-        swidtag = ET.tostring(software_identity, encoding='utf-8').replace(b'\n', b'')
-        yield XML_DECLARATION.encode('utf-8') + swidtag
+        yield _serialize_swid_tag(ctx, pkcs12_file, streaming, from_folder=True)
 
     elif name is not None and version is not None:
         pi = PackageInfo()
@@ -194,18 +280,14 @@ def create_swid_tags(environment, entity_name, regid, os_string=None, architectu
         ctx['package_info'] = pi
         ctx['full'] = False
 
-        software_identity = create_software_identity_element(ctx)
-
-        if pkcs12_file is not None:
-            ET.register_namespace('dsig', "http://www.w3.org/2000/09/xmldsig#")
-            signature_template_tree = ET.fromstring(SIGNATURE)
-            software_identity.append(signature_template_tree)
-
-        swidtag = ET.tostring(software_identity, encoding='utf-8').replace(b'\n', b'')
-        yield XML_DECLARATION.encode('utf-8') + swidtag
+        yield _serialize_swid_tag(ctx, pkcs12_file, streaming)
 
     else:
-        pkg_info = environment.get_package_list()
+        pkg_info = ctx['packages'] if ctx['packages'] is not None else environment.get_package_list()
+
+        # Listing the files of all packages at once is much cheaper than one query per package
+        if ctx['full'] and matcher is all_matcher and not changed_only and ctx['packages'] is None:
+            environment.load_file_index()
 
         for pi in pkg_info:
 
@@ -213,13 +295,33 @@ def create_swid_tags(environment, entity_name, regid, os_string=None, architectu
 
             # Check if the software-id of the current package matches the targeted request
             if not matcher(ctx):
+                if inventory_state is not None:
+                    inventory_state.carry_over(pi)
+                continue
+
+            if changed_only and not inventory_state.is_changed(pi):
+                inventory_state.carry_over(pi)
                 continue
-            software_identity = create_software_identity_element(ctx)
 
-            if pkcs12_file is not None:
-                ET.register_namespace('dsig', "http://www.w3.org/2000/09/xmldsig#")
-                signature_template_tree = ET.fromstring(SIGNATURE)
-                software_identity.append(signature_template_tree)
+            swidtag = _serialize_swid_tag(ctx, pkcs12_file, streaming)
 
-            swidtag = ET.tostring(software_identity, encoding='utf-8').replace(b'\n', b'')
-            yield XML_DECLARATION.encode('utf-8') + swidtag
+            if inventory_state is not None:
+                unique_id = create_unique_id(pi, ctx['os_string'], ctx['architecture'])
+                record = partial(inventory_state.record, pi, create_software_id(ctx['regid'], unique_id))
+                if isinstance(swidtag, bytes):
+                    record(hashlib.sha256(swidtag).hexdigest())
+                else:
+                    swidtag = _record_chunks(swidtag, record)
+
+            yield swidtag
+
+
+def _record_chunks(chunks, record):
+    """
+    Pass the chunks of a streamed SWID tag through and record its SHA256 digest once it is complete.
+    """
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+    record(digest.hexdigest())
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+from .utils import create_software_id_index
+
+# With more targeted packages, the files of all packages are listed at once instead of one query per package
+FILE_INDEX_MIN_PACKAGES = 20
+
+
+def _index_by_name(packages):
+    packages_by_name = {}
+    for package_info in packages:
+        packages_by_name.setdefault(package_info.package, []).append(package_info)
+    return packages_by_name
+
+
+def _collect(targets, packages_by_name, software_id_index):
+    """
+    Look up every target as package name and as Software-ID.
+    """
+    packages = []
+    unmatched = []
+    seen = set()
+    for target in targets:
+        matching_packages = packages_by_name.get(target, [])
+        if not matching_packages and target in software_id_index:
+            matching_packages = [software_id_index[target]]
+        if not matching_packages:
+            unmatched.append(target)
+        for package_info in matching_packages:
+            if id(package_info) not in seen:
+                seen.add(id(package_info))
+                packages.append(package_info)
+    return packages, unmatched
+
+
+def resolve_targets(environment, regid, os_string, architecture, package_names=(), software_ids=()):
+    """
+    Look up the installed packages of a targeted request.
+
+    The package names are queried directly from the package manager, without
+    listing all installed packages. The Software-IDs are resolved through a
+    reverse index of the Software-IDs of the installed packages, which is
+    built once for all of them.
+
+    :param environment: The package management environment.
+    :param regid: The regid of the Software-IDs.
+    :param os_string: The OS string of the Software-IDs.
+    :param architecture: The architecture of the Software-IDs.
+    :param package_names: List of package names.
+    :param software_ids: List of Software-IDs.
+    :return: Tuple of the list of the matching PackageInfo()-Objects, in the order of the targets and
+             without duplicates, and the list of the targets without a matching package.
+    """
+    packages_by_name = {}
+    if package_names:
+        packages_by_name = _index_by_name(environment.get_packages_by_name(list(set(package_names))))
+
+    software_id_index = {}
+    if software_ids:
+        software_id_index = create_software_id_index(environment.get_package_list(), regid, os_string, architecture)
+
+    return _collect(list(package_names) + list(software_ids), packages_by_name, software_id_index)
+
+
+def match_targets(packages, targets, regid, os_string, architecture):
+    """
+    Resolve a mixed list of package names and Software-IDs against one
+    listing of the installed packages. Every target is looked up by name and
+    by Software-ID in a dictionary, so hundreds of targets cost no more than
+    the listing.
+
+    :param packages: The PackageInfo()-Objects of the installed packages.
+    :param targets: List of package names and Software-IDs, e.g. from ``utils.read_list_file``.
+    :param regid: The regid of the Software-IDs.
+    :param os_string: The OS string of the Software-IDs.
+    :param architecture: The architecture of the Software-IDs.
+    :return: Tuple as ``resolve_targets``.
+    """
+    packages = list(packages)
+    software_id_index = create_software_id_index(packages, regid, os_string, architecture)
+    return _collect(targets, _index_by_name(packages), software_id_index)
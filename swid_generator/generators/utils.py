@@ -2,14 +2,17 @@
 from __future__ import print_function, division, absolute_import, unicode_literals
 
 import hashlib
-import os
+import io
 import re
-import random
-import string
+import shutil
+import sys
+import tempfile
 
 
 uri_reserved_chars_re = re.compile(r'[:\/?#\[\]@!$&\'()*+,;=]')
 
+HASH_ALGORITHMS = ('sha256', 'sha384', 'sha512')
+
 
 def create_unique_id(package_info, os_string, architecture):
     """
@@ -71,6 +74,28 @@ def create_software_id(regid, unique_id):
     return '{regid}__{unique_id}'.format(regid=regid, unique_id=unique_id)
 
 
+def create_software_id_index(packages, regid, os_string, architecture):
+    """
+    Create a reverse index, which resolves Software-IDs back to packages.
+
+    Args:
+        packages (list):
+            The ``PackageInfo`` instances of the installed packages.
+        regid (str):
+            The Regid string.
+        os_string (str):
+            The OS string of the Unique-IDs.
+        architecture (str):
+            The architecture of the Unique-IDs.
+
+    Returns:
+        Dictionary with the Software-ID as key and the ``PackageInfo`` instance as value.
+
+    """
+    return dict((create_software_id(regid, create_unique_id(package_info, os_string, architecture)), package_info)
+                for package_info in packages)
+
+
 def create_sha256_hash(filepath):
     return _create_hash(filepath, hashlib.sha256())
 
@@ -94,33 +119,122 @@ def _create_hash(file_path, hash_algorithm):
     return hash_algorithm.hexdigest()
 
 
-def create_temp_folder(file_path):
+def get_hash_algorithms(hash_algorithms):
     """
-    It creates a folder in the directory /tmp of the client/server.
-    This folder has the prefix "swid_". To this prefix a random generated String is appended to
-    prevent collisions of foldernames.
+    Split a comma separated string of hash algorithms into a tuple.
+
+    Args:
+        hash_algorithms (str):
+            The algorithms as given by the ``--hash`` argument, e.g. ``sha256,sha512``.
+
+    Returns:
+        Tuple of the known algorithm names in canonical order.
 
-    :param file_path: Path to the file (package or certificate)
-    :return: A dictionary with the save options of the temporary folder.
     """
-    temp_folder_name = '/tmp'
-    folder_prefix = 'swid_'
+    requested = hash_algorithms.split(',')
+    return tuple(algorithm for algorithm in HASH_ALGORITHMS if algorithm in requested)
 
-    random_string = ''.join(random.choice(string.ascii_letters) for _ in range(5))
 
-    if file_path[0] == "/":
-        absolute_package_path = file_path
-    else:
-        absolute_package_path = '/'.join((os.getcwd(), file_path))
+def create_hashes(file_path, hash_algorithms):
+    """
+    Compute the digests of a file for all given algorithms while reading the file only once.
 
-    save_location_pathname = '/'.join((temp_folder_name, folder_prefix + random_string))
+    Args:
+        file_path (str):
+            Path to the file.
+        hash_algorithms (tuple):
+            Names of the algorithms, e.g. ``('sha256', 'sha384')``.
 
-    if not os.path.exists(save_location_pathname):
-        os.makedirs(save_location_pathname)
+    Returns:
+        Dictionary with the algorithm name as key and the hex digest as value.
 
-    folder_information = {
-        'absolute_package_path': absolute_package_path,
-        'save_location': save_location_pathname
-    }
+    """
+    with open(file_path, 'rb') as afile:
+        return create_hashes_from_stream(afile, hash_algorithms)
 
-    return folder_information
+
+def create_hashes_from_stream(stream, hash_algorithms):
+    """
+    Compute the digests of the remaining content of a file-like object for all given algorithms.
+
+    Args:
+        stream:
+            Object with a ``read(size)`` method returning bytes, e.g. a member of a package archive.
+        hash_algorithms (tuple):
+            Names of the algorithms, e.g. ``('sha256', 'sha384')``.
+
+    Returns:
+        Dictionary with the algorithm name as key and the hex digest as value.
+
+    """
+    blocksize = 65536
+    hashes = [(algorithm, hashlib.new(algorithm)) for algorithm in hash_algorithms]
+    buf = stream.read(blocksize)
+    while len(buf) > 0:
+        for _, hash_object in hashes:
+            hash_object.update(buf)
+        buf = stream.read(blocksize)
+
+    return dict((algorithm, hash_object.hexdigest()) for algorithm, hash_object in hashes)
+
+
+class TempWorkspace(object):
+    """
+    Private temporary folder of a single run.
+
+    The folder is created with a unique name (``swid_`` and a random suffix)
+    when it is first needed and removed with all its content when the
+    context is left. Concurrent runs never touch the folders of each other.
+
+    Usage::
+
+        with TempWorkspace('/dev/shm') as workspace:
+            file_path = os.path.join(workspace.get_path(), 'swid_tag.xml')
+
+    """
+
+    def __init__(self, parent=None):
+        """
+        :param parent: The folder in which the workspace is created, e.g. a tmpfs like ``/dev/shm``.
+                       Default is the temporary folder of the system (``$TMPDIR`` or ``/tmp``).
+        """
+        self.parent = parent
+        self.path = None
+
+    def get_path(self):
+        """
+        Return the path of the workspace, it is created on the first call.
+        """
+        if self.path is None:
+            self.path = tempfile.mkdtemp(prefix='swid_', dir=self.parent)
+        return self.path
+
+    def cleanup(self):
+        """
+        Remove the workspace with all its content.
+        """
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+
+def read_list_file(path):
+    """
+    Read a list with one entry per line, e.g. of package files or of targets.
+    Empty lines and lines starting with "#" are skipped.
+
+    :param path: Path to the list or "-" for stdin.
+    :return: List of the entries in the order of the list, without surrounding whitespace.
+    """
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with io.open(path, 'r', encoding='utf-8') as list_file:
+            lines = list_file.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.startswith('#')]
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+The SWID tags are described as a sequence of events:
+
+* ``(START, tag, attributes)`` opens an element. ``attributes`` is a list of
+  (name, value) tuples, in the order in which they are written.
+* ``(END, tag)`` closes the most recently opened element.
+
+The events are either turned into an ElementTree element (``build_element``),
+e.g. to append a signature template, or serialized directly into chunks of
+bytes (``serialize_events``), without ever holding the whole document in memory.
+The serialized bytes are identical to ``ET.tostring(element, encoding='utf-8')``
+with the newlines removed, as the SWID tags have always been written.
+
+``serialize_events_pretty`` writes the indented form, which was created before
+by reparsing every tag with ``minidom`` and calling ``toprettyxml``. The
+events of an existing element, e.g. with an appended signature template, are
+created by ``element_events``.
+
+"""
+
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import sys
+from xml.etree import ElementTree as ET
+from xml.sax.saxutils import unescape
+
+
+START = 'start'
+END = 'end'
+
+# Since Python 3.8 ElementTree writes the attributes in insertion order, before they were sorted by name
+SORT_ATTRIBUTES = sys.version_info < (3, 8)
+
+
+if sys.version_info[0] < 3:
+    def _escape_attrib(value):
+        return ET._escape_attrib(value, 'utf-8').decode('utf-8')
+else:
+    _escape_attrib = ET._escape_attrib
+
+# Character references of ElementTree, which are resolved when the serialized tag is parsed again
+_CHARACTER_REFERENCES = {'&quot;': '"', '&#10;': '\n', '&#13;': '\r', '&#09;': '\t'}
+_SPECIAL_CHARACTERS = frozenset('&<>"\n\r\t')
+
+
+def append_elements(parent, events):
+    """
+    Create the elements described by the events as children of an ElementTree element.
+
+    :param parent: The ElementTree element to which the top-level elements are appended.
+    :param events: Iterable of events.
+    :return: The parent element.
+    """
+    stack = [parent]
+    for event in events:
+        if event[0] == START:
+            element = ET.SubElement(stack[-1], event[1])
+            for name, value in event[2]:
+                element.set(name, value)
+            stack.append(element)
+        else:
+            stack.pop()
+    return parent
+
+
+def build_element(events):
+    """
+    Create the ElementTree element described by the events.
+
+    :param events: Iterable of events, describing exactly one top-level element.
+    :return: The ElementTree element.
+    """
+    container = append_elements(ET.Element('container'), events)
+    return container[0]
+
+
+def element_events(element, namespaces=None):
+    """
+    Create the events describing an ElementTree element and its children.
+
+    Qualified tag names (``{uri}name``) are written with the prefix of their namespace,
+    the namespace declarations are added to the attributes of the element, as ElementTree does.
+
+    :param element: The ElementTree element. Text and tails are not supported.
+    :param namespaces: Dictionary mapping namespace URIs to prefixes.
+    :return: Iterator of events.
+    """
+    namespaces = namespaces or {}
+
+    def qualified_name(tag):
+        if tag[:1] != '{':
+            return tag
+        uri, name = tag[1:].split('}', 1)
+        if uri not in namespaces:
+            raise ValueError('No prefix for the namespace {0}'.format(uri))
+        return namespaces[uri] + ':' + name
+
+    used_uris = set(node.tag[1:].split('}', 1)[0] for node in element.iter() if node.tag[:1] == '{')
+    declarations = [('xmlns:' + prefix, uri) for uri, prefix in sorted(namespaces.items(), key=lambda item: item[1])
+                    if uri in used_uris]
+
+    stack = [(element, declarations)]
+    while stack:
+        node, extra_attributes = stack.pop()
+        if node is None:
+            yield (END, extra_attributes)
+            continue
+        tag = qualified_name(node.tag)
+        yield (START, tag, extra_attributes + list(node.items()))
+        stack.append((None, tag))
+        stack.extend((child, []) for child in reversed(node))
+
+
+def _start_tag(tag, attributes):
+    if SORT_ATTRIBUTES:
+        attributes = sorted(attributes)
+    return '<' + tag + ''.join(' %s="%s"' % (name, _escape_attrib(value)) for name, value in attributes)
+
+
+def serialize_events(events, chunk_size=65536):
+    """
+    Serialize the events to UTF-8 encoded XML, like ``ET.tostring(element, encoding='utf-8')``.
+
+    Elements without children are written as empty-element tags (``<File name="a" />``), therefore
+    a start tag is only written once the next event is known. Newlines are removed from the output.
+
+    :param events: Iterable of events.
+    :param chunk_size: Minimum number of characters collected before a chunk is returned.
+    :return: Iterator of bytestrings.
+    """
+    pending_start_tag = None
+    parts = []
+    length = 0
+
+    for event in events:
+        if pending_start_tag is not None:
+            part = pending_start_tag + (' />' if event[0] == END else '>')
+            pending_start_tag = None
+        elif event[0] == END:
+            part = '</' + event[1] + '>'
+        else:
+            part = None
+
+        if part is not None:
+            parts.append(part)
+            length += len(part)
+            if length >= chunk_size:
+                yield ''.join(parts).encode('utf-8', 'xmlcharrefreplace').replace(b'\n', b'')
+                parts = []
+                length = 0
+
+        if event[0] == START:
+            pending_start_tag = _start_tag(event[1], event[2])
+
+    if parts:
+        yield ''.join(parts).encode('utf-8', 'xmlcharrefreplace').replace(b'\n', b'')
+
+
+def _pretty_attrib(value):
+    """
+    Escape an attribute value as minidom writes it after parsing the output of ElementTree.
+    """
+    if _SPECIAL_CHARACTERS.isdisjoint(value):
+        return value
+    # ElementTree output without newlines, whitespace normalized and references resolved by the parser
+    value = _escape_attrib(value).replace('\n', '').replace('\t', ' ').replace('\r', ' ')
+    value = unescape(value, _CHARACTER_REFERENCES)
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _is_not_namespace_declaration(attribute):
+    return not (attribute[0] == 'xmlns' or attribute[0].startswith('xmlns:'))
+
+
+def serialize_events_pretty(events, indent='  ', chunk_size=65536):
+    """
+    Serialize the events to indented, UTF-8 encoded XML, like
+    ``minidom.parseString(ET.tostring(element)).toprettyxml(indent, encoding='utf-8')``
+    without the XML declaration and the final newline.
+
+    Every element is written on its own line, elements without children as
+    empty-element tags (``<File name="a"/>``).
+
+    :param events: Iterable of events.
+    :param indent: The string added to the indentation of every nesting level.
+    :param chunk_size: Minimum number of characters collected before a chunk is returned.
+    :return: Iterator of bytestrings.
+    """
+    pending_start_tag = None
+    depth = 0
+    parts = []
+    length = 0
+
+    for event in events:
+        if pending_start_tag is not None:
+            part = pending_start_tag + ('/>' if event[0] == END else '>\n')
+            pending_start_tag = None
+        elif event[0] == END:
+            part = indent * (depth - 1) + '</' + event[1] + '>'
+        else:
+            part = None
+
+        if event[0] == END:
+            depth -= 1
+            if depth > 0:
+                part += '\n'
+
+        if part is not None:
+            parts.append(part)
+            length += len(part)
+            if length >= chunk_size:
+                yield ''.join(parts).encode('utf-8', 'xmlcharrefreplace')
+                parts = []
+                length = 0
+
+        if event[0] == START:
+            attributes = event[2]
+            if SORT_ATTRIBUTES:
+                attributes = sorted(attributes)
+            else:
+                # The parser of minidom stores the namespace declarations before the other attributes
+                attributes = sorted(attributes, key=_is_not_namespace_declaration)
+            pending_start_tag = indent * depth + '<' + event[1] + ''.join(' %s="%s"' % (name, _pretty_attrib(value))
+                                                                          for name, value in attributes)
+            depth += 1
+
+    if parts:
+        yield ''.join(parts).encode('utf-8', 'xmlcharrefreplace')
@@ -23,24 +23,152 @@
 # THE SOFTWARE.
 from __future__ import print_function, division, absolute_import, unicode_literals
 
+import signal
 import sys
+import sqlite3
+from functools import partial
 
-from glob import glob
-from shutil import rmtree
 from .argparser import MainArgumentParser
 from .environments.environment_registry import EnvironmentRegistry
 from .environments.dpkg_environment import DpkgEnvironment
 from .environments.rpm_environment import RpmEnvironment
 from .environments.pacman_environment import PacmanEnvironment
-from .generators.swid_generator import create_swid_tags
+from .generators.swid_generator import all_matcher, create_swid_tags, targets_matcher
 from .generators.softwareid_generator import create_software_ids
+from .daemon import DatabaseMonitor, InventoryServer, InventoryService
+from .generators.hash_cache import HashCache
+from .generators.utils import TempWorkspace, read_list_file
+from .generators.inventory_state import InventoryState, write_removed_list
+from .generators.evidence_walker import EvidenceWalker
+from .generators.targets import FILE_INDEX_MIN_PACKAGES, match_targets, resolve_targets
+from .generators.package_batch import PackageTagCache, create_package_file_tags, find_package_files
+from .signer import XmlSigner, is_available as signer_is_available
 from .print_functions import print_swid_tags, print_software_ids
-from .exceptions import AutodetectionError, EnvironmentNotInstalledError, CommandManagerError
+from .exceptions import AutodetectionError, EnvironmentNotInstalledError, CommandManagerError, PackageFileError
 from .patches import unicode_patch
+from .watcher import create_watcher
 
 
-TMP_FOLDER = '/tmp/'
-PREFIX_FOLDER = 'swid_*'
+def create_package_file_batch(options, swid_args, environment_registry, errors):
+    """
+    Return the SWID tags of all package files of --package-dir or --package-file-list
+    and the PackageTagCache()-Object of --package-tag-cache (or None).
+
+    The environment is chosen for every package file by its suffix, so the os string
+    and the architecture of the host environment are determined once beforehand.
+    """
+    if options.package_dir is not None:
+        file_paths = find_package_files(options.package_dir, environment_registry.get_package_file_suffixes())
+    else:
+        file_paths = read_list_file(options.package_file_list)
+
+    batch_args = dict((key, swid_args[key]) for key in ('entity_name', 'regid', 'os_string', 'architecture', 'full',
+                                                        'hash_algorithms', 'hierarchic', 'package_digests', 'pretty',
+                                                        'pkcs12_file'))
+    if batch_args['os_string'] is None:
+        batch_args['os_string'] = swid_args['environment'].get_os_string()
+    if batch_args['architecture'] is None:
+        batch_args['architecture'] = swid_args['environment'].get_architecture()
+
+    tag_cache = None
+    if options.package_tag_cache is not None:
+        # The tags are cached unsigned, only the presence of the signature template matters
+        cache_options = dict(batch_args, pkcs12_file=options.pkcs12 is not None)
+        tag_cache = PackageTagCache(options.package_tag_cache, cache_options, options.package_tag_cache_size)
+
+    swid_tags = create_package_file_tags(file_paths, environment_registry, batch_args, jobs=options.jobs,
+                                         tag_cache=tag_cache, errors=errors)
+    return swid_tags, tag_cache
+
+
+def print_cache_stats(hash_cache, tag_cache):
+    """
+    Print the hits and misses of the hash cache and the package tag cache to stderr.
+    """
+    for title, cache in (('Hash cache', hash_cache), ('Package tag cache', tag_cache)):
+        if cache is not None:
+            print('{0}: {1} hits, {2} misses'.format(title, cache.hits, cache.misses), file=sys.stderr)
+
+
+def create_targeted_package_list(options, env):
+    """
+    Return the installed packages of --package, --software-id or --targets-from, or None without targets.
+
+    The targets of --targets-from are matched against a single package listing, the
+    targets without a matching package are reported on stderr.
+    """
+    if options.targets_from is None and not options.package_name and not options.match_software_id:
+        return None
+
+    os_string = options.os_string or env.get_os_string()
+    architecture = options.architecture or env.get_architecture()
+    if options.targets_from is not None:
+        targets = read_list_file(options.targets_from)
+        packages, unmatched_targets = match_targets(env.get_package_list(), targets, options.regid, os_string, architecture)
+        if unmatched_targets:
+            print("Warning: No installed package matches the following targets.", file=sys.stderr)
+            for target in unmatched_targets:
+                print(target, file=sys.stderr)
+    else:
+        packages, _ = resolve_targets(env, options.regid, os_string, architecture, package_names=options.package_name or [],
+                                      software_ids=options.match_software_id or [])
+
+    if options.full and len(packages) >= FILE_INDEX_MIN_PACKAGES:
+        env.load_file_index()
+    return packages
+
+
+def run_daemon(options, env):
+    """
+    Warm up the inventory, watch the package database and serve requests until SIGTERM or SIGINT.
+    """
+    hash_cache = None
+    if options.hash_cache is not None:
+        hash_cache = HashCache(options.hash_cache, options.hash_cache_size)
+
+    defaults = {
+        'regid': options.regid,
+        'entity_name': options.entity_name,
+        'os': options.os_string,
+        'arch': options.architecture,
+        'hash': options.hash_algorithms,
+        'full': options.full,
+        'pretty': False,
+        'hierarchic': False,
+        'package_digests': None,
+        'doc_separator': options.document_separator
+    }
+    service = InventoryService(env, defaults, jobs=options.jobs, hash_cache=hash_cache,
+                               max_cached_tags=options.max_cached_tags)
+
+    try:
+        service.warm_up(full=options.full)
+        server = InventoryServer(options.socket, service)
+    except CommandManagerError as e:
+        print("Error: An external command has encountered an unexpected error.")
+        print(e)
+        sys.exit(5)
+    except (OSError, IOError) as e:
+        print("Error: The socket could not be created.")
+        print(e)
+        sys.exit(4)
+
+    monitor = None
+    if options.watch != 'off':
+        watcher = create_watcher(env.get_database_paths(), options.poll_interval, use_inotify=options.watch == 'auto')
+        monitor = DatabaseMonitor(service, watcher)
+        monitor.start()
+
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if monitor is not None:
+            monitor.stop()
+        service.close()
 
 
 def main():
@@ -83,14 +211,35 @@ def main():
             'new_root_path': options.new_root,
             'name': options.name,
             'version': options.version,
-            'pkcs12_file': options.pkcs12
+            'pkcs12_file': options.pkcs12,
+            'jobs': options.jobs,
+            'hash_cache': None,
+            'package_digests': options.package_digests,
+            'inventory_state': None,
+            'changed_only': options.changed_only,
+            'streaming': options.pkcs12 is None,
+            'pretty': options.pretty
         }
 
+        if options.hash_cache is not None:
+            swid_args['hash_cache'] = HashCache(options.hash_cache, options.hash_cache_size)
+
         signature_args = {
             'pkcs12_file': options.pkcs12,
-            'pkcs12_password': options.password
+            'pkcs12_password': options.password,
+            'signer': None,
+            'workspace': None
         }
 
+        # Sign in-process if lxml and cryptography are installed, otherwise with one xmlsec1 call per tag
+        if options.pkcs12 is not None and signer_is_available():
+            try:
+                signature_args['signer'] = XmlSigner(options.pkcs12, options.password)
+            except (ValueError, IOError) as e:
+                print('Error: The PKCS#12 file could not be loaded.')
+                print(e)
+                sys.exit(4)
+
         if options.evidence_path is not None:
             """
             If the parameter 'name' and 'version' are missing, then the following default-arguments are set:
@@ -105,15 +254,67 @@ def main():
             if options.version is None:
                 swid_args['version'] = "1.0.0"
 
+            swid_args['evidence_walker'] = EvidenceWalker(unicode_patch(options.evidence_path), exclude=options.exclude,
+                                                          max_depth=options.max_depth,
+                                                          one_file_system=options.one_file_system)
+
+        package_file_errors = []
+
         try:
 
-            swid_tags = create_swid_tags(**swid_args)
-            print_swid_tags(swid_tags, signature_args, separator=options.document_separator, pretty=options.pretty)
+            if options.since_state is not None:
+                # The state is only comparable to runs with the same tag content options
+                state_options = dict((key, swid_args[key]) for key in ('entity_name', 'regid', 'os_string', 'architecture',
+                                                                       'full', 'hash_algorithms', 'hierarchic', 'pretty'))
+                swid_args['inventory_state'] = InventoryState(options.since_state, state_options)
+
+            # The targeted packages are queried directly, instead of matching every installed package.
+            # The state of --since-state needs all installed packages.
+            if options.since_state is None:
+                packages = create_targeted_package_list(options, env)
+                if packages is not None:
+                    swid_args['packages'] = packages
+                    swid_args['matcher'] = all_matcher
+            elif options.targets_from is not None:
+                targets = frozenset(read_list_file(options.targets_from))
+                swid_args['matcher'] = partial(targets_matcher, package_names=targets, software_ids=targets)
+
+            tag_cache = None
+            if options.package_dir is not None or options.package_file_list is not None:
+                swid_tags, tag_cache = create_package_file_batch(options, swid_args, environment_registry,
+                                                                 package_file_errors)
+            else:
+                swid_tags = create_swid_tags(**swid_args)
+            # The temporary files of this run (xmlsec1 signing) are removed when the output is written
+            with TempWorkspace(options.temp_dir) as workspace:
+                signature_args['workspace'] = workspace
+                try:
+                    print_swid_tags(swid_tags, signature_args, separator=options.document_separator)
+                except StopIteration:
+                    # With --changed-only an empty output just means that nothing has changed
+                    if not options.changed_only and not package_file_errors:
+                        raise
+
+            if options.evidence_stats:
+                stats = swid_args['evidence_walker'].get_stats()
+                print('Evidence: {files} files, {directories} directories, {excluded} excluded, {errors} unreadable '
+                      'in {elapsed:.2f}s ({files_per_second:.0f} files/s, {directories_per_second:.0f} dirs/s)'.format(**stats),
+                      file=sys.stderr)
+            if options.cache_stats:
+                print_cache_stats(swid_args['hash_cache'], tag_cache)
 
-            # Garbage-Collection, clean tmp folder, delete swid_*-Folders
-            files_to_delete = glob(TMP_FOLDER + PREFIX_FOLDER)
-            for file_path in files_to_delete:
-                rmtree(file_path.encode('utf-8'))
+            inventory_state = swid_args['inventory_state']
+            if inventory_state is not None:
+                inventory_state.save()
+                if options.removed_list is not None:
+                    write_removed_list(options.removed_list, inventory_state.get_removed())
+
+            # The other package files of a batch are still written
+            if package_file_errors:
+                print("Error: The following package files could not be read.", file=sys.stderr)
+                for file_path, message in package_file_errors:
+                    print('{0}: {1}'.format(file_path, message), file=sys.stderr)
+                sys.exit(4)
 
         # if --match was used no matching packages were found
         except StopIteration:
@@ -130,15 +331,33 @@ def main():
             print(e)
             sys.exit(4)
 
+        except sqlite3.Error as e:
+            print("Error: The hash cache could not be used.")
+            print(e)
+            sys.exit(4)
+
         except CommandManagerError as e:
             print("Error: An external command has encountered an unexpected error.")
             print(e)
             sys.exit(5)
 
+        except PackageFileError as e:
+            print("Error: The package file could not be read.")
+            print(e)
+            sys.exit(4)
+
+        finally:
+            # The hash cache is shared by all SWID tags of the run
+            if swid_args['hash_cache'] is not None:
+                swid_args['hash_cache'].close()
+
     elif options.command == 'software-id':
         software_ids = create_software_ids(env=env, regid=options.regid)
         print_software_ids(software_ids, separator=options.document_separator)
 
+    elif options.command == 'daemon':
+        run_daemon(options, env)
+
     else:
         print('Error: Please choose a subcommand: '
               'swid for swid output, software-id for software id output')
@@ -3,33 +3,78 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 
 import os.path
 
+try:
+    from sys import intern
+except ImportError:
+    # Python 2 only interns bytestrings
+    def intern(string):
+        return string
+
 
 class FileInfo(object):
-    def __init__(self, path, actual_path=True):
-        self.name = (os.path.split(path)[1]).strip()
-        self.location = (os.path.split(path)[0]).strip()
+    """
+    A file of a package or an evidence folder.
+
+    Millions of instances may be alive at once, therefore only the name, the
+    interned location and the flags are stored. The full path and its
+    components are derived on access, the size is read from the file system
+    when it is first needed, unless it is already known. Files read from a
+    package file carry the ``digests`` computed while reading the package.
+    """
+    __slots__ = ('name', 'location', 'mutable', 'package_digests', 'package_stat', 'digests', '_actual_full_pathname', '_size')
+
+    def __init__(self, path, actual_path=True, size=None):
+        location, name = os.path.split(path)
+        self.name = name.strip()
+        self.location = intern(location.strip())
         self.mutable = False
-        self.full_pathname = '/'.join((self.location, self.name))
+        self.package_digests = None
+        self.package_stat = None
+        self.digests = None
+        # None: the file is read from full_pathname
+        self._actual_full_pathname = None if actual_path else ""
+        self._size = size
+
+    @property
+    def full_pathname(self):
+        return '/'.join((self.location, self.name))
 
-        splitted_location = self.full_pathname.split('/')
-        self.full_pathname_splitted = splitted_location[1:]
+    @property
+    def full_pathname_splitted(self):
+        return self.full_pathname.split('/')[1:]
 
-        if actual_path:
-            self.actual_full_pathname = self.full_pathname
-            self.size = str(os.path.getsize(self.full_pathname))
-        else:
-            self.actual_full_pathname = ""
+    @property
+    def actual_full_pathname(self):
+        if self._actual_full_pathname is None:
+            return self.full_pathname
+        return self._actual_full_pathname
 
-    def set_actual_path(self, file_path):
-        self.actual_full_pathname = file_path.encode('utf-8')
-        self.size = str(os.path.getsize(file_path))
+    @property
+    def size(self):
+        if self._size is None:
+            if self._actual_full_pathname == "":
+                raise AttributeError('The size of a file without actual path is unknown')
+            self._size = str(os.path.getsize(self.actual_full_pathname))
+        return self._size
+
+    @size.setter
+    def size(self, size):
+        self._size = size
+
+    def set_actual_path(self, file_path, size=None):
+        self._actual_full_pathname = file_path.encode('utf-8')
+        self._size = size
 
 
 class PackageInfo(object):
-    def __init__(self, package='', version='', files=None, status=None):
+    __slots__ = ('package', 'version', 'files', 'status', 'architecture')
+
+    def __init__(self, package='', version='', files=None, status=None, architecture=None):
         if files is None:
             files = []
         self.package = package
         self.version = version
         self.files = files
         self.status = status
+        # Only known if a package is installed for several architectures (e.g. dpkg multiarch)
+        self.architecture = architecture
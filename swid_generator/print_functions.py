@@ -1,15 +1,23 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
+import os
 import sys
-from xml.dom import minidom
 from swid_generator.command_manager import CommandManager as CM
-from swid_generator.generators.utils import create_temp_folder
+from swid_generator.generators.utils import TempWorkspace
 
 
 def sign_xml(data, signature_args):
-    folder_info = create_temp_folder(signature_args['pkcs12_file'])
-    file_path = folder_info['save_location'] + '/swid_tag.xml'
+    if signature_args.get('signer') is not None:
+        return signature_args['signer'].sign(data).decode('utf-8')
+
+    # The workspace of the run, or one for this tag only
+    workspace = signature_args.get('workspace')
+    if workspace is None:
+        with TempWorkspace() as workspace:
+            return sign_xml(data, dict(signature_args, workspace=workspace))
+
+    file_path = os.path.join(workspace.get_path(), 'swid_tag.xml')
     with open(file_path, 'wb') as file:
         file.write(data)
     if signature_args['pkcs12_password'] is None:
@@ -92,27 +100,28 @@ def iterate(generator, action_func, separator, end):
             break
 
 
-def print_swid_tags(swid_tags, signature_args, separator, pretty):
+def print_swid_tags(swid_tags, signature_args, separator):
     """
     Print the specified SWID Tags using the specified separator.
 
     Args:
         swid_tags:
-            A generator yielding SWID Tags as bytestrings.
+            A generator yielding SWID Tags as bytestrings or as iterators of bytestring chunks.
         separator (str or unicode):
             The separator string to be printed between two SWID Tags.
-        pretty (bool):
-            Whether or not to use pretty printing.
 
     """
     def action(tag):
-        if pretty:
-            swidtag_reparsed = minidom.parseString(tag)
-            # [:-1] strips away the last newline, automatically inserted by minidoms toprettyxml
-            safe_print(swidtag_reparsed.toprettyxml(indent='  ', encoding='utf-8')[:-1],
-                       signature_args, end='')
-        else:
-            safe_print(tag, signature_args, end='')
+        if not isinstance(tag, bytes):
+            # Streamed SWID tag, every chunk is written as soon as it is serialized
+            if signature_args['pkcs12_file'] is not None:
+                tag = b''.join(tag)
+            else:
+                for chunk in tag:
+                    safe_print(chunk, end='')
+                return
+
+        safe_print(tag, signature_args, end='')
 
     iterate(swid_tags, action, separator, end='\n')
 
@@ -1,3 +1,11 @@
 DEFAULT_REGID = u'strongswan.org'
 DEFAULT_ENTITY_NAME = u'strongSwan Project'
 DEFAULT_HASH_ALGORITHM = u'sha256'
+DEFAULT_JOBS = 1
+DEFAULT_HASH_CACHE = u'/var/cache/swid_generator/hashes.sqlite'
+DEFAULT_HASH_CACHE_SIZE = 1000000
+DEFAULT_PACKAGE_TAG_CACHE = u'/var/cache/swid_generator/package_tags.sqlite'
+DEFAULT_PACKAGE_TAG_CACHE_SIZE = 100000
+DEFAULT_SOCKET = u'/run/swid_generator.sock'
+DEFAULT_MAX_CACHED_TAGS = 10000
+DEFAULT_POLL_INTERVAL = 5
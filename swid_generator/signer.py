@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import base64
+import hashlib
+import textwrap
+
+try:
+    from lxml import etree
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.hazmat.primitives.serialization import pkcs12
+except ImportError:
+    etree = None
+    pkcs12 = None
+
+
+DSIG_NS = 'http://www.w3.org/2000/09/xmldsig#'
+XML_DECLARATION = b'<?xml version="1.0" encoding="utf-8"?>'
+BASE64_LINE_LENGTH = 64
+
+
+def is_available():
+    """
+    Whether the in-process signer can be used. It requires the optional packages ``lxml`` and ``cryptography``.
+    """
+    return etree is not None and pkcs12 is not None
+
+
+def _base64(data):
+    return '\n'.join(textwrap.wrap(base64.b64encode(data).decode('ascii'), BASE64_LINE_LENGTH))
+
+
+class XmlSigner(object):
+    """
+    Signs SWID tags in-process, as ``xmlsec1 --sign --pkcs12`` does.
+
+    The PKCS#12 container is read once. For every SWID tag the ``Signature``
+    template (see ``signature_template.SIGNATURE``) is filled in: the digest of
+    the exclusive canonicalization of the tag without the signature
+    (enveloped-signature transform), the RSA-SHA256 signature of the
+    canonicalized ``SignedInfo`` and the certificates of the container.
+
+    The template specifies C14N 1.1 for ``SignedInfo``. It differs from C14N 1.0,
+    which is used here, only in the handling of inherited ``xml:`` attributes,
+    which never occur in SWID tags.
+
+    """
+
+    def __init__(self, pkcs12_file, password=None):
+        """
+        :param pkcs12_file: Path to the PKCS#12 container with key and certificate.
+        :param password: Password of the container or None.
+        """
+        assert is_available(), 'lxml and cryptography are required for the in-process signer'
+
+        with open(pkcs12_file, 'rb') as container:
+            data = container.read()
+        if password is not None:
+            password = password.encode('utf-8')
+
+        private_key, certificate, additional_certificates = pkcs12.load_key_and_certificates(data, password, default_backend())
+        if private_key is None or certificate is None:
+            raise ValueError('The PKCS#12 container {0} does not contain a key and a certificate'.format(pkcs12_file))
+
+        self.private_key = private_key
+        # Same order as written by xmlsec1: the certificate of the key, then the chain in reverse order
+        self.certificates = [certificate] + list(reversed(additional_certificates or []))
+
+    def _dsig(self, signature, path):
+        node = signature.find('/'.join('{%s}%s' % (DSIG_NS, tag) for tag in path.split('/')))
+        if node is None:
+            raise ValueError('The signature template has no {0} element'.format(path))
+        return node
+
+    def sign(self, data):
+        """
+        Sign a SWID tag which contains the signature template.
+
+        :param data: The SWID tag as utf8-encoded bytestring.
+        :return: The signed SWID tag as utf8-encoded bytestring, including XML declaration and trailing newline.
+        """
+        root = etree.fromstring(data)
+        signature = root.find('{%s}Signature' % DSIG_NS)
+        if signature is None:
+            raise ValueError('The SWID tag contains no signature template')
+
+        # Enveloped signature transform followed by exclusive canonicalization of the whole document
+        index = list(root).index(signature)
+        root.remove(signature)
+        digest = hashlib.sha256(etree.tostring(root, method='c14n', exclusive=True, with_comments=False)).digest()
+        root.insert(index, signature)
+
+        self._dsig(signature, 'SignedInfo/Reference/DigestValue').text = base64.b64encode(digest).decode('ascii')
+
+        signed_info = etree.tostring(self._dsig(signature, 'SignedInfo'), method='c14n', exclusive=False, with_comments=False)
+        signature_value = self.private_key.sign(signed_info, padding.PKCS1v15(), hashes.SHA256())
+        self._dsig(signature, 'SignatureValue').text = _base64(signature_value)
+
+        x509_data = self._dsig(signature, 'KeyInfo/X509Data')
+        x509_data.text = '\n'
+        for certificate in self.certificates:
+            x509_certificate = etree.SubElement(x509_data, '{%s}X509Certificate' % DSIG_NS)
+            x509_certificate.text = _base64(certificate.public_bytes(serialization.Encoding.DER)) + '\n'
+            x509_certificate.tail = '\n'
+
+        return XML_DECLARATION + b'\n' + etree.tostring(root, encoding='utf-8', xml_declaration=False) + b'\n'
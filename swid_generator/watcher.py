@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+# Events of inotify(7), which indicate a modification of a watched file or of the entries of a folder
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct(str('iIII'))
+
+
+class PollWatcher(object):
+    """
+    Detect modifications of files and folders by comparing their inode, size
+    and modification time at a fixed interval. Used where inotify is not
+    available, e.g. on other kernels than Linux.
+    """
+
+    def __init__(self, paths, interval=5.0):
+        """
+        :param paths: The files and folders to watch. They don't need to exist.
+        :param interval: Seconds between two comparisons.
+        """
+        self.paths = tuple(paths)
+        self.interval = interval
+        self._state = self._get_state()
+
+    def _get_state(self):
+        state = []
+        for path in self.paths:
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                state.append(None)
+                continue
+            state.append((stat_result.st_ino, stat_result.st_size, stat_result.st_mtime))
+        return state
+
+    def wait(self, timeout=None):
+        """
+        Wait until one of the paths was modified.
+
+        :param timeout: Maximum number of seconds to wait, None waits forever.
+        :return: True if a modification was detected, False after the timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            state = self._get_state()
+            if state != self._state:
+                self._state = state
+                return True
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.time())
+            if remaining <= 0:
+                return False
+            time.sleep(remaining)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """
+    Detect modifications of files and folders with inotify(7) of Linux,
+    called through ctypes.
+
+    A file is watched through its parent folder, since package managers
+    replace their databases by renaming a new file over the old one, which
+    ends a watch of the file itself. A folder is watched for changes of its
+    entries. Package managers modify many files in a row, so a modification
+    is only reported after no event arrived for ``settle`` seconds.
+
+    """
+    mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+        IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, paths, settle=1.0):
+        """
+        :param paths: The files and folders to watch. Paths without an existing folder are skipped.
+        :param settle: Seconds without events, after which a modification is reported.
+        :raises OSError: If inotify is not available.
+        """
+        self.settle = settle
+        # Watch descriptor => names of the watched entries in the folder, None for all entries
+        self._watches = {}
+        self._libc = self._load_libc()
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise self._error('inotify_init1')
+
+        try:
+            folders = {}
+            for path in paths:
+                if os.path.isdir(path):
+                    folders[path] = None
+                else:
+                    folder, name = os.path.split(path)
+                    if os.path.isdir(folder) and folders.get(folder, set()) is not None:
+                        folders.setdefault(folder, set()).add(name)
+            for folder, names in folders.items():
+                watch_descriptor = self._libc.inotify_add_watch(self._fd, folder.encode(sys.getfilesystemencoding()),
+                                                                self.mask)
+                if watch_descriptor < 0:
+                    raise self._error('inotify_add_watch {0}'.format(folder))
+                self._watches[watch_descriptor] = names
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def _load_libc():
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        return libc
+
+    @staticmethod
+    def _error(function_name):
+        error_number = ctypes.get_errno()
+        return OSError(error_number, '{0}: {1}'.format(function_name, os.strerror(error_number)))
+
+    def _read_events(self):
+        """
+        Read the pending events and return whether one of them concerns a watched path.
+        """
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    return relevant
+                raise
+
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                watch_descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+                offset += EVENT_HEADER.size + length
+
+                if mask & IN_Q_OVERFLOW:
+                    relevant = True
+                elif watch_descriptor in self._watches:
+                    names = self._watches[watch_descriptor]
+                    if names is None or name.decode(sys.getfilesystemencoding(), 'replace') in names:
+                        relevant = True
+
+    def wait(self, timeout=None):
+        """
+        Wait until one of the paths was modified.
+
+        :param timeout: Maximum number of seconds to wait for the first event, None waits forever.
+        :return: True if a modification was detected, False after the timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        modified = False
+        while not modified:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            if not select.select([self._fd], [], [], remaining)[0]:
+                return False
+            modified = self._read_events()
+
+        while select.select([self._fd], [], [], self.settle)[0]:
+            self._read_events()
+        return True
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(paths, poll_interval=5.0, use_inotify=True):
+    """
+    Return an InotifyWatcher()-Object for the paths, or a PollWatcher()-Object
+    if inotify is not available or not wanted.
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollWatcher(paths, poll_interval)
@@ -5,14 +5,12 @@ import os
 import tests.fixtures.mock_data as mock_data
 
 
-class MockStdout():
-    def __init__(self):
-        self.stdout = {}
+class ProcessMock(object):
+    def __init__(self, output):
+        self.stdout = [line.encode('utf-8') for line in output.splitlines(True)]
 
-
-class PipeMock(object):
-    def __init__(self):
-        self.stdout = MockStdout()
+    def wait(self):
+        return 0
 
 
 class CommandManagerMock(object):
@@ -29,38 +27,44 @@ class CommandManagerMock(object):
             return mock_data.rpm_query_file_list
         if command_argumentlist == ['rpm', '-qa', '--queryformat', '%{name}\n', '-c', 'docker']:
             return mock_data.rpm_query_conffile_list
-        if command_argumentlist == ['rpm', "--query", "--package", "--queryformat", "%{name}", "/tmp/docker.pkg"]:
-            return "docker"
-        if command_argumentlist == ['rpm', "--query", "--package", "--queryformat", "%{version}", "/tmp/docker.pkg"]:
-            return "1.0-5"
-        if command_argumentlist == ['rpm', "--query", "--package", "/tmp/docker.pkg", "-l"]:
-            return mock_data.rpm_query_file_list
-        if command_argumentlist == ['rpm', "--query", "--package", "/tmp/docker.pkg", "-c"]:
-            return mock_data.rpm_query_conffile_list
         if command_argumentlist == ['dpkg-query', '-W', '-f=${Package}\\n${Version}\\n${Status}\\n${conffiles}\\t']:
             return mock_data.dpkg_query_package_list_output
         if command_argumentlist == ['dpkg-query', '-L', "docker"]:
             return mock_data.dpkg_query_file_list
         if command_argumentlist == ['dpkg-query', '-W', '-f=${conffiles}\\n', "docker"]:
             return mock_data.dpkg_query_conffile_list
-        if command_argumentlist == ['dpkg', '-f', '/tmp/docker.pkg', 'Package']:
-            return "docker"
-        if command_argumentlist == ['dpkg', '-f', '/tmp/docker.pkg', 'Version']:
-            return "1.0-5"
-        if command_argumentlist == ['dpkg', '-c', '/tmp/docker.pkg']:
-            return mock_data.dpkg_query_file_list_package
         if command_argumentlist == ['pacman', '-Q', '--color', 'never']:
             return mock_data.pacman_query_package_list_output
+        if command_argumentlist == ['pacman', '-Ql', '--color', 'never']:
+            return mock_data.pacman_query_file_list
         if command_argumentlist == ['pacman', '-Ql', 'docker']:
             return mock_data.pacman_query_file_list
-        if command_argumentlist == ['pacman', '--query', '--file', '/tmp/docker.pkg']:
-            return "docker 1:17.04.0-1"
-        if command_argumentlist == ['pacman', '-Qlp', '/tmp/docker.pkg']:
-            return mock_data.pacman_query_file_list_package
+
+    @staticmethod
+    def run_command_records(command_argumentlist, separator='\n'):
+        records = CommandManagerMock.run_command_check_output(command_argumentlist).split(separator)
+        if records[-1] == '':
+            records.pop()
+        for record in records:
+            yield record
+
+    @staticmethod
+    def run_command_query_output(command_argumentlist):
+        if command_argumentlist[:2] == ['rpm', '-q']:
+            packages = dict(entry.split() for entry in mock_data.rpm_query_package_list_output.split('\t') if entry.strip())
+            return ''.join('{0}\t{1}\n'.format(name, packages[name]) if name in packages
+                           else 'package {0} is not installed\n'.format(name) for name in command_argumentlist[4:])
+        if command_argumentlist[:2] == ['pacman', '-Q']:
+            lines = mock_data.pacman_query_package_list_output.splitlines(True)
+            return ''.join(line for line in lines if line.split()[0] in command_argumentlist[4:])
+        if command_argumentlist[:2] == ['dpkg-query', '-W']:
+            entries = mock_data.dpkg_query_package_list_output.split('\t')
+            return ''.join(entry + '\t' for entry in entries if entry.split('\n')[0] in command_argumentlist[3:])
 
     @staticmethod
     def run_command_popen(command_argumentlist, stdout=None):
-        if command_argumentlist == ['rpm2cpio', "/tmp/docker.pkg"]:
-            return PipeMock()
-        if command_argumentlist == ['cpio', "-id", "--quiet"]:
-            return {}
+        if command_argumentlist[:3] == ['rpm', '-qa', '--queryformat'] and command_argumentlist[3].startswith('[%{=NAME}'):
+            return ProcessMock(mock_data.rpm_query_file_index)
+        if command_argumentlist[:3] == ['rpm', '-q', '--queryformat'] and command_argumentlist[3].startswith('[%{=NAME}'):
+            package_lines = mock_data.rpm_query_file_index.splitlines(True)
+            return ProcessMock(''.join(l for l in package_lines if l.startswith(command_argumentlist[4] + '\t')))
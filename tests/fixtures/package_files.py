@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Builders for small package files, created in the tests instead of storing binary dumps.
+"""
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import stat
+import struct
+import tarfile
+import tempfile
+import unittest
+
+from swid_generator.environments import archive
+from swid_generator.environments.rpm_package import RpmHeader, RpmPackage
+
+
+CONTROL = b'Package: fortune\nVersion: 1:2.0-1\nDescription: fortunes\n more fortunes\n'
+CONFFILES = b'/etc/fortune.conf\nremove-on-upgrade /etc/fortune.old\n'
+FORTUNE = b'You will write a reader for package files.\n' * 100
+CONFIG = b'fortunes = all\n'
+
+
+def write_package_file(folder, name, content):
+    """
+    Write a package file below the folder, missing parent folders are created, and return its path.
+    """
+    path = os.path.join(folder, name)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'wb') as package_file:
+        package_file.write(content)
+    return path
+
+
+class PackageFileTestCase(unittest.TestCase):
+    """
+    Tests of a package file reader, the package files are written to a temporary folder.
+    """
+    package_file_name = None
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def _write_package(self, content):
+        return write_package_file(self.folder, self.package_file_name, content)
+
+
+def ar_archive(members):
+    content = [archive.AR_MAGIC]
+    for name, data in members:
+        content.append('{0:<16}{1:<12}{2:<6}{3:<6}{4:<8}{5:<10}'.format(name + '/', 0, 0, 0, 100644, len(data)).encode('ascii'))
+        content.append(archive.AR_HEADER_END)
+        content.append(data)
+        if len(data) % 2 == 1:
+            content.append(b'\n')
+    return b''.join(content)
+
+
+def tar_archive(entries, mode='w'):
+    """
+    :param entries: List of tuples (name, data, link type, link name), directories have neither data nor link type.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        for name, data, link_type, link_name in entries:
+            tar_info = tarfile.TarInfo(name)
+            if data is None and link_type is None:
+                tar_info.type = tarfile.DIRTYPE
+                tar.addfile(tar_info)
+            elif link_type is not None:
+                tar_info.type = link_type
+                tar_info.linkname = link_name
+                tar.addfile(tar_info)
+            else:
+                tar_info.size = len(data)
+                tar.addfile(tar_info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def deb_package(compression):
+    control_archive = tar_archive([('./', None, None, None),
+                                   ('./control', CONTROL, None, None),
+                                   ('./conffiles', CONFFILES, None, None)], mode='w:gz')
+    data_archive = tar_archive([('./', None, None, None),
+                                ('./etc/', None, None, None),
+                                ('./etc/fortune.conf', CONFIG, None, None),
+                                ('./usr/share/games/', None, None, None),
+                                ('./usr/share/games/fortunes', FORTUNE, None, None),
+                                ('./usr/share/games/fortunes.u8', None, tarfile.SYMTYPE, 'fortunes'),
+                                ('./usr/games/fortunes', None, tarfile.SYMTYPE, '../share/games/fortunes.u8'),
+                                ('./usr/games/fortune.conf', None, tarfile.SYMTYPE, '/etc/fortune.conf'),
+                                ('./usr/games/hard', None, tarfile.LNKTYPE, './usr/share/games/fortunes'),
+                                ('./usr/games/outside', None, tarfile.SYMTYPE, '/usr/lib/libfortune.so'),
+                                ('./usr/games/dir', None, tarfile.SYMTYPE, '../share/games')],
+                               mode='w:' + compression if compression else 'w')
+    return ar_archive([('debian-binary', b'2.0\n'),
+                       ('control.tar.gz', control_archive),
+                       ('data.tar' + ('.' + compression if compression else ''), data_archive)])
+
+
+PKGINFO = b"""# Generated by makepkg
+pkgname = fortune
+pkgver = 1:2.0-1
+backup = etc/fortune.conf
+backup = usr/share/fortune/local
+depend = recode
+"""
+
+
+def mtree(entries):
+    """
+    :param entries: List of tuples (path, data), the data is None for directories.
+    """
+    lines = [b'#mtree', b'/set type=file uid=0 gid=0 mode=644']
+    for path, data in entries:
+        if data is None:
+            lines.append('.{0} type=dir mode=755'.format(path).encode('utf-8'))
+        else:
+            lines.append('.{0} size={1} sha256digest={2}'.format(path, len(data), hashlib.sha256(data).hexdigest()).encode('utf-8'))
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb') as mtree_file:
+        mtree_file.write(b'\n'.join(lines) + b'\n')
+    return buffer.getvalue()
+
+
+def pacman_package(compression='xz', mtree_entries=None):
+    if mtree_entries is None:
+        mtree_entries = [('/etc', None), ('/etc/fortune.conf', CONFIG), ('/usr/share/fortune/fortunes', FORTUNE)]
+    return tar_archive([('.BUILDINFO', b'format = 2\n', None, None),
+                        ('.MTREE', mtree(mtree_entries), None, None),
+                        ('.PKGINFO', PKGINFO, None, None),
+                        ('etc/', None, None, None),
+                        ('etc/fortune.conf', CONFIG, None, None),
+                        ('usr/share/fortune/', None, None, None),
+                        ('usr/share/fortune/fortunes', FORTUNE, None, None),
+                        ('usr/share/fortune/local', CONFIG, None, None),
+                        ('usr/share/fortune/fortunes.u8', None, tarfile.SYMTYPE, 'fortunes')],
+                       mode='w:' + compression if compression else 'w')
+
+
+def rpm_header(entries):
+    """
+    :param entries: List of tuples (tag, type, value).
+    """
+    alignments = {RpmHeader.TYPE_INT16: 2, RpmHeader.TYPE_INT32: 4, RpmHeader.TYPE_INT64: 8}
+    index = []
+    store = b''
+    for tag, tag_type, value in entries:
+        if tag_type in RpmHeader.integer_formats:
+            store += b'\x00' * (-len(store) % alignments[tag_type])
+            data = struct.pack('>{0}{1}'.format(len(value), RpmHeader.integer_formats[tag_type]), *value)
+            count = len(value)
+        elif tag_type == RpmHeader.TYPE_STRING_ARRAY:
+            data = b''.join(item.encode('utf-8') + b'\x00' for item in value)
+            count = len(value)
+        else:
+            data = value.encode('utf-8') + b'\x00'
+            count = 1
+        index.append(struct.pack('>IIII', tag, tag_type, len(store), count))
+        store += data
+    return RpmHeader.magic + b'\x00' * 4 + struct.pack('>II', len(index), len(store)) + b''.join(index) + store
+
+
+def _cpio_padding(length):
+    return b'\x00' * (-length % 4)
+
+
+def cpio_newc_member(name, mode, inode, links, data):
+    name = name.encode('utf-8') + b'\x00'
+    fields = (inode, mode, 0, 0, links, 0, len(data), 0, 0, 0, 0, len(name), 0)
+    header = b'070701' + ''.join('{0:08x}'.format(field) for field in fields).encode('ascii') + name
+    return header + _cpio_padding(len(header)) + data + _cpio_padding(len(data))
+
+
+def cpio_stripped_member(file_index, data):
+    header = b'07070X' + '{0:08x}'.format(file_index).encode('ascii')
+    return header + _cpio_padding(len(header)) + data + _cpio_padding(len(data))
+
+
+RPM_FILES = [
+    # path, flags, mode, size, inode, link name
+    ('/etc/fortune.conf', RpmPackage.RPMFILE_CONFIG, stat.S_IFREG | 0o644, len(CONFIG), 1, ''),
+    ('/usr/bin/fortune', 0, stat.S_IFREG | 0o755, len(FORTUNE), 2, ''),
+    ('/usr/bin/fortune-hard', 0, stat.S_IFREG | 0o755, len(FORTUNE), 2, ''),
+    ('/usr/bin/fortune-sym', 0, stat.S_IFLNK | 0o777, 7, 3, 'fortune'),
+    ('/usr/share/fortune', 0, stat.S_IFDIR | 0o755, 4096, 4, ''),
+    ('/usr/share/fortune/empty', 0, stat.S_IFREG | 0o644, 0, 5, ''),
+    # A %ghost file is not part of the payload
+    ('/var/log/fortune.log', 1 << 6, stat.S_IFREG | 0o644, 0, 6, ''),
+]
+
+
+def rpm_package(compression='gzip', stripped=False):
+    dir_names = sorted(set(path.rpartition('/')[0] + '/' for path, _, _, _, _, _ in RPM_FILES))
+    header = rpm_header([
+        (RpmPackage.RPMTAG_NAME, RpmHeader.TYPE_STRING, 'fortune'),
+        (RpmPackage.RPMTAG_VERSION, RpmHeader.TYPE_STRING, '2.0'),
+        (RpmPackage.RPMTAG_RELEASE, RpmHeader.TYPE_STRING, '1.fc25'),
+        (RpmPackage.RPMTAG_FILESIZES if not stripped else RpmPackage.RPMTAG_LONGFILESIZES,
+         RpmHeader.TYPE_INT32 if not stripped else RpmHeader.TYPE_INT64, [f[3] for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_FILEMODES, RpmHeader.TYPE_INT16, [f[2] for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_FILELINKTOS, RpmHeader.TYPE_STRING_ARRAY, [f[5] for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_FILEFLAGS, RpmHeader.TYPE_INT32, [f[1] for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_FILEDEVICES, RpmHeader.TYPE_INT32, [1] * len(RPM_FILES)),
+        (RpmPackage.RPMTAG_FILEINODES, RpmHeader.TYPE_INT32, [f[4] for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_DIRINDEXES, RpmHeader.TYPE_INT32, [dir_names.index(f[0].rpartition('/')[0] + '/') for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_BASENAMES, RpmHeader.TYPE_STRING_ARRAY, [f[0].rpartition('/')[2] for f in RPM_FILES]),
+        (RpmPackage.RPMTAG_DIRNAMES, RpmHeader.TYPE_STRING_ARRAY, dir_names),
+        (RpmPackage.RPMTAG_PAYLOADFORMAT, RpmHeader.TYPE_STRING, 'cpio'),
+    ])
+    # A signature header which has to be padded
+    signature = rpm_header([(1000, RpmHeader.TYPE_INT32, [1234])])
+    signature += b'\x00' * (-len(signature) % 8)
+
+    contents = {'/etc/fortune.conf': CONFIG, '/usr/bin/fortune-hard': FORTUNE, '/usr/bin/fortune-sym': b'fortune'}
+    members = []
+    for file_index, (path, flags, mode, _, inode, _) in enumerate(RPM_FILES):
+        if flags & (1 << 6):
+            continue
+        # The content of hard links is stored with the last link
+        data = contents.get(path, b'')
+        if stripped:
+            members.append(cpio_stripped_member(file_index, data))
+        else:
+            links = 2 if inode == 2 else 1
+            members.append(cpio_newc_member('.' + path, mode, inode, links, data))
+    members.append(cpio_newc_member('TRAILER!!!', 0, 0, 1, b''))
+    payload = b''.join(members)
+
+    if compression == 'gzip':
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as gzip_file:
+            gzip_file.write(payload)
+        payload = buffer.getvalue()
+    elif compression == 'xz':
+        payload = archive.lzma.compress(payload)
+
+    return RpmPackage.lead_magic + b'\x00' * (RpmPackage.lead_size - 4) + signature + header + payload
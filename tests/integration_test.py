@@ -3,9 +3,10 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 
 import unittest
 import os
+import subprocess
 
 from swid_generator.command_manager import CommandManager
-from swid_generator.generators.utils import create_temp_folder
+from swid_generator.generators.utils import TempWorkspace
 from xml.etree import cElementTree as ET
 from swid_generator.environments.environment_registry import EnvironmentRegistry
 from swid_generator.environments.dpkg_environment import DpkgEnvironment
@@ -57,11 +58,11 @@ class IntegrationTests(unittest.TestCase):
 
     @staticmethod
     def validate_signature(output_swid_tag):
-        folder_info = create_temp_folder('nofile')
-        file_path = folder_info['save_location'] + '/swid_tag.xml'
-        with open(file_path, 'w') as file:
-            file.write(output_swid_tag)
-        CommandManager.run_command_check_output(["xmlsec1", "--verify", file_path])
+        with TempWorkspace() as workspace:
+            file_path = workspace.get_path() + '/swid_tag.xml'
+            with open(file_path, 'w') as file:
+                file.write(output_swid_tag)
+            CommandManager.run_command_check_output(["xmlsec1", "--verify", file_path])
 
     def get_testcontext(self, environment):
 
@@ -190,3 +191,34 @@ class IntegrationTests(unittest.TestCase):
         output_swid_tag = self.get_tree_output_from_cmd(command_evidence.split(' '))
         expected_swid_tag = test_context['template_evidence']
         self.check_equality(expected_swid_tag, output_swid_tag)
+
+    def test_concurrent_runs_share_caches(self):
+
+        test_context = self.get_testcontext(self.env)
+
+        # Enough files, that the hash cache is written in several batches while the other run reads it
+        evidence_path = "/tmp/evidence-concurrent"
+        for index in range(3000):
+            self.create_folder(os.path.join(evidence_path, "sub%d" % (index % 10)))
+            with open(os.path.join(evidence_path, "sub%d" % (index % 10), "testfile%d" % index), 'w') as test_file:
+                test_file.write("content %d" % index)
+        with open("/tmp/package-file-list", 'w') as list_file:
+            list_file.write(test_context['package_path'] + "\n")
+
+        commands = [
+            ("swid_generator swid --full --evidence {0} --name evidence --version-string 1.0".format(evidence_path),
+             "--hash-cache /tmp/concurrent-hashes.sqlite"),
+            ("swid_generator swid --full --package-file-list /tmp/package-file-list",
+             "--package-tag-cache /tmp/concurrent-tags.sqlite")
+        ]
+        for command, cache_option in commands:
+            expected_output = self.get_string_output_from_cmd(command.split(' '))
+
+            # Two runs at the same time don't block each other, first with an empty cache, then with a filled one
+            for _ in range(2):
+                processes = [subprocess.Popen((command + ' ' + cache_option).split(' '), stdout=subprocess.PIPE,
+                                              stderr=subprocess.PIPE) for _ in range(2)]
+                for process in processes:
+                    output, error_output = process.communicate()
+                    assert process.returncode == 0, error_output
+                    assert output.decode('utf-8') == expected_output
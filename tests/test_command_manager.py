@@ -33,3 +33,22 @@ class CommandManagerTests(unittest.TestCase):
         return_pipe = CommandManager.run_command_popen(['echo', 'test'])
         assert isinstance(return_pipe, subprocess.Popen)
 
+    def test_run_command_records(self):
+        records = CommandManager.run_command_records(['printf', 'bash 5.0\\tvim 8.1\\t\\xc3\\xa4 1\\t'], separator='\t')
+        assert list(records) == ['bash 5.0', 'vim 8.1', '\xe4 1']
+        assert list(CommandManager.run_command_records(['printf', 'a\\nb'])) == ['a', 'b']
+
+    def test_run_command_records_invalid(self):
+        with self.assertRaises(CommandManagerError):
+            list(CommandManager.run_command_records(['ehco', 'hello']))
+
+        records = CommandManager.run_command_records(['sh', '-c', 'echo bash; exit 1'])
+        assert next(records) == 'bash'
+        with self.assertRaises(CommandManagerError):
+            next(records)
+
+    def test_run_command_records_closed(self):
+        # The command is stopped if the records are not consumed
+        records = CommandManager.run_command_records(['yes'])
+        assert next(records) == 'y'
+        records.close()
@@ -6,14 +6,15 @@ import unittest
 import platform
 import os
 import shutil
+import tempfile
 
 from mock import patch
 from mock import PropertyMock
 from swid_generator.environments.common import CommonEnvironment
 from swid_generator.environments.dpkg_environment import DpkgEnvironment
 from swid_generator.exceptions import RequirementsNotInstalledError
+from .fixtures.mock_data import file_stat_result
 from nose_parameterized import parameterized
-from .fixtures.mock_data import os_walk_three_tuple
 
 
 class CommonEnvironmentTests(unittest.TestCase):
@@ -22,14 +23,12 @@ class CommonEnvironmentTests(unittest.TestCase):
         self.platform_dist_patch = patch.object(platform, 'dist')
         self.platform_system_patch = patch.object(platform, 'system')
         self.platform_os_name_patch = patch.object(platform, 'os')
-        self.os_walk_patch = patch.object(os, 'walk')
         self.os_path_getsize_patch = patch.object(os.path, 'getsize')
         self.package_installed_patch = patch.object(CommonEnvironment, 'check_package_installed')
 
         self.platform_dis_mock = self.platform_dist_patch.start()
         self.platform_system_mock = self.platform_system_patch.start()
         self.platform_os_name_mock = self.platform_os_name_patch.start()
-        self.os_walk_mock = self.os_walk_patch.start()
         self.os_path_getsize_mock = self.os_path_getsize_patch.start()
         self.os_path_getsize_mock.return_value = 1
         self.package_installed_mock = self.package_installed_patch.start()
@@ -40,7 +39,7 @@ class CommonEnvironmentTests(unittest.TestCase):
         self.platform_dist_patch.stop()
         self.platform_system_patch.stop()
         self.platform_os_name_patch.stop()
-        self.os_walk_patch.stop()
+        self.os_path_getsize_patch.stop()
         try:
             self.package_installed_patch.stop()
         except RuntimeError:
@@ -84,27 +83,38 @@ class CommonEnvironmentTests(unittest.TestCase):
         os.symlink("/tmp/sub/file.txt", "/tmp/sub/file_sym.txt")
         assert isfile(str("/tmp/sub/file.txt")) is True, 'A symlink is a file like object.'
 
+    def _create_evidence_folder(self):
+        evidence_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, evidence_path)
+        for folder in ['usr/sbin', 'usr/share/ca-certificates', 'usr/share/man', 'usr/share/doc', 'etc']:
+            os.makedirs(os.path.join(evidence_path, folder))
+        for file_path in ['data.tar.xz', 'control.tar.gz', 'debian-binary', 'ca-certificates.deb', 'usr/sbin/update-ca-certificates']:
+            with open(os.path.join(evidence_path, file_path), 'w') as evidence_file:
+                evidence_file.write('content')
+        return evidence_path
+
     def test_get_files_from_folder(self):
-        self.os_walk_mock.return_value = os_walk_three_tuple
+        evidence_path = self._create_evidence_folder()
 
         common = CommonEnvironment()
-        result = common.get_files_from_folder('/', None)
+        result = common.get_files_from_folder(evidence_path, None)
 
         result_list = []
         for file in result:
             result_list.append('/'.join([file.location, file.name]))
-        template = [u'/home/BA-SWID-Generator/ca-certificates/data.tar.xz',
-                    u'/home/BA-SWID-Generator/ca-certificates/control.tar.gz',
-                    u'/home/BA-SWID-Generator/ca-certificates/debian-binary',
-                    u'/home/BA-SWID-Generator/ca-certificates/ca-certificates.deb',
-                    u'/home/BA-SWID-Generator/ca-certificates/usr/sbin/update-ca-certificates']
-        assert result_list == template
+        template = [evidence_path + '/data.tar.xz',
+                    evidence_path + '/control.tar.gz',
+                    evidence_path + '/debian-binary',
+                    evidence_path + '/ca-certificates.deb',
+                    evidence_path + '/usr/sbin/update-ca-certificates']
+        assert sorted(result_list) == sorted(template)
+        assert set(file.size for file in result) == {'7'}
 
     def test_get_files_from_folder_new_root(self):
-        self.os_walk_mock.return_value = os_walk_three_tuple
+        evidence_path = self._create_evidence_folder()
 
         common = CommonEnvironment()
-        result = common.get_files_from_folder('/', "/tmp/")
+        result = common.get_files_from_folder(evidence_path + '/', "/tmp/")
 
         for f in result:
             print(f.full_pathname)
@@ -112,12 +122,13 @@ class CommonEnvironmentTests(unittest.TestCase):
         result_list = []
         for file in result:
             result_list.append('/'.join([file.location, file.name]))
-        template = [u'/tmp/home/BA-SWID-Generator/ca-certificates/data.tar.xz',
-                    u'/tmp/home/BA-SWID-Generator/ca-certificates/control.tar.gz',
-                    u'/tmp/home/BA-SWID-Generator/ca-certificates/debian-binary',
-                    u'/tmp/home/BA-SWID-Generator/ca-certificates/ca-certificates.deb',
-                    u'/tmp/home/BA-SWID-Generator/ca-certificates/usr/sbin/update-ca-certificates']
-        assert result_list == template
+        template = [u'/tmp/data.tar.xz',
+                    u'/tmp/control.tar.gz',
+                    u'/tmp/debian-binary',
+                    u'/tmp/ca-certificates.deb',
+                    u'/tmp/usr/sbin/update-ca-certificates']
+        assert sorted(result_list) == sorted(template)
+        assert all(os.path.isfile(file.actual_full_pathname) for file in result)
 
     @staticmethod
     def _collect_garbage():
@@ -164,3 +175,38 @@ class CommonEnvironmentTests(unittest.TestCase):
 
         with self.assertRaises(RequirementsNotInstalledError):
             dpkg_env.check_requirements(sign_tag_execution=True)
+
+
+class ClassifyFilesTests(unittest.TestCase):
+
+    def setUp(self):
+        self.stat_file_patch = patch.object(CommonEnvironment, '_stat_file')
+        self.stat_file_mock = self.stat_file_patch.start()
+        self.stat_file_mock.side_effect = lambda path: None if path.endswith('/dir') else file_stat_result
+
+    def tearDown(self):
+        self.stat_file_patch.stop()
+
+    def test_config_files_first_without_duplicates(self):
+        files = ['/usr/bin/a', '/etc/a.conf', '/dir', '/usr/bin/a', '/usr/bin/b']
+        config_files = ['/etc/a.conf', '/etc/a.conf']
+
+        result = CommonEnvironment._classify_files(files, config_files)
+
+        assert [(f.full_pathname, f.mutable, f.size) for f in result] == [('/etc/a.conf', True, '1'),
+                                                                         ('/usr/bin/a', False, '1'),
+                                                                         ('/usr/bin/b', False, '1')]
+
+    def test_every_path_is_stated_once(self):
+        files = iter(['/usr/bin/a', '/etc/a.conf', '/usr/bin/a', '/dir', '/dir'])
+
+        with patch.object(os.path, 'getsize', side_effect=AssertionError('The size is taken from the stat result')):
+            result = CommonEnvironment._classify_files(files, iter(['/etc/a.conf']))
+            assert [f.size for f in result] == ['1', '1']
+
+        assert sorted(call[0][0] for call in self.stat_file_mock.call_args_list) == ['/dir', '/etc/a.conf', '/usr/bin/a']
+
+    def test_is_mutable(self):
+        result = CommonEnvironment._classify_files(['/etc/b.conf', '/usr/bin/b'], is_mutable=lambda path: path.startswith('/etc/'))
+
+        assert [(f.full_pathname, f.mutable) for f in result] == [('/etc/b.conf', True), ('/usr/bin/b', False)]
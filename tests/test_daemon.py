@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+from swid_generator.daemon import DatabaseMonitor, InventoryServer, InventoryService, RequestHandler, request
+from swid_generator.environments.common import CommonEnvironment
+from swid_generator.generators.hash_cache import HashCache
+from swid_generator.package_info import FileInfo, PackageInfo
+from swid_generator.settings import DEFAULT_ENTITY_NAME, DEFAULT_REGID
+from swid_generator.watcher import PollWatcher
+
+
+class CountingEnvironment(CommonEnvironment):
+    """
+    Environment with packages in a temporary folder, which counts the queries.
+    """
+    executable = 'counting_env'
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.status_path = os.path.join(folder, 'status')
+        self.calls = {'get_package_list': 0, 'get_files_for_package': 0, 'load_file_index': 0, 'clear_cache': 0}
+        self.refreshed_packages = []
+        self.write_status([('fortune', '2.0'), ('cowsay', '3.03')])
+
+    def write_status(self, packages):
+        self.packages = packages
+        with open(self.status_path, 'w') as status_file:
+            status_file.write(repr(packages))
+        for name, version in packages:
+            with open(os.path.join(self.folder, name), 'w') as package_file:
+                package_file.write('{0} {1}'.format(name, version))
+
+    def get_database_paths(self):
+        return (self.status_path,)
+
+    def clear_cache(self):
+        self.calls['clear_cache'] += 1
+
+    def refresh_packages(self, package_names):
+        self.refreshed_packages.append(package_names)
+
+    def load_file_index(self):
+        self.calls['load_file_index'] += 1
+
+    def get_package_list(self):
+        self.calls['get_package_list'] += 1
+        return [PackageInfo(package=name, version=version) for name, version in self.packages]
+
+    def get_files_for_package(self, package_info):
+        self.calls['get_files_for_package'] += 1
+        return [FileInfo(os.path.join(self.folder, package_info.package))]
+
+
+class InventoryServiceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.environment = CountingEnvironment(self.folder)
+        self.service = InventoryService(self.environment, {
+            'regid': DEFAULT_REGID,
+            'entity_name': DEFAULT_ENTITY_NAME,
+            'os': 'Debian_9',
+            'arch': 'x86_64',
+            'hash': 'sha256',
+            'full': True,
+            'pretty': False,
+            'hierarchic': False,
+            'package_digests': None,
+            'doc_separator': '\n'
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _handle(self, **request_data):
+        status, documents = self.service.handle(dict(request_data, command=request_data.get('command', 'swid')))
+        return status, [document if isinstance(document, bytes) else b''.join(document) for document in documents]
+
+    def test_packages_are_queried_once(self):
+        self.service.warm_up()
+
+        _, first_tags = self._handle()
+        _, second_tags = self._handle()
+        _, software_ids = self._handle(command='software-id')
+
+        assert len(first_tags) == 2
+        assert b'name="fortune"' in first_tags[0] and b'name="cowsay"' in first_tags[1]
+        assert second_tags == first_tags
+        assert software_ids == [b'strongswan.org__Debian_9-x86_64-fortune-2.0', b'strongswan.org__Debian_9-x86_64-cowsay-3.03']
+        assert self.environment.calls == {'get_package_list': 1, 'get_files_for_package': 2,
+                                          'load_file_index': 2, 'clear_cache': 0}
+
+    def test_targeted_requests(self):
+        _, all_tags = self._handle()
+
+        assert self._handle(package='cowsay') == (0, all_tags[1:])
+        assert self._handle(software_id='strongswan.org__Debian_9-x86_64-fortune-2.0') == (0, all_tags[:1])
+        assert self._handle(package='bash') == (1, [])
+        assert self._handle(software_id='strongswan.org__Debian_9-x86_64-fortune-1.0') == (1, [])
+        assert self.environment.calls['get_files_for_package'] == 2
+
+    def test_request_options(self):
+        _, (tag,) = self._handle(package='fortune', full=False, os='Fedora 25', regid='example.org')
+
+        assert b'tagId="Fedora_25-x86_64-fortune-2.0"' in tag
+        assert b'regid="example.org"' in tag
+        assert b'<Payload>' not in tag
+        # The tags with other options are cached separately
+        assert b'<Payload>' in self._handle(package='fortune')[1][0]
+
+    def test_database_change_updates_modified_packages(self):
+        self._handle()
+        self.environment.write_status([('fortune', '2.1'), ('cowsay', '3.03'), ('sl', '5.02')])
+
+        _, tags = self._handle()
+
+        assert len(tags) == 3
+        assert b'version="2.1"' in tags[0]
+        assert self.environment.calls['get_package_list'] == 2
+        # Only the tags of the upgraded and the installed package are generated again
+        assert self.environment.calls['get_files_for_package'] == 4
+        assert self.environment.refreshed_packages == [set(['fortune', 'sl'])]
+        assert self.environment.calls['clear_cache'] == 0
+        assert self._handle(software_id='strongswan.org__Debian_9-x86_64-fortune-2.0') == (1, [])
+
+        self.environment.write_status([('fortune', '2.1'), ('sl', '5.02')])
+        assert self._handle(package='cowsay') == (1, [])
+        assert self.environment.refreshed_packages[-1] == set(['cowsay'])
+
+        self._handle(command='refresh')
+        self._handle()
+        assert self.environment.calls['get_package_list'] == 4
+
+    def test_precompute_modified_packages(self):
+        self._handle()
+        self.environment.write_status([('fortune', '2.1'), ('cowsay', '3.03'), ('sl', '5.02')])
+
+        changed = self.service.refresh_if_changed()
+        assert [(p.package, p.version) for p in changed] == [('fortune', '2.1'), ('sl', '5.02')]
+        while self.service.precompute_next():
+            pass
+
+        _, tags = self._handle()
+        assert self.environment.calls['get_files_for_package'] == 4
+        assert b'name="sl"' in tags[2]
+
+    def test_max_cached_tags(self):
+        self.service.max_cached_tags = 1
+
+        _, first_tags = self._handle()
+        _, second_tags = self._handle()
+
+        # Only the tag of the last package is kept
+        assert second_tags == first_tags
+        assert self.environment.calls['get_files_for_package'] == 3
+
+    def test_hash_cache_is_shared_by_requests(self):
+        self.service.hash_cache = HashCache(os.path.join(self.folder, 'hashes.sqlite'), 100)
+
+        _, first_tags = self._handle()
+        self._handle(command='refresh')
+        _, second_tags = self._handle()
+
+        # The cache stays open between the requests and is closed with the service
+        assert second_tags == first_tags
+        assert (self.service.hash_cache.hits, self.service.hash_cache.misses) == (2, 2)
+        self.service.close()
+        assert self.service.hash_cache._connection is None
+
+    def test_invalid_requests(self):
+        for request_data in [['swid'], {'command': 'list'}, {'command': 'swid', 'jobs': 8},
+                             {'command': 'swid', 'full': 'yes'}, {'command': 'swid', 'hash': 'md5'},
+                             {'command': 'swid', 'package': 'fortune', 'software_id': 'x'}]:
+            with self.assertRaises(ValueError):
+                self.service.handle(request_data)
+
+
+class DatabaseMonitorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.environment = CountingEnvironment(self.folder)
+        self.service = InventoryService(self.environment, {
+            'regid': DEFAULT_REGID,
+            'entity_name': DEFAULT_ENTITY_NAME,
+            'os': 'Debian_9',
+            'arch': 'x86_64',
+            'hash': 'sha256',
+            'full': True,
+            'pretty': False,
+            'hierarchic': False,
+            'package_digests': None,
+            'doc_separator': '\n'
+        })
+        self.service.warm_up()
+        watcher = PollWatcher(self.environment.get_database_paths(), interval=0.01)
+        self.monitor = DatabaseMonitor(self.service, watcher, timeout=0.01)
+        self.monitor.start()
+
+    def tearDown(self):
+        self.monitor.stop()
+        shutil.rmtree(self.folder)
+
+    def test_tags_are_generated_in_background(self):
+        self.environment.write_status([('fortune', '2.1'), ('cowsay', '3.03')])
+
+        for _ in range(500):
+            with self.service.lock:
+                if self.environment.calls['get_files_for_package'] == 1:
+                    break
+            threading.Event().wait(0.01)
+
+        with self.service.lock:
+            status, documents = self.service.handle({'command': 'swid', 'package': 'fortune'})
+            assert status == 0 and b'version="2.1"' in next(documents)
+            assert self.environment.calls['get_files_for_package'] == 1
+            assert self.environment.calls['get_package_list'] == 2
+
+
+class InventoryServerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.folder, 'swid_generator.sock')
+        service = InventoryService(CountingEnvironment(self.folder), {
+            'regid': DEFAULT_REGID,
+            'entity_name': DEFAULT_ENTITY_NAME,
+            'os': 'Debian_9',
+            'arch': 'x86_64',
+            'hash': 'sha256',
+            'full': False,
+            'pretty': False,
+            'hierarchic': False,
+            'package_digests': None,
+            'doc_separator': '\n'
+        })
+        self.server = InventoryServer(self.socket_path, service)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        assert not os.path.exists(self.socket_path)
+        shutil.rmtree(self.folder)
+
+    def test_request(self):
+        status, output = request(self.socket_path, {'command': 'software-id', 'doc_separator': ','})
+        assert status == {'status': 0}
+        assert output == b'strongswan.org__Debian_9-x86_64-fortune-2.0,strongswan.org__Debian_9-x86_64-cowsay-3.03\n'
+
+        status, output = request(self.socket_path, {'command': 'swid', 'package': 'fortune', 'full': True})
+        assert status == {'status': 0}
+        assert output.startswith(b'<?xml version="1.0" encoding="utf-8"?><SoftwareIdentity')
+        assert output.count(b'<SoftwareIdentity') == 1 and b'<Payload>' in output
+
+        assert request(self.socket_path, {'command': 'swid', 'package': 'bash'}) == ({'status': 1}, b'')
+
+        status, output = request(self.socket_path, {'command': 'swid', 'regid': 'no regid'})
+        assert status['status'] == 2 and 'regid' in status['error']
+
+    def test_socket_permissions(self):
+        assert stat.S_IMODE(os.lstat(self.socket_path).st_mode) == 0o660
+
+    def test_silent_client_does_not_block(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            # The client never sends its request, the next one is served in the meantime
+            client.connect(self.socket_path)
+            status, _ = request(self.socket_path, {'command': 'software-id'})
+            assert status == {'status': 0}
+        finally:
+            client.close()
+
+    def test_silent_client_is_dropped(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            with patch.object(RequestHandler, 'timeout', 0.1):
+                client.connect(self.socket_path)
+                client.settimeout(5)
+                # The server closes the connection after the timeout
+                assert client.recv(1) == b''
+        finally:
+            client.close()
+
+    def test_socket_path_is_not_taken_over(self):
+        service = self.server.service
+        with self.assertRaises(OSError):
+            InventoryServer(self.socket_path, service)
+        # The running daemon is not disturbed by the check
+        assert request(self.socket_path, {'command': 'software-id'})[0] == {'status': 0}
+
+        status_path = os.path.join(self.folder, 'status')
+        with open(status_path, 'w') as status_file:
+            status_file.write('Package: fortune\n')
+        with self.assertRaises(OSError):
+            InventoryServer(status_path, service)
+        with open(status_path) as status_file:
+            assert status_file.read() == 'Package: fortune\n'
+
+    def test_stale_socket_is_replaced(self):
+        stale_path = os.path.join(self.folder, 'stale.sock')
+        stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale_socket.bind(stale_path)
+        stale_socket.close()
+
+        server = InventoryServer(stale_path, self.server.service)
+        server.server_close()
+        assert not os.path.exists(stale_path)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import hashlib
+import io
+import unittest
+
+from mock import patch
+from nose_parameterized import parameterized
+from swid_generator.environments import archive
+from swid_generator.environments.archive import normalize_member_path
+from swid_generator.environments.deb_package import DebPackage
+from swid_generator.exceptions import PackageFileError
+from tests.fixtures.package_files import CONFIG, FORTUNE, PackageFileTestCase, ar_archive, deb_package, tar_archive
+
+
+class DebPackageTests(PackageFileTestCase):
+    package_file_name = 'fortune.deb'
+
+    def test_normalize_member_path(self):
+        assert normalize_member_path('./usr/bin/bash') == '/usr/bin/bash'
+        assert normalize_member_path('./usr/share/') == '/usr/share'
+        assert normalize_member_path('./.hidden') == '/.hidden'
+        assert normalize_member_path('./') == '/'
+
+    def test_read_control_only(self):
+        package = DebPackage(self._write_package(deb_package('gz'))).read()
+
+        assert package.control['Package'] == 'fortune'
+        assert package.control['Version'] == '1:2.0-1'
+        assert package.conffiles == ['/etc/fortune.conf']
+        assert package.files == []
+
+    @parameterized.expand([('gz',), ('bz2',), ('xz',), ('',)])
+    def test_read_files(self, compression):
+        package = DebPackage(self._write_package(deb_package(compression))).read(('sha256', 'sha512'))
+
+        fortune_digests = {'sha256': hashlib.sha256(FORTUNE).hexdigest(), 'sha512': hashlib.sha512(FORTUNE).hexdigest()}
+        config_digests = {'sha256': hashlib.sha256(CONFIG).hexdigest(), 'sha512': hashlib.sha512(CONFIG).hexdigest()}
+        assert package.files == [('/etc/fortune.conf', len(CONFIG), config_digests),
+                                 ('/usr/share/games/fortunes', len(FORTUNE), fortune_digests),
+                                 ('/usr/share/games/fortunes.u8', len(FORTUNE), fortune_digests),
+                                 ('/usr/games/fortunes', len(FORTUNE), fortune_digests),
+                                 ('/usr/games/fortune.conf', len(CONFIG), config_digests),
+                                 ('/usr/games/hard', len(FORTUNE), fortune_digests)]
+
+    def test_docker_package(self):
+        package = DebPackage('tests/dumps/package_files/docker.deb').read(('sha256',))
+
+        with open('tests/dumps/package_files/docker.deb', 'rb') as package_file:
+            names = [name for name, _ in archive.iter_ar_members(package_file)]
+
+        assert names == ['debian-binary', 'control.tar.gz', 'data.tar.xz']
+        assert package.control['Version'] == '1.5-1'
+        assert sorted(path for path, _, _ in package.files)[:2] == ['/usr/bin/wmdocker', '/usr/share/doc/docker/README']
+
+    def test_no_debian_package(self):
+        with self.assertRaises(PackageFileError):
+            DebPackage(self._write_package(b'Not a package')).read()
+
+        with self.assertRaises(PackageFileError):
+            DebPackage(self._write_package(ar_archive([('debian-binary', b'2.0\n')]))).read()
+
+    def test_truncated_package(self):
+        content = deb_package('xz')
+
+        with self.assertRaises(PackageFileError):
+            DebPackage(self._write_package(content[:-100])).read(('sha256',))
+
+    def test_corrupt_package(self):
+        content = bytearray(deb_package('gz'))
+        # Non-ASCII name of the first ar member
+        content[8] = 0xff
+        with self.assertRaises(PackageFileError):
+            DebPackage(self._write_package(bytes(content))).read()
+
+        content = bytearray(deb_package('gz'))
+        # Broken deflate stream of the control archive
+        offset = bytes(content).index(archive.GZIP_MAGIC)
+        content[offset + 10:offset + 20] = b'\xff' * 10
+        with self.assertRaises(PackageFileError):
+            DebPackage(self._write_package(bytes(content))).read()
+
+    def test_zstd_not_available(self):
+        content = ar_archive([('debian-binary', b'2.0\n'), ('control.tar.zst', archive.ZSTD_MAGIC + b'\x00' * 10)])
+
+        with patch.object(archive, '_zstd_decompressor', None):
+            with self.assertRaises(PackageFileError):
+                DebPackage(self._write_package(content)).read()
+
+
+class ArchiveTests(unittest.TestCase):
+
+    def test_ar_members_with_padding(self):
+        content = ar_archive([('odd', b'abc'), ('even', b'abcd'), ('unread', b'x' * 5), ('last', b'z')])
+        result = []
+        for name, member in archive.iter_ar_members(io.BytesIO(content)):
+            if name != 'unread':
+                result.append((name, member.read()))
+
+        assert result == [('odd', b'abc'), ('even', b'abcd'), ('last', b'z')]
+
+    @parameterized.expand([('w:gz',), ('w:bz2',), ('w:xz',), ('w',)])
+    def test_open_decompressed(self, mode):
+        content = tar_archive([('a', FORTUNE, None, None)], mode=mode)
+        stream = archive.open_decompressed(io.BytesIO(content))
+
+        chunks = []
+        chunk = stream.read(1000)
+        while chunk:
+            chunks.append(chunk)
+            chunk = stream.read(1000)
+
+        assert b''.join(chunks) == tar_archive([('a', FORTUNE, None, None)])
@@ -6,9 +6,11 @@ import unittest
 
 from swid_generator.command_manager import CommandManager
 from tests.fixtures.command_manager_mock import CommandManagerMock
+from tests.fixtures.mock_data import file_stat_result
 from swid_generator.environments.dpkg_environment import DpkgEnvironment
 from swid_generator.package_info import PackageInfo, FileInfo
 from swid_generator.environments.common import CommonEnvironment
+from swid_generator.environments.dpkg_database import DpkgDatabase
 from mock import patch
 
 
@@ -16,30 +18,47 @@ class DpkgEnvironmentTests(unittest.TestCase):
     def setUp(self):
 
         self.command_manager_run_check_output_patch = patch.object(CommandManager, 'run_command_check_output')
+        self.command_manager_run_records_patch = patch.object(CommandManager, 'run_command_records')
         self.command_manager_run_command_patch = patch.object(CommandManager, 'run_command')
-        self.common_environment_is_file_patch = patch.object(CommonEnvironment, '_is_file')
+        self.common_environment_stat_file_patch = patch.object(CommonEnvironment, '_stat_file')
         self.os_path_getsize_patch = patch.object(os.path, 'getsize')
+        self.dpkg_database_patch = patch.object(DpkgEnvironment, '_get_database')
 
         self.command_manager_run_check_output_mock = self.command_manager_run_check_output_patch.start()
-        self.common_environment_is_file_mock = self.common_environment_is_file_patch.start()
+        self.command_manager_run_records_mock = self.command_manager_run_records_patch.start()
+        self.common_environment_stat_file_mock = self.common_environment_stat_file_patch.start()
         self.os_path_getsize_mock = self.os_path_getsize_patch.start()
         self.command_manager_run_command_mock = self.command_manager_run_command_patch.start()
+        self.dpkg_database_mock = self.dpkg_database_patch.start()
 
         self.command_manager_run_check_output_mock.side_effect = CommandManagerMock.run_command_check_output
+        self.command_manager_run_records_mock.side_effect = CommandManagerMock.run_command_records
         self.command_manager_run_command_mock.side_effect = CommandManagerMock.run_command
-        self.common_environment_is_file_mock.return_value = True
+        self.common_environment_stat_file_mock.return_value = file_stat_result
         self.os_path_getsize_mock.return_value = 1
+        self.dpkg_database_mock.return_value = None
 
         self.dpkg_environment = DpkgEnvironment()
 
     def tearDown(self):
         self.command_manager_run_check_output_patch.stop()
+        self.command_manager_run_records_patch.stop()
         self.command_manager_run_command_patch.stop()
-        self.common_environment_is_file_patch.stop()
+        self.common_environment_stat_file_patch.stop()
         self.os_path_getsize_patch.stop()
+        self.dpkg_database_patch.stop()
+
+    def test_get_packages_by_name(self):
+        with patch.object(CommandManager, 'run_command_query_output') as query_mock:
+            query_mock.side_effect = CommandManagerMock.run_command_query_output
+            result_list = self.dpkg_environment.get_packages_by_name(['apt', 'adduser', 'nonexistent'])
+
+        assert [(p.package, p.version) for p in result_list] == [('adduser', '3.113+nmu3ubuntu4'), ('apt', '1.2.19')]
+        assert query_mock.call_args[0][0][3:] == ['adduser', 'apt', 'nonexistent']
+        assert self.command_manager_run_check_output_mock.call_count == 0
 
     def test_get_package_list(self):
-        result_list = self.dpkg_environment.get_package_list()
+        result_list = list(self.dpkg_environment.get_package_list())
 
         expected_package_list = list()
 
@@ -52,6 +71,10 @@ class DpkgEnvironmentTests(unittest.TestCase):
             print(result_package.version)
             assert result_package.package == expected_package_list[index].package
             assert result_package.version == expected_package_list[index].version
+        assert len(result_list) == len(expected_package_list)
+        # The output is parsed while the package manager is still running
+        assert self.command_manager_run_records_mock.call_count == 1
+        assert self.command_manager_run_check_output_mock.call_count == 0
 
     def test_get_files_for_package(self):
         package_info = PackageInfo(package="docker")
@@ -76,30 +99,117 @@ class DpkgEnvironmentTests(unittest.TestCase):
             assert result_file.full_pathname == expected_file_list[index].full_pathname
 
     def test_get_packageinfo_from_packagefile(self):
-        result_package = self.dpkg_environment.get_packageinfo_from_packagefile("/tmp/docker.pkg")
-
-        print(result_package.package)
+        result_package = self.dpkg_environment.get_packageinfo_from_packagefile("tests/dumps/package_files/docker.deb")
 
         assert result_package.package == 'docker'
-        assert result_package.version == '1.0-5'
+        assert result_package.version == '1.5-1'
+        assert self.command_manager_run_check_output_mock.call_count == 0
 
     def test_get_files_from_packagefile(self):
-        all_files = self.dpkg_environment.get_files_from_packagefile("/tmp/docker.pkg")
+        all_files = self.dpkg_environment.get_files_from_packagefile("tests/dumps/package_files/docker.deb", 'sha256')
 
-        for f in all_files:
-            print(f.full_pathname)
+        result = [(f.full_pathname, f.size, f.mutable) for f in all_files]
+        assert result == [('/usr/bin/wmdocker', '18832', False),
+                          ('/usr/share/doc/docker/README', '2603', False),
+                          ('/usr/share/doc/docker/changelog.Debian.gz', '1062', False),
+                          ('/usr/share/doc/docker/copyright', '390', False),
+                          ('/usr/share/man/man1/wmdocker.1.gz', '1180', False),
+                          ('/usr/share/menu/docker', '106', False)]
+        assert all_files[0].digests == {'sha256': '681458ed63e2f0b0b105d9dbad65d9440eb53be931a052451ba7400415bd096e'}
+        assert self.command_manager_run_command_mock.call_count == 0
+        assert self.common_environment_stat_file_mock.call_count == 0
 
-        expected_file_list = list()
 
-        expected_file_list.append(FileInfo("/usr/share/bug/docker-bin/control"))
-        expected_file_list.append(FileInfo("/usr/share/bug/docker/control"))
-        expected_file_list.append(FileInfo("/usr/share/doc/docker/README.backtrace"))
-        expected_file_list.append(FileInfo("/usr/share/man/man8/docker.8.gz"))
-        expected_file_list.append(FileInfo("/usr/share/man/man8/dockerctl.8.gz"))
+class DpkgDatabaseEnvironmentTests(unittest.TestCase):
+    def setUp(self):
+        self.command_manager_run_check_output_patch = patch.object(CommandManager, 'run_command_check_output')
+        self.common_environment_stat_file_patch = patch.object(CommonEnvironment, '_stat_file')
+        self.os_path_getsize_patch = patch.object(os.path, 'getsize')
+        self.admin_dir_patch = patch.object(DpkgEnvironment, 'admin_dir', 'tests/dumps/dpkg_database')
+        self.database_patch = patch.object(DpkgEnvironment, '_database', None)
 
-        for index, result_file in enumerate(all_files):
-            assert result_file.name == expected_file_list[index].name
-            assert result_file.location == expected_file_list[index].location
-            assert result_file.location == expected_file_list[index].location
-            assert result_file.full_pathname == expected_file_list[index].full_pathname
+        self.command_manager_run_check_output_mock = self.command_manager_run_check_output_patch.start()
+        self.common_environment_stat_file_mock = self.common_environment_stat_file_patch.start()
+        self.os_path_getsize_mock = self.os_path_getsize_patch.start()
+        self.admin_dir_patch.start()
+        self.database_patch.start()
+
+        self.common_environment_stat_file_mock.side_effect = lambda path: file_stat_result if path != '/.' and path != '/etc' else None
+        self.os_path_getsize_mock.return_value = 1
+
+        self.dpkg_environment = DpkgEnvironment()
+
+    def tearDown(self):
+        self.command_manager_run_check_output_patch.stop()
+        self.common_environment_stat_file_patch.stop()
+        self.os_path_getsize_patch.stop()
+        self.admin_dir_patch.stop()
+        self.database_patch.stop()
+
+    def test_get_package_list(self):
+        result_list = self.dpkg_environment.get_package_list()
+
+        result = [(p.package, p.version) for p in result_list]
+        assert result == [('adduser', '3.113+nmu3ubuntu4'), ('apt', '1.2.19'), ('libc6', '2.23-0ubuntu9'),
+                          ('libc6', '2.23-0ubuntu9')]
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_get_packages_by_name(self):
+        result_list = self.dpkg_environment.get_packages_by_name(['libc6', 'base-files', 'nonexistent'])
+
+        # base-files was removed, only its configuration files are left
+        assert [(p.package, p.architecture) for p in result_list] == [('libc6', 'amd64'), ('libc6', 'i386')]
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_get_files_for_package(self):
+        result_list = self.dpkg_environment.get_files_for_package(PackageInfo(package='apt'))
+
+        result = [(f.full_pathname, f.mutable) for f in result_list]
+        assert result == [('/etc/apt/apt.conf.d/01autoremove', True),
+                          ('/etc/cron.daily/apt-compat', True),
+                          ('/etc/kernel/postinst.d/apt-auto-removal', True),
+                          ('/usr/bin/apt', False),
+                          ('/usr/share/doc/apt/changelog.gz', False)]
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_get_files_for_multiarch_package(self):
+        result_list = self.dpkg_environment.get_files_for_package(PackageInfo(package='libc6'))
+
+        assert [f.full_pathname for f in result_list] == ['/lib/x86_64-linux-gnu/libc.so.6']
+
+    def test_get_files_for_each_architecture(self):
+        # libc6 is installed for amd64 and i386, each with its own file list
+        amd64_package, i386_package = self.dpkg_environment.get_packages_by_name(['libc6'])
+
+        amd64_files = self.dpkg_environment.get_files_for_package(amd64_package)
+        i386_files = self.dpkg_environment.get_files_for_package(i386_package)
+
+        assert [f.full_pathname for f in amd64_files] == ['/lib/x86_64-linux-gnu/libc.so.6']
+        assert [f.full_pathname for f in i386_files] == ['/lib/i386-linux-gnu/libc.so.6']
+
+    def test_get_files_for_unknown_package_falls_back(self):
+        self.command_manager_run_check_output_mock.side_effect = CommandManagerMock.run_command_check_output
+
+        result_list = self.dpkg_environment.get_files_for_package(PackageInfo(package='docker'))
+
+        assert len(result_list) == 7
+        assert self.command_manager_run_check_output_mock.call_count == 2
+
+    def test_refresh_packages(self):
+        database = DpkgEnvironment._get_database()
+        self.dpkg_environment.get_files_for_package(PackageInfo(package='apt'))
+        self.dpkg_environment.get_files_for_package(PackageInfo(package='adduser'))
+
+        self.dpkg_environment.reload_package_list()
+        self.dpkg_environment.refresh_packages({'apt'})
+
+        # The status file is parsed again, only the file list of the upgraded package is dropped
+        assert DpkgEnvironment._get_database() is database
+        assert database._packages is None
+        assert list(database._file_lists.keys()) == [('adduser', 'all')]
+        assert len(list(self.dpkg_environment.get_package_list())) == 4
 
+    @staticmethod
+    def test_database_not_available():
+        assert DpkgDatabase.is_available('tests/dumps/dpkg_database')
+        assert not DpkgDatabase.is_available('tests/dumps/nonexistent')
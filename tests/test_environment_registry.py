@@ -5,7 +5,7 @@ import sys
 
 from swid_generator.environments.common import CommonEnvironment
 from swid_generator.environments.environment_registry import EnvironmentRegistry
-from swid_generator.exceptions import AutodetectionError, EnvironmentNotInstalledError
+from swid_generator.exceptions import AutodetectionError, EnvironmentNotInstalledError, PackageFileError
 
 if sys.version_info < (2, 7):
     # We need the skip decorators from unittest2 on Python 2.6.
@@ -26,6 +26,10 @@ class TestEnvironmentNoFail(CommonEnvironment):
         return True
 
 
+class TestPackageFileEnvironment(TestEnvironmentFail):
+    package_file_suffixes = ('.pkg.tar.xz', '.pkg.tar.zst')
+
+
 class EnvironmentRegistryTest(unittest.TestCase):
 
     def setUp(self):
@@ -63,3 +67,14 @@ class EnvironmentRegistryTest(unittest.TestCase):
         result = self.env_registry.get_environment_strings()
         expected = ['auto', 'test_env_fail', 'test_env_no_fail']
         assert result == expected
+
+    def test_get_package_file_environment(self):
+        # The environment does not need to be installed to read its package files
+        self.env_registry.register('test_package_env', TestPackageFileEnvironment)
+
+        env = self.env_registry.get_package_file_environment('/pool/fortune-2.0-1-x86_64.pkg.tar.zst')
+        assert isinstance(env, TestPackageFileEnvironment)
+        assert self.env_registry.get_package_file_suffixes() == ('.pkg.tar.xz', '.pkg.tar.zst')
+
+        with self.assertRaises(PackageFileError):
+            self.env_registry.get_package_file_environment('/pool/fortune_2.0-1_amd64.deb')
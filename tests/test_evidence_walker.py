@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+from swid_generator.environments.common import CommonEnvironment
+from swid_generator.generators import evidence_walker
+from swid_generator.generators.evidence_walker import EvidenceWalker
+
+
+class EvidenceWalkerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for folder in ['a/b/c', 'a/cache', 'd']:
+            os.makedirs(os.path.join(self.root, folder))
+        for file_path in ['top.txt', 'a/one.txt', 'a/b/two.log', 'a/b/c/three.txt', 'a/cache/four.txt', 'd/five.txt']:
+            with open(os.path.join(self.root, file_path), 'w') as test_file:
+                test_file.write(file_path)
+        os.symlink(os.path.join(self.root, 'a'), os.path.join(self.root, 'link_to_a'))
+        os.symlink(os.path.join(self.root, 'top.txt'), os.path.join(self.root, 'link_to_top.txt'))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _walk(self, **kwargs):
+        walker = EvidenceWalker(self.root, **kwargs)
+        return walker, [(os.path.relpath(path, self.root), stat_result.st_size) for path, stat_result in walker.walk()]
+
+    def test_walk_like_os_walk(self):
+        expected = []
+        for dirpath, _, files in os.walk(self.root):
+            for file_name in files:
+                path = '/'.join([dirpath, file_name])
+                expected.append((path, os.stat(path).st_size))
+
+        walker = EvidenceWalker(self.root)
+        assert [(path, stat_result.st_size) for path, stat_result in walker.walk()] == expected
+
+    def test_symlinks(self):
+        _, files = self._walk()
+
+        assert ('link_to_top.txt', len('top.txt')) in files
+        assert not [path for path, _ in files if path.startswith('link_to_a')]
+
+    def test_exclude(self):
+        walker, files = self._walk(exclude=['*.log', 'a/cache', 'link_*'])
+
+        assert sorted(path for path, _ in files) == ['a/b/c/three.txt', 'a/one.txt', 'd/five.txt', 'top.txt']
+        assert walker.excluded == 4
+
+    def test_max_depth(self):
+        _, files = self._walk(max_depth=1)
+
+        assert sorted(path for path, _ in files) == ['a/one.txt', 'd/five.txt', 'link_to_top.txt', 'top.txt']
+
+    def test_one_file_system(self):
+        real_scandir = evidence_walker._scandir
+
+        class OtherDeviceEntry(object):
+            def __init__(self, entry):
+                self.entry = entry
+
+            def __getattr__(self, name):
+                return getattr(self.entry, name)
+
+            def stat(self, follow_symlinks=True):
+                result = self.entry.stat(follow_symlinks=follow_symlinks)
+                return os.stat_result((result.st_mode, result.st_ino, result.st_dev + 1) + tuple(result)[3:])
+
+        def other_device_for_d(path):
+            return [OtherDeviceEntry(entry) if entry.name == 'd' else entry for entry in real_scandir(path)]
+
+        # The device is taken from the stat result of the directory entry, without another lstat call
+        with patch.object(evidence_walker, '_scandir', side_effect=other_device_for_d), \
+                patch.object(os, 'lstat', side_effect=AssertionError('lstat called')):
+            _, files = self._walk(one_file_system=True, exclude=['link_*'])
+
+        assert sorted(path for path, _ in files) == ['a/b/c/three.txt', 'a/b/two.log', 'a/cache/four.txt', 'a/one.txt', 'top.txt']
+
+    @patch.object(evidence_walker, 'scandir', None)
+    def test_one_file_system_without_scandir(self):
+        _, files = self._walk(one_file_system=True, exclude=['link_*'])
+
+        assert len(files) == 6
+
+    def test_unreadable_folder(self):
+        walker = EvidenceWalker(os.path.join(self.root, 'missing'))
+
+        assert list(walker.walk()) == []
+        assert walker.errors == 1
+
+    def test_stats(self):
+        walker, files = self._walk()
+        stats = walker.get_stats()
+
+        assert stats['files'] == len(files) == 7
+        assert stats['directories'] == 6
+        assert stats['elapsed'] > 0
+        assert stats['files_per_second'] == stats['files'] / stats['elapsed']
+        assert stats['directories_per_second'] == stats['directories'] / stats['elapsed']
+
+    def test_get_files_from_folder_uses_walker(self):
+        walker = EvidenceWalker(self.root, exclude=['a', 'link_*'])
+
+        with patch.object(os.path, 'getsize', side_effect=AssertionError('The size is taken from the walker')):
+            files = CommonEnvironment.get_files_from_folder(self.root, None, walker)
+
+        assert sorted((file_info.name, file_info.size) for file_info in files) == [('five.txt', '10'), ('top.txt', '7')]
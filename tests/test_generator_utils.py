@@ -4,11 +4,14 @@ from __future__ import print_function, division, absolute_import, unicode_litera
 from swid_generator.package_info import PackageInfo
 from swid_generator.generators import utils
 
+import io
 import os
+import tempfile
 import unittest
-from glob import glob
 from shutil import rmtree
 
+from mock import patch
+
 
 class GeneratorUtilsTest(unittest.TestCase):
 
@@ -58,43 +61,55 @@ class GeneratorUtilsTest(unittest.TestCase):
         assert expectedsha512hash == result512
 
     @staticmethod
-    def test_create_temp_folder():
-
-        no_absolute_package_path = "package/test.deb"
-        absolute_package_path = "/tmp/test.deb"
-        save_location = "/tmp/swid_33333"
-
-        current_directory = os.getcwd()
-
-        save_options_absolute_path = utils.create_temp_folder(absolute_package_path)
-        save_options_relative_path = utils.create_temp_folder(no_absolute_package_path)
-
-        print(save_options_absolute_path)
+    def test_create_multiple_hashes():
+        file_path = "tests/dumps/package_files/docker.deb"
 
-        expected_save_options_absolute_path = {
-            'absolute_package_path': absolute_package_path,
-            'save_location': save_location
-        }
+        result = utils.create_hashes(file_path, ('sha256', 'sha512'))
 
-        expected_save_options_relative_path = {
-            'absolute_package_path': '/'.join((current_directory, no_absolute_package_path)),
-            'save_location': save_location
+        assert result == {
+            'sha256': utils.create_sha256_hash(file_path),
+            'sha512': utils.create_sha512_hash(file_path)
         }
 
-        assert expected_save_options_absolute_path['absolute_package_path'] == save_options_absolute_path['absolute_package_path']
-        assert expected_save_options_absolute_path['save_location'][:9] == save_options_absolute_path['save_location'][:9]
-
-        assert os.path.exists(save_options_absolute_path['save_location'])
-
-        assert expected_save_options_relative_path['absolute_package_path'] == save_options_relative_path['absolute_package_path']
-        assert expected_save_options_relative_path['save_location'][:9] == save_options_relative_path['save_location'][:9]
-
-        assert os.path.exists(save_options_absolute_path['save_location'])
+    @staticmethod
+    def test_get_hash_algorithms():
+        assert utils.get_hash_algorithms('sha512,sha256') == ('sha256', 'sha512')
+        assert utils.get_hash_algorithms('sha384') == ('sha384',)
 
-        tmp_folder = '/tmp/'
-        prefix_folder = 'swid_*'
+    @staticmethod
+    def test_temp_workspace():
+        parent = tempfile.mkdtemp()
+        try:
+            with utils.TempWorkspace(parent) as workspace, utils.TempWorkspace(parent) as other_workspace:
+                assert workspace.path is None
+                path = workspace.get_path()
+                assert workspace.get_path() == path
+                assert os.path.dirname(path) == parent
+                assert os.path.basename(path).startswith('swid_')
+
+                with open(os.path.join(path, 'swid_tag.xml'), 'w') as afile:
+                    afile.write('<SoftwareIdentity />')
+                # Concurrent workspaces are separate folders, which are removed on their own
+                other_path = other_workspace.get_path()
+                assert other_path != path
+                other_workspace.cleanup()
+                assert not os.path.exists(other_path)
+                assert os.path.exists(path)
+
+            assert os.listdir(parent) == []
+        finally:
+            rmtree(parent)
 
-        # garbage collection
-        files_to_delete = glob(tmp_folder + prefix_folder)
-        for file_path in files_to_delete:
-            rmtree(file_path)
+    @staticmethod
+    def test_read_list_file():
+        folder = tempfile.mkdtemp()
+        try:
+            list_path = os.path.join(folder, 'targets.list')
+            with open(list_path, 'w') as list_file:
+                list_file.write('# NAC request\nfortune\n\n  strongswan.org__SomeTestOS-i686-cowsay-3.03  \n')
+
+            assert utils.read_list_file(list_path) == ['fortune', 'strongswan.org__SomeTestOS-i686-cowsay-3.03']
+            with patch('sys.stdin', io.StringIO('/pool/fortune.deb\n#/pool/cowsay.deb\n')):
+                assert utils.read_list_file('-') == ['/pool/fortune.deb']
+        finally:
+            rmtree(folder)
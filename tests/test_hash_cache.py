@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from swid_generator.generators.hash_cache import HashCache
+from swid_generator.generators.hash_engine import HashEngine
+from swid_generator.generators.utils import create_hashes
+from swid_generator.package_info import FileInfo
+
+
+class HashCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.folder, 'cache', 'hashes.sqlite')
+        self.file_paths = []
+        for index in range(3):
+            file_path = os.path.join(self.folder, 'file%d' % index)
+            with open(file_path, 'w') as afile:
+                afile.write('content %d' % index)
+            self.file_paths.append(file_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _hash_all(self, max_entries=100, hash_algorithms='sha256'):
+        hash_cache = HashCache(self.cache_path, max_entries)
+        hash_engine = HashEngine(hash_algorithms, hash_cache=hash_cache)
+        digests = list(hash_engine.hash_files([FileInfo(path) for path in self.file_paths]))
+        hash_engine.close()
+        hash_cache.close()
+        return hash_cache, digests
+
+    def test_second_run_is_served_from_cache(self):
+        first_cache, first_digests = self._hash_all()
+        second_cache, second_digests = self._hash_all()
+
+        assert first_digests == [create_hashes(path, ('sha256',)) for path in self.file_paths]
+        assert second_digests == first_digests
+        assert (first_cache.hits, first_cache.misses) == (0, 3)
+        assert (second_cache.hits, second_cache.misses) == (3, 0)
+
+    def test_modified_file_is_hashed_again(self):
+        self._hash_all()
+        with open(self.file_paths[1], 'a') as afile:
+            afile.write(' modified')
+
+        hash_cache, digests = self._hash_all()
+
+        assert (hash_cache.hits, hash_cache.misses) == (2, 1)
+        assert digests[1] == create_hashes(self.file_paths[1], ('sha256',))
+
+    def test_missing_algorithm_is_a_miss(self):
+        self._hash_all(hash_algorithms='sha256')
+
+        hash_cache, digests = self._hash_all(hash_algorithms='sha256,sha512')
+        assert hash_cache.misses == 3
+        assert set(digests[0].keys()) == set(['sha256', 'sha512'])
+
+        hash_cache, _ = self._hash_all(hash_algorithms='sha512')
+        assert hash_cache.hits == 3
+
+    def test_eviction(self):
+        self._hash_all(max_entries=2)
+
+        hash_cache, _ = self._hash_all(max_entries=2)
+
+        assert hash_cache.misses >= 1
+        connection = HashCache(self.cache_path, 2)._connect()
+        assert connection.execute('SELECT COUNT(*) FROM file_hashes').fetchone()[0] == 2
+
+    def test_cache_shared_by_engines(self):
+        hash_cache = HashCache(self.cache_path, 2)
+        for _ in range(2):
+            # E.g. two requests to the daemon, the engine doesn't close the cache
+            hash_engine = HashEngine('sha256', hash_cache=hash_cache)
+            digests = list(hash_engine.hash_files([FileInfo(path) for path in self.file_paths]))
+            hash_engine.close()
+
+        assert digests == [create_hashes(path, ('sha256',)) for path in self.file_paths]
+        assert (hash_cache.hits, hash_cache.misses) == (3, 3)
+        connection = sqlite3.connect(self.cache_path)
+        assert connection.execute('SELECT COUNT(*) FROM file_hashes').fetchone() == (3,)
+
+        # The entries are evicted once, when the owner closes the cache
+        hash_cache.close()
+        assert connection.execute('SELECT COUNT(*) FROM file_hashes').fetchone() == (2,)
+        connection.close()
+
+    def test_two_caches_on_one_path(self):
+        first_cache = HashCache(self.cache_path, 100)
+        second_cache = HashCache(self.cache_path, 100)
+        first_cache.batch_size = second_cache.batch_size = 1
+
+        # Every batch is written in its own short transaction, the caches don't wait for each other
+        first_cache.store(HashCache.get_key(self.file_paths[0]), {'sha256': 'a'})
+        second_cache.store(HashCache.get_key(self.file_paths[1]), {'sha256': 'b'})
+        first_cache.store(HashCache.get_key(self.file_paths[2]), {'sha256': 'c'})
+        assert second_cache.lookup(HashCache.get_key(self.file_paths[0]), ('sha256',)) == {'sha256': 'a'}
+        second_cache.close()
+        first_cache.close()
+
+        hash_cache = HashCache(self.cache_path, 100)
+        assert [hash_cache.lookup(HashCache.get_key(path), ('sha256',)) for path in self.file_paths] == \
+            [{'sha256': 'a'}, {'sha256': 'b'}, {'sha256': 'c'}]
+
+    def test_locked_cache_is_skipped(self):
+        self._hash_all()
+        connection = sqlite3.connect(self.cache_path)
+        connection.execute('BEGIN EXCLUSIVE')
+        try:
+            hash_cache = HashCache(self.cache_path, 100)
+            hash_cache.timeout = 0.01
+            hash_engine = HashEngine('sha256', hash_cache=hash_cache)
+            digests = list(hash_engine.hash_files([FileInfo(path) for path in self.file_paths]))
+            hash_engine.close()
+            hash_cache.close()
+        finally:
+            connection.rollback()
+            connection.close()
+
+        # The files are hashed instead
+        assert digests == [create_hashes(path, ('sha256',)) for path in self.file_paths]
+        assert (hash_cache.hits, hash_cache.misses) == (0, 3)
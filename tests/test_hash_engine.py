@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import unittest
+
+from swid_generator.generators.hash_engine import HashEngine
+from swid_generator.generators.utils import create_sha256_hash, create_sha384_hash
+from swid_generator.package_info import FileInfo
+
+
+class HashEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        paths = [
+            'tests/dumps/package_files/cowsay/cowsay',
+            'tests/dumps/package_files/cowsay/pony-smaller.cow',
+            'tests/dumps/package_files/cowsay/etc/copyright.txt',
+            'tests/dumps/package_files/fortune/fortune',
+            'tests/dumps/package_files/fortune/copyright',
+            'tests/dumps/package_files/fortune/usr/config.txt',
+            'tests/dumps/package_files/docker.deb'
+        ]
+        self.files = [FileInfo(path) for path in paths] * 10
+        self.expected = [{'sha256': create_sha256_hash(path), 'sha384': create_sha384_hash(path)} for path in paths] * 10
+
+    def test_hash_files_serial(self):
+        hash_engine = HashEngine('sha256,sha384')
+        assert list(hash_engine.hash_files(self.files)) == self.expected
+        hash_engine.close()
+
+    def test_hash_files_parallel_keeps_order(self):
+        hash_engine = HashEngine('sha256,sha384', jobs=4)
+        assert list(hash_engine.hash_files(self.files)) == self.expected
+        assert list(hash_engine.hash_files(reversed(self.files))) == list(reversed(self.expected))
+        hash_engine.close()
+
+    def test_package_digests(self):
+        file_info = FileInfo('tests/dumps/package_files/cowsay/cowsay')
+        stat_result = os.stat(file_info.actual_full_pathname)
+        file_info.package_digests = {'sha256': 'abc'}
+        file_info.package_stat = (stat_result.st_size, int(stat_result.st_mtime))
+
+        assert list(HashEngine('sha256', package_digests='verify').hash_files([file_info])) == [{'sha256': 'abc'}]
+        assert list(HashEngine('sha256', package_digests='trust').hash_files([file_info])) == [{'sha256': 'abc'}]
+        assert list(HashEngine('sha256').hash_files([file_info])) == [{'sha256': create_sha256_hash(file_info.full_pathname)}]
+
+    def test_package_digests_modified_file(self):
+        file_info = FileInfo('tests/dumps/package_files/cowsay/cowsay')
+        file_info.package_digests = {'sha256': 'abc'}
+        file_info.package_stat = (1, None)
+
+        expected = [{'sha256': create_sha256_hash(file_info.full_pathname)}]
+        assert list(HashEngine('sha256', package_digests='verify').hash_files([file_info])) == expected
+        assert list(HashEngine('sha256', package_digests='trust').hash_files([file_info])) == [{'sha256': 'abc'}]
+
+    def test_package_digests_missing_algorithm(self):
+        file_info = FileInfo('tests/dumps/package_files/cowsay/cowsay')
+        file_info.package_digests = {'sha256': 'abc'}
+        file_info.package_stat = (1, None)
+
+        result = list(HashEngine('sha256,sha384', package_digests='trust').hash_files([file_info]))
+        assert result == [self.expected[0]]
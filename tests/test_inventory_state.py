@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from functools import partial
+
+from nose_parameterized import parameterized
+from swid_generator.environments.common import CommonEnvironment
+from swid_generator.generators import swid_generator
+from swid_generator.generators.inventory_state import InventoryState, write_removed_list
+from swid_generator.package_info import PackageInfo
+from swid_generator.settings import DEFAULT_REGID, DEFAULT_ENTITY_NAME
+
+
+class Environment(CommonEnvironment):
+
+    def __init__(self, packages):
+        self.packages = packages
+
+    def get_package_list(self):
+        return self.packages
+
+    @staticmethod
+    def get_os_string():
+        return 'SomeTestOS'
+
+    @staticmethod
+    def get_architecture():
+        return 'i686'
+
+
+class InventoryStateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.folder, 'state.json')
+        self.options = {'regid': DEFAULT_REGID, 'full': False}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _run(self, packages, changed_only=True, options=None):
+        inventory_state = InventoryState(self.state_path, options or self.options)
+        swid_tags = swid_generator.create_swid_tags(Environment(packages), DEFAULT_ENTITY_NAME, DEFAULT_REGID,
+                                                    inventory_state=inventory_state, changed_only=changed_only)
+        names = [swid_tag.split(b'name="')[1].split(b'"')[0].decode('utf-8') for swid_tag in swid_tags]
+        inventory_state.save()
+        return names, inventory_state.get_removed()
+
+    def test_first_run_emits_all_packages(self):
+        names, removed = self._run([PackageInfo('cowsay', '1.0'), PackageInfo('fortune', '2.0')])
+
+        assert names == ['cowsay', 'fortune']
+        assert removed == []
+
+    def test_unchanged_packages_are_skipped(self):
+        packages = [PackageInfo('cowsay', '1.0'), PackageInfo('fortune', '2.0')]
+        self._run(packages)
+
+        names, removed = self._run(packages)
+        assert names == []
+        assert removed == []
+
+        # The state of a run without changes still contains all packages
+        names, removed = self._run(packages[:1])
+        assert names == []
+        assert [entry['package'] for entry in removed] == ['fortune']
+
+    def test_added_upgraded_and_removed_packages(self):
+        self._run([PackageInfo('cowsay', '1.0'), PackageInfo('fortune', '2.0'), PackageInfo('openssh', '7.0')])
+
+        names, removed = self._run([PackageInfo('cowsay', '1.1'), PackageInfo('fortune', '2.0'), PackageInfo('vim', '8.0')])
+
+        assert names == ['cowsay', 'vim']
+        assert removed == [
+            {'package': 'cowsay', 'version': '1.0', 'software_id': 'strongswan.org__SomeTestOS-i686-cowsay-1.0'},
+            {'package': 'openssh', 'version': '7.0', 'software_id': 'strongswan.org__SomeTestOS-i686-openssh-7.0'}
+        ]
+
+    def test_multiple_versions_of_one_package(self):
+        self._run([PackageInfo('kernel', '4.1'), PackageInfo('kernel', '4.2')])
+
+        names, removed = self._run([PackageInfo('kernel', '4.2'), PackageInfo('kernel', '4.3')])
+
+        assert names == ['kernel']
+        assert [entry['version'] for entry in removed] == ['4.1']
+        with open(self.state_path) as state_file:
+            state = json.load(state_file)
+        assert [entry['version'] for entry in state['packages']['kernel']] == ['4.2', '4.3']
+
+    def test_changed_options_regenerate_all_tags(self):
+        packages = [PackageInfo('cowsay', '1.0')]
+        self._run(packages)
+
+        names, _ = self._run(packages, options={'regid': 'example.org', 'full': False})
+        assert names == ['cowsay']
+
+    def test_all_tags_without_changed_only(self):
+        packages = [PackageInfo('cowsay', '1.0')]
+        self._run(packages)
+
+        names, _ = self._run(packages, changed_only=False)
+        assert names == ['cowsay']
+
+    def test_unmatched_packages_are_kept(self):
+        packages = [PackageInfo('cowsay', '1.0'), PackageInfo('fortune', '2.0')]
+        self._run(packages)
+
+        inventory_state = InventoryState(self.state_path, self.options)
+        matcher = partial(swid_generator.package_name_matcher, value='cowsay')
+        list(swid_generator.create_swid_tags(Environment(packages), DEFAULT_ENTITY_NAME, DEFAULT_REGID, matcher=matcher,
+                                             inventory_state=inventory_state))
+        assert sorted(inventory_state.current) == ['cowsay', 'fortune']
+
+    def test_invalid_state_file(self):
+        with open(self.state_path, 'w') as state_file:
+            state_file.write('{invalid')
+
+        names, _ = self._run([PackageInfo('cowsay', '1.0')])
+        assert names == ['cowsay']
+
+    @parameterized.expand([
+        ([],),
+        ('x',),
+        (None,),
+        ({},),
+        ({'format': 1},),
+        ({'format': 1, 'packages': []},),
+        ({'format': 1, 'packages': {'cowsay': {'version': '1.0'}}},),
+        ({'format': 1, 'packages': {'cowsay': ['1.0']}},),
+        ({'format': 1, 'packages': {'cowsay': [{'version': '1.0'}]}},),
+    ])
+    def test_unexpected_state_structure(self, state):
+        if isinstance(state, dict):
+            state['options'] = self.options
+        with open(self.state_path, 'w') as state_file:
+            json.dump(state, state_file)
+
+        # Valid JSON with another structure counts as no previous state
+        inventory_state = InventoryState(self.state_path, self.options)
+        assert inventory_state.previous == {}
+        assert inventory_state.get_removed() == []
+
+    def test_write_removed_list(self):
+        removed_path = os.path.join(self.folder, 'removed.json')
+        removed = [{'package': 'cowsay', 'version': '1.0', 'software_id': 'strongswan.org__SomeTestOS-i686-cowsay-1.0'}]
+
+        write_removed_list(removed_path, removed)
+
+        with open(removed_path) as removed_file:
+            assert json.load(removed_file) == removed
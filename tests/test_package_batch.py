@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from mock import patch
+from nose_parameterized import parameterized
+from swid_generator.environments.dpkg_environment import DpkgEnvironment
+from swid_generator.environments.environment_registry import EnvironmentRegistry
+from swid_generator.environments.pacman_environment import PacmanEnvironment
+from swid_generator.environments.rpm_environment import RpmEnvironment
+from swid_generator.exceptions import PackageFileError
+from swid_generator.generators import package_batch
+from swid_generator.generators.package_batch import PackageTagCache, create_package_file_tags, find_package_files
+from tests.fixtures.package_files import deb_package, pacman_package, rpm_package, write_package_file
+
+
+class PackageBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.pool = os.path.join(self.folder, 'pool')
+        self.cache_path = os.path.join(self.folder, 'cache', 'package_tags.sqlite')
+
+        self.environment_registry = EnvironmentRegistry()
+        self.environment_registry.register('rpm', RpmEnvironment)
+        self.environment_registry.register('dpkg', DpkgEnvironment)
+        self.environment_registry.register('pacman', PacmanEnvironment)
+
+        self.package_files = [
+            self._write_package('main/f/fortune/fortune_2.0-1_amd64.deb', deb_package('xz')),
+            self._write_package('main/f/fortune/fortune-2.0-1.fc25.x86_64.rpm', rpm_package()),
+            self._write_package('core/fortune-2.0-1-x86_64.pkg.tar.xz', pacman_package()),
+        ]
+        self._write_package('main/f/fortune/fortune_2.0-1.dsc', b'Source: fortune\n')
+
+        self.swid_args = {
+            'entity_name': 'strongSwan Project',
+            'regid': 'strongswan.org',
+            'os_string': 'Debian_9',
+            'architecture': 'x86_64',
+            'full': True,
+            'hash_algorithms': 'sha256'
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write_package(self, name, content):
+        return write_package_file(self.pool, name, content)
+
+    def _create_tags(self, file_paths, jobs=1, tag_cache=None, errors=None):
+        return list(create_package_file_tags(file_paths, self.environment_registry, self.swid_args, jobs=jobs,
+                                             tag_cache=tag_cache, errors=errors))
+
+    def test_find_package_files(self):
+        suffixes = self.environment_registry.get_package_file_suffixes()
+
+        assert find_package_files(self.pool, suffixes) == sorted(self.package_files)
+        assert find_package_files(os.path.join(self.pool, 'core'), suffixes) == [self.package_files[2]]
+
+    @parameterized.expand([(1,), (2,)])
+    def test_tags_in_order(self, jobs):
+        swidtags = self._create_tags(self.package_files, jobs=jobs)
+
+        assert len(swidtags) == 3
+        assert b'tagId="Debian_9-x86_64-fortune-1~2.0-1"' in swidtags[0]
+        assert b'tagId="Debian_9-x86_64-fortune-2.0"' in swidtags[1]
+        assert b'tagId="Debian_9-x86_64-fortune-1~2.0-1"' in swidtags[2]
+        assert b'name="fortune.conf"' in swidtags[1]
+
+        assert self._create_tags(self.package_files[::-1], jobs=jobs) == swidtags[::-1]
+
+    @parameterized.expand([(1,), (2,)])
+    def test_unreadable_package_files_are_skipped(self, jobs):
+        broken_path = self._write_package('main/b/broken_1.0_amd64.deb', b'Not a package' * 10)
+        missing_path = os.path.join(self.pool, 'main/m/missing_1.0_amd64.deb')
+        errors = []
+
+        swidtags = self._create_tags([broken_path, self.package_files[0], missing_path], jobs=jobs,
+                                     tag_cache=PackageTagCache(self.cache_path, self.swid_args, 100), errors=errors)
+
+        assert swidtags == self._create_tags(self.package_files[:1])
+        assert [path for path, _ in errors] == [broken_path, missing_path]
+
+        with self.assertRaises(PackageFileError):
+            self._create_tags([broken_path])
+
+    @parameterized.expand([(1,), (2,)])
+    def test_corrupt_package_files_are_skipped(self, jobs):
+        content = deb_package('xz')
+        truncated_path = self._write_package('main/t/truncated_1.0_amd64.deb', content[:len(content) // 2])
+        flipped_content = bytearray(content)
+        flipped_content[8] = 0xff
+        flipped_path = self._write_package('main/f/flipped_1.0_amd64.deb', bytes(flipped_content))
+        file_paths = [self.package_files[0], truncated_path, flipped_path] + self.package_files[1:]
+        errors = []
+
+        # A reader error, which is no PackageFileError, doesn't end the batch either
+        with patch.object(RpmEnvironment, 'get_packageinfo_from_packagefile', side_effect=TypeError('bug')):
+            swidtags = self._create_tags(file_paths, jobs=jobs, errors=errors)
+
+        assert swidtags == self._create_tags(self.package_files[::2])
+        assert [path for path, _ in errors] == [truncated_path, flipped_path, self.package_files[1]]
+        assert errors[2][1] == 'Unexpected error TypeError: bug'
+
+    def test_tag_cache(self):
+        first_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        first_tags = self._create_tags(self.package_files, tag_cache=first_cache)
+
+        # Only the new package file is read in the second run
+        new_path = self._write_package('main/f/fortune/fortune_2.1-1_amd64.deb', deb_package('gz'))
+        second_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        with patch.object(package_batch, '_create_tag', wraps=package_batch._create_tag) as create_tag_mock:
+            second_tags = self._create_tags(self.package_files + [new_path], tag_cache=second_cache)
+
+        assert second_tags[:3] == first_tags
+        create_tag_mock.assert_called_once_with(new_path, True)
+        assert (first_cache.hits, first_cache.misses) == (0, 3)
+        assert (second_cache.hits, second_cache.misses) == (3, 1)
+
+        # A copy of a package file is found by its digest
+        copied_path = self._write_package('copy/fortune_2.0-1_amd64.deb', open(self.package_files[0], 'rb').read())
+        third_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        with patch.object(package_batch, 'create_swid_tags', wraps=package_batch.create_swid_tags) as create_swid_tags_mock:
+            assert self._create_tags([copied_path], tag_cache=third_cache) == first_tags[:1]
+        assert not create_swid_tags_mock.called
+        assert (third_cache.hits, third_cache.misses) == (1, 0)
+
+    def test_tag_cache_in_workers(self):
+        self._create_tags(self.package_files, tag_cache=PackageTagCache(self.cache_path, self.swid_args, 100))
+
+        # The package files are hashed by the workers, not by this process
+        copied_paths = [self._write_package('copy/' + os.path.basename(path), open(path, 'rb').read())
+                        for path in self.package_files]
+        tag_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        main_pid = os.getpid()
+        create_hashes = package_batch.create_hashes
+
+        def create_hashes_in_worker(*args):
+            assert os.getpid() != main_pid
+            return create_hashes(*args)
+
+        with patch.object(package_batch, 'create_hashes', side_effect=create_hashes_in_worker) as create_hashes_mock:
+            swidtags = self._create_tags(copied_paths, jobs=2, tag_cache=tag_cache)
+        assert not create_hashes_mock.called
+
+        assert swidtags == self._create_tags(self.package_files)
+        assert (tag_cache.hits, tag_cache.misses) == (3, 0)
+
+    def test_tag_cache_eviction(self):
+        with patch.object(package_batch.time, 'time', return_value=1000):
+            self._create_tags(self.package_files, tag_cache=PackageTagCache(self.cache_path, self.swid_args, 100))
+
+        # Only the tag used last is kept
+        with patch.object(package_batch.time, 'time', return_value=2000):
+            self._create_tags(self.package_files[1:2], tag_cache=PackageTagCache(self.cache_path, self.swid_args, 1))
+
+        connection = sqlite3.connect(self.cache_path)
+        assert connection.execute('SELECT last_used FROM package_tags').fetchall() == [(2000,)]
+        assert connection.execute('SELECT COUNT(*) FROM package_digests').fetchone() == (1,)
+        connection.close()
+
+        tag_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        self._create_tags(self.package_files, tag_cache=tag_cache)
+        assert (tag_cache.hits, tag_cache.misses) == (1, 2)
+
+    def test_tag_cache_options(self):
+        self._create_tags(self.package_files, tag_cache=PackageTagCache(self.cache_path, self.swid_args, 100))
+
+        other_options = dict(self.swid_args, hash_algorithms='sha512')
+        tag_cache = PackageTagCache(self.cache_path, other_options, 100)
+        self._create_tags(self.package_files, tag_cache=tag_cache)
+
+        assert (tag_cache.hits, tag_cache.misses) == (0, 3)
+
+    def test_shared_tag_cache(self):
+        # Two runs, which write to the same cache at the same time, don't block each other
+        first_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        second_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        first_tags = create_package_file_tags(self.package_files, self.environment_registry, self.swid_args,
+                                              tag_cache=first_cache)
+        second_tags = create_package_file_tags(self.package_files[::-1], self.environment_registry, self.swid_args,
+                                               tag_cache=second_cache)
+        swidtags = list(zip(first_tags, second_tags))
+
+        assert [first for first, _ in swidtags] == [second for _, second in swidtags[::-1]]
+        # The second run already finds the tag of the middle package file, which the first run committed
+        assert (first_cache.hits, first_cache.misses) == (0, 3)
+        assert (second_cache.hits, second_cache.misses) == (1, 2)
+        tag_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        assert self._create_tags(self.package_files, tag_cache=tag_cache) == [first for first, _ in swidtags]
+        assert (tag_cache.hits, tag_cache.misses) == (3, 0)
+
+    def test_locked_tag_cache_is_skipped(self):
+        swidtags = self._create_tags(self.package_files, tag_cache=PackageTagCache(self.cache_path, self.swid_args, 100))
+        copied_paths = [self._write_package('copy/' + os.path.basename(path), open(path, 'rb').read())
+                        for path in self.package_files]
+
+        # The cache is locked by another run after the tag digests were read
+        tag_cache = PackageTagCache(self.cache_path, self.swid_args, 100)
+        tag_cache.timeout = 0.01
+        copied_tags = create_package_file_tags(copied_paths, self.environment_registry, self.swid_args,
+                                               tag_cache=tag_cache)
+        connection = sqlite3.connect(self.cache_path)
+        try:
+            first_tag = next(copied_tags)
+            connection.execute('BEGIN EXCLUSIVE')
+            other_tags = list(copied_tags)
+        finally:
+            connection.rollback()
+            connection.close()
+
+        # The tags are created instead
+        assert [first_tag] + other_tags == swidtags
+        assert (tag_cache.hits, tag_cache.misses) == (1, 2)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import unittest
+
+from mock import patch
+from swid_generator.package_info import FileInfo, PackageInfo
+
+
+class FileInfoTests(unittest.TestCase):
+
+    def test_path_components(self):
+        file_info = FileInfo('/usr/share/doc/bash/copyright', actual_path=False)
+
+        assert file_info.name == 'copyright'
+        assert file_info.location == '/usr/share/doc/bash'
+        assert file_info.full_pathname == '/usr/share/doc/bash/copyright'
+        assert file_info.full_pathname_splitted == ['usr', 'share', 'doc', 'bash', 'copyright']
+        assert file_info.actual_full_pathname == ''
+
+    def test_no_instance_dict(self):
+        file_info = FileInfo('/usr/bin/bash', size='0')
+
+        assert not hasattr(file_info, '__dict__')
+        with self.assertRaises(AttributeError):
+            file_info.fullpathname_splitted = ['usr', 'bin', 'bash']
+
+    def test_locations_are_shared(self):
+        first = FileInfo('/usr/lib/' + 'libc.so', size='0')
+        second = FileInfo(''.join(['/usr', '/lib/libm.so']), size='0')
+
+        assert first.location is second.location
+
+    def test_size_is_read_lazily(self):
+        with patch.object(os.path, 'getsize') as getsize_mock:
+            getsize_mock.return_value = 42
+            file_info = FileInfo('/usr/bin/bash')
+            assert getsize_mock.call_count == 0
+
+            assert file_info.size == '42'
+            assert file_info.size == '42'
+            getsize_mock.assert_called_once_with('/usr/bin/bash')
+
+    def test_known_size(self):
+        with patch.object(os.path, 'getsize') as getsize_mock:
+            file_info = FileInfo('/usr/bin/bash', size='7')
+            assert file_info.size == '7'
+            assert getsize_mock.call_count == 0
+
+    def test_actual_path(self):
+        file_info = FileInfo('/etc/fortune.conf', actual_path=False)
+        with self.assertRaises(AttributeError):
+            file_info.size
+
+        with patch.object(os.path, 'getsize') as getsize_mock:
+            getsize_mock.return_value = 3
+            file_info.set_actual_path('/tmp/swid_x/etc/fortune.conf')
+            assert file_info.size == '3'
+
+        assert file_info.actual_full_pathname == b'/tmp/swid_x/etc/fortune.conf'
+        assert file_info.full_pathname == '/etc/fortune.conf'
+
+
+class PackageInfoTests(unittest.TestCase):
+
+    def test_defaults(self):
+        package_info = PackageInfo()
+
+        assert (package_info.package, package_info.version, package_info.files, package_info.status) == ('', '', [], None)
+        assert not hasattr(package_info, '__dict__')
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
+import hashlib
 import os
+import shutil
+import tempfile
 import unittest
 
 from swid_generator.command_manager import CommandManager
 from tests.fixtures.command_manager_mock import CommandManagerMock
+from tests.fixtures.mock_data import file_stat_result
+from tests.fixtures.package_files import CONFIG, FORTUNE, pacman_package, write_package_file
 from swid_generator.environments.pacman_environment import PacmanEnvironment
 from swid_generator.package_info import PackageInfo, FileInfo
 from swid_generator.environments.common import CommonEnvironment
@@ -16,30 +21,45 @@ class DpkgEnvironmentTests(unittest.TestCase):
     def setUp(self):
 
         self.command_manager_run_check_output_patch = patch.object(CommandManager, 'run_command_check_output')
+        self.command_manager_run_records_patch = patch.object(CommandManager, 'run_command_records')
         self.command_manager_run_command_patch = patch.object(CommandManager, 'run_command')
-        self.common_environment_is_file_patch = patch.object(CommonEnvironment, '_is_file')
+        self.common_environment_stat_file_patch = patch.object(CommonEnvironment, '_stat_file')
         self.os_path_getsize_patch = patch.object(os.path, 'getsize')
 
         self.command_manager_run_check_output_mock = self.command_manager_run_check_output_patch.start()
-        self.common_environment_is_file_mock = self.common_environment_is_file_patch.start()
+        self.command_manager_run_records_mock = self.command_manager_run_records_patch.start()
+        self.common_environment_stat_file_mock = self.common_environment_stat_file_patch.start()
         self.os_path_getsize_mock = self.os_path_getsize_patch.start()
         self.command_manager_run_command_mock = self.command_manager_run_command_patch.start()
 
         self.command_manager_run_check_output_mock.side_effect = CommandManagerMock.run_command_check_output
+        self.command_manager_run_records_mock.side_effect = CommandManagerMock.run_command_records
         self.command_manager_run_command_mock.side_effect = CommandManagerMock.run_command
-        self.common_environment_is_file_mock.return_value = True
+        self.common_environment_stat_file_mock.return_value = file_stat_result
         self.os_path_getsize_mock.return_value = 1
 
         self.pacman_environment = PacmanEnvironment()
+        self.file_index_patch = patch.object(PacmanEnvironment, '_file_index', None)
+        self.local_db_path_patch = patch.object(PacmanEnvironment, 'local_db_path', 'tests/dumps/pacman_local')
+        self.file_index_patch.start()
+        self.local_db_path_patch.start()
+        self.folder = tempfile.mkdtemp()
+
+    def _write_package(self):
+        return write_package_file(self.folder, 'fortune.pkg.tar.xz', pacman_package())
 
     def tearDown(self):
+        shutil.rmtree(self.folder)
+        self.file_index_patch.stop()
+        self.local_db_path_patch.stop()
         self.command_manager_run_check_output_patch.stop()
+        self.command_manager_run_records_patch.stop()
         self.command_manager_run_command_patch.stop()
-        self.common_environment_is_file_patch.stop()
+        self.common_environment_stat_file_patch.stop()
         self.os_path_getsize_patch.stop()
 
     def test_get_package_list(self):
-        result_list = self.pacman_environment.get_package_list()
+        result_list = list(self.pacman_environment.get_package_list())
 
         expected_package_list = list()
 
@@ -52,6 +72,18 @@ class DpkgEnvironmentTests(unittest.TestCase):
             print(result_package.version)
             assert result_package.package == expected_package_list[index].package
             assert result_package.version == expected_package_list[index].version
+        assert len(result_list) == len(expected_package_list)
+        # The output is parsed while the package manager is still running
+        assert self.command_manager_run_records_mock.call_count == 1
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_get_packages_by_name(self):
+        with patch.object(CommandManager, 'run_command_query_output') as query_mock:
+            query_mock.side_effect = CommandManagerMock.run_command_query_output
+            result_list = self.pacman_environment.get_packages_by_name(['nonexistent', 'archlinux-keyring'])
+
+        assert [(p.package, p.version) for p in result_list] == [('archlinux-keyring', '20170320-1')]
+        assert self.command_manager_run_check_output_mock.call_count == 0
 
     def test_get_files_for_package(self):
         package_info = PackageInfo(package="docker")
@@ -74,25 +106,68 @@ class DpkgEnvironmentTests(unittest.TestCase):
             assert result_file.full_pathname == expected_file_list[index].full_pathname
 
     def test_get_packageinfo_from_packagefile(self):
-        result_package = self.pacman_environment.get_packageinfo_from_packagefile("/tmp/docker.pkg")
+        result_package = self.pacman_environment.get_packageinfo_from_packagefile(self._write_package())
 
-        print(result_package.package)
-
-        assert result_package.package == 'docker'
-        assert result_package.version == '1:17.04.0-1'
+        assert result_package.package == 'fortune'
+        assert result_package.version == '1:2.0-1'
+        assert self.command_manager_run_check_output_mock.call_count == 0
 
     def test_get_files_from_packagefile(self):
-        all_files = self.pacman_environment.get_files_from_packagefile("/tmp/docker.pkg")
+        all_files = self.pacman_environment.get_files_from_packagefile(self._write_package(), 'sha256')
 
-        expected_file_list = list()
+        result = [(f.full_pathname, f.size, f.mutable) for f in all_files]
+        assert result == [('/etc/fortune.conf', str(len(CONFIG)), True),
+                          ('/usr/share/fortune/fortunes', str(len(FORTUNE)), False),
+                          ('/usr/share/fortune/local', str(len(CONFIG)), True),
+                          ('/usr/share/fortune/fortunes.u8', str(len(FORTUNE)), False)]
+        assert all_files[1].digests == {'sha256': hashlib.sha256(FORTUNE).hexdigest()}
+        assert self.command_manager_run_command_mock.call_count == 0
+        assert self.common_environment_stat_file_mock.call_count == 0
 
-        expected_file_list.append(FileInfo("/usr/bin/docker.ini"))
-        expected_file_list.append(FileInfo("/usr/bin/docker"))
-        expected_file_list.append(FileInfo("/usr/bin/docker-containerd"))
+    def test_load_file_index_from_local_db(self):
+        self.pacman_environment.load_file_index()
 
-        for index, result_file in enumerate(all_files):
-            assert result_file.name == expected_file_list[index].name
-            assert result_file.location == expected_file_list[index].location
-            assert result_file.location == expected_file_list[index].location
-            assert result_file.full_pathname == expected_file_list[index].full_pathname
+        assert PacmanEnvironment._file_index == {
+            'acl': ['/usr/', '/usr/bin/', '/usr/bin/getfacl', '/usr/bin/setfacl'],
+            'docker': ['/etc/', '/etc/docker.ini', '/usr/', '/usr/bin/', '/usr/bin/docker', '/usr/bin/docker-containerd']
+        }
+
+    def test_load_file_index_from_query(self):
+        with patch.object(PacmanEnvironment, 'local_db_path', 'tests/dumps/nonexistent'):
+            self.pacman_environment.load_file_index()
+
+        assert list(PacmanEnvironment._file_index.keys()) == ['docker']
+        assert len(PacmanEnvironment._file_index['docker']) == 5
+
+    def test_refresh_packages(self):
+        self.pacman_environment.load_file_index()
+        docker_paths = PacmanEnvironment._file_index['docker']
+        PacmanEnvironment._file_index['acl'] = ['/usr/bin/outdated']
+        PacmanEnvironment._file_index['removed'] = ['/usr/bin/removed']
+
+        self.pacman_environment.refresh_packages({'acl', 'removed'})
+
+        assert sorted(PacmanEnvironment._file_index.keys()) == ['acl', 'docker']
+        assert PacmanEnvironment._file_index['acl'] == ['/usr/', '/usr/bin/', '/usr/bin/getfacl', '/usr/bin/setfacl']
+        assert PacmanEnvironment._file_index['docker'] is docker_paths
+
+    def test_get_files_for_package_from_file_index(self):
+        self.common_environment_stat_file_mock.side_effect = lambda path: None if path.endswith('/') else file_stat_result
+        self.pacman_environment.load_file_index()
+        self.command_manager_run_check_output_mock.reset_mock()
+
+        result_list = self.pacman_environment.get_files_for_package(PackageInfo(package="docker"))
+
+        result = [(f.full_pathname, f.mutable) for f in result_list]
+        assert result == [('/etc/docker.ini', True), ('/usr/bin/docker', False), ('/usr/bin/docker-containerd', False)]
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_add_package_digests(self):
+        files = [FileInfo('/etc/docker.ini'), FileInfo('/usr/bin/docker'), FileInfo('/usr/bin/docker-containerd')]
+
+        self.pacman_environment.add_package_digests(PackageInfo(package='docker', version='1:17.04.0-1'), files)
 
+        assert files[0].package_digests == {'sha256': '0f5e2f4c2f1d0d0e0b5e0e1c2f4c2f1d0d0e0b5e0e1c2f4c2f1d0d0e0bbbbbbb'}
+        assert files[0].package_stat == (5, 1492000000)
+        assert files[1].package_stat == (14302432, 1492000000)
+        assert files[2].package_digests is None
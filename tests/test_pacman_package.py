@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import hashlib
+import unittest
+
+from nose_parameterized import parameterized
+from swid_generator.environments import archive
+from swid_generator.environments.pacman_package import PacmanPackage
+from swid_generator.exceptions import PackageFileError
+from tests.fixtures.package_files import CONFIG, FORTUNE, PackageFileTestCase, pacman_package, tar_archive
+
+
+class PacmanPackageTests(PackageFileTestCase):
+    package_file_name = 'fortune.pkg.tar.xz'
+
+    def test_read_metadata_only(self):
+        package = PacmanPackage(self._write_package(pacman_package())).read()
+
+        assert package.info['pkgname'] == 'fortune'
+        assert package.info['pkgver'] == '1:2.0-1'
+        assert package.backup == ['/etc/fortune.conf', '/usr/share/fortune/local']
+        assert package.files == []
+
+    @parameterized.expand([('xz',), ('gz',), ('',)])
+    def test_read_files(self, compression):
+        package = PacmanPackage(self._write_package(pacman_package(compression))).read(('sha256', 'sha512'))
+
+        fortune_digests = {'sha256': hashlib.sha256(FORTUNE).hexdigest(), 'sha512': hashlib.sha512(FORTUNE).hexdigest()}
+        config_digests = {'sha256': hashlib.sha256(CONFIG).hexdigest(), 'sha512': hashlib.sha512(CONFIG).hexdigest()}
+        assert package.files == [('/etc/fortune.conf', len(CONFIG), config_digests),
+                                 ('/usr/share/fortune/fortunes', len(FORTUNE), fortune_digests),
+                                 ('/usr/share/fortune/local', len(CONFIG), config_digests),
+                                 ('/usr/share/fortune/fortunes.u8', len(FORTUNE), fortune_digests)]
+        assert package.mtree['/usr/share/fortune/fortunes']['sha256digest'] == fortune_digests['sha256']
+
+    def test_trust_mtree(self):
+        # The digest of the .MTREE is taken as it is, the files are not read
+        content = pacman_package(mtree_entries=[('/usr/share/fortune/fortunes', b'recorded by makepkg')])
+        recorded_digest = hashlib.sha256(b'recorded by makepkg').hexdigest()
+
+        package = PacmanPackage(self._write_package(content)).read(('sha256',), trust_mtree=True)
+        digests = dict((path, file_digests['sha256']) for path, _, file_digests in package.files)
+        assert digests['/usr/share/fortune/fortunes'] == recorded_digest
+        assert digests['/usr/share/fortune/fortunes.u8'] == recorded_digest
+        assert digests['/etc/fortune.conf'] == hashlib.sha256(CONFIG).hexdigest()
+
+        package = PacmanPackage(self._write_package(content)).read(('sha256', 'sha384'), trust_mtree=True)
+        digests = dict((path, file_digests['sha256']) for path, _, file_digests in package.files)
+        assert digests['/usr/share/fortune/fortunes'] == hashlib.sha256(FORTUNE).hexdigest()
+
+    @unittest.skipIf(archive._zstd_decompressor is None, 'zstd is not available')
+    def test_read_zstd_package(self):
+        try:
+            from compression.zstd import compress
+        except ImportError:
+            from zstandard import compress
+        content = compress(pacman_package(compression=''))
+
+        package = PacmanPackage(self._write_package(content)).read(('sha256',))
+
+        assert package.info['pkgver'] == '1:2.0-1'
+        assert len(package.files) == 4
+
+    def test_no_pacman_package(self):
+        with self.assertRaises(PackageFileError):
+            PacmanPackage(self._write_package(tar_archive([('usr/bin/fortune', FORTUNE, None, None)], mode='w:xz'))).read()
+
+        with self.assertRaises(PackageFileError):
+            PacmanPackage(self._write_package(b'Not a package' * 100)).read()
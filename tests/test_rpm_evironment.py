@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
+import hashlib
 import os
+import shutil
+import tempfile
 import unittest
 
 from swid_generator.command_manager import CommandManager
 from tests.fixtures.command_manager_mock import CommandManagerMock
+from tests.fixtures.mock_data import file_stat_result
+from tests.fixtures.package_files import CONFIG, FORTUNE, rpm_package, write_package_file
 from swid_generator.environments.rpm_environment import RpmEnvironment
 from swid_generator.package_info import PackageInfo, FileInfo
 from swid_generator.environments.common import CommonEnvironment
@@ -17,30 +22,42 @@ class RpmEnvironmentTests(unittest.TestCase):
     def setUp(self):
 
         self.command_manager_run_check_output_patch = patch.object(CommandManager, 'run_command_check_output')
+        self.command_manager_run_records_patch = patch.object(CommandManager, 'run_command_records')
         self.command_manager_run_popen_patch = patch.object(CommandManager, 'run_command_popen')
-        self.common_environment_is_file_patch = patch.object(CommonEnvironment, '_is_file')
+        self.common_environment_stat_file_patch = patch.object(CommonEnvironment, '_stat_file')
         self.os_path_getsize_patch = patch.object(os.path, 'getsize')
 
         self.command_manager_run_check_output_mock = self.command_manager_run_check_output_patch.start()
+        self.command_manager_run_records_mock = self.command_manager_run_records_patch.start()
         self.command_manager_run_popen_mock = self.command_manager_run_popen_patch.start()
-        self.common_environment_is_file_mock = self.common_environment_is_file_patch.start()
+        self.common_environment_stat_file_mock = self.common_environment_stat_file_patch.start()
         self.os_path_getsize_mock = self.os_path_getsize_patch.start()
 
         self.command_manager_run_check_output_mock.side_effect = CommandManagerMock.run_command_check_output
+        self.command_manager_run_records_mock.side_effect = CommandManagerMock.run_command_records
         self.command_manager_run_popen_mock.side_effect = CommandManagerMock.run_command_popen
-        self.common_environment_is_file_mock.return_value = True
+        self.common_environment_stat_file_mock.return_value = file_stat_result
         self.os_path_getsize_mock.return_value = 1
 
         self.rpm_environment = RpmEnvironment()
+        self.file_index_patch = patch.object(RpmEnvironment, '_file_index', None)
+        self.file_index_patch.start()
+        self.folder = tempfile.mkdtemp()
+
+    def _write_package(self):
+        return write_package_file(self.folder, 'fortune.rpm', rpm_package())
 
     def tearDown(self):
+        shutil.rmtree(self.folder)
+        self.file_index_patch.stop()
         self.command_manager_run_check_output_patch.stop()
-        self.common_environment_is_file_patch.stop()
+        self.command_manager_run_records_patch.stop()
+        self.common_environment_stat_file_patch.stop()
         self.os_path_getsize_patch.stop()
         self.command_manager_run_popen_patch.stop()
 
     def test_get_package_list(self):
-        result_list = self.rpm_environment.get_package_list()
+        result_list = list(self.rpm_environment.get_package_list())
 
         expected_package_list = list()
 
@@ -54,6 +71,24 @@ class RpmEnvironmentTests(unittest.TestCase):
             print(result_package.version)
             assert result_package.package == expected_package_list[index].package
             assert result_package.version == expected_package_list[index].version
+        assert len(result_list) == len(expected_package_list)
+        # The output is parsed while the package manager is still running
+        assert self.command_manager_run_records_mock.call_count == 1
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_package_list_is_read_to_the_end(self):
+        finished = []
+
+        def run_command_records(*args, **kwargs):
+            for record in CommandManagerMock.run_command_records(*args, **kwargs):
+                yield record
+            finished.append(True)
+        self.command_manager_run_records_mock.side_effect = run_command_records
+
+        # rpm exits and releases the lock of the rpm database before the first package is used
+        package_info = next(iter(self.rpm_environment.get_package_list()))
+        assert package_info.package == 'perl-Git'
+        assert finished == [True]
 
     def test_get_files_for_package(self):
 
@@ -62,14 +97,87 @@ class RpmEnvironmentTests(unittest.TestCase):
         self._check_rpm_result_list(result_list)
 
     def test_get_packageinfo_from_packagefile(self):
-        result_package = self.rpm_environment.get_packageinfo_from_packagefile("/tmp/docker.pkg")
+        result_package = self.rpm_environment.get_packageinfo_from_packagefile(self._write_package())
 
-        assert result_package.package == 'docker'
-        assert result_package.version == '1.0-5'
+        assert result_package.package == 'fortune'
+        assert result_package.version == '2.0'
+        assert self.command_manager_run_check_output_mock.call_count == 0
 
     def test_get_files_from_packagefile(self):
-        all_files = self.rpm_environment.get_files_from_packagefile("/tmp/docker.pkg")
-        self._check_rpm_result_list(all_files)
+        all_files = self.rpm_environment.get_files_from_packagefile(self._write_package(), 'sha256')
+
+        result = [(f.full_pathname, f.size, f.mutable) for f in all_files]
+        assert result == [('/etc/fortune.conf', str(len(CONFIG)), True),
+                          ('/usr/bin/fortune', str(len(FORTUNE)), False),
+                          ('/usr/bin/fortune-hard', str(len(FORTUNE)), False),
+                          ('/usr/bin/fortune-sym', str(len(FORTUNE)), False),
+                          ('/usr/share/fortune/empty', '0', False)]
+        assert all_files[0].digests == {'sha256': hashlib.sha256(CONFIG).hexdigest()}
+        assert self.command_manager_run_popen_mock.call_count == 0
+        assert self.common_environment_stat_file_mock.call_count == 0
+
+    def test_get_packages_by_name(self):
+        with patch.object(CommandManager, 'run_command_query_output') as query_mock:
+            query_mock.side_effect = CommandManagerMock.run_command_query_output
+            result_list = self.rpm_environment.get_packages_by_name(['setup', 'nonexistent', 'perl-Git'])
+
+        assert [(p.package, p.version) for p in result_list] == [('perl-Git', '2.9.3-3.fc25'), ('setup', '2.10.4-1.fc25')]
+        assert query_mock.call_count == 1
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_load_file_index(self):
+        self.rpm_environment.load_file_index()
+
+        assert sorted(RpmEnvironment._file_index.keys()) == ['docker', 'setup']
+        assert RpmEnvironment._file_index['docker']['digest_algorithm'] == '8'
+        assert RpmEnvironment._file_index['docker']['files'][4] == \
+            ('/usr/bin/docker', 0, 14302432, 1490000000, '2f5e2f4c2f1d0d0e0b5e0e1c2f4c2f1d0d0e0b5e0e1c2f4c2f1d0d0e0ddddddd')
+
+    def test_get_files_for_package_from_file_index(self):
+        self.rpm_environment.load_file_index()
+        self.command_manager_run_check_output_mock.reset_mock()
+
+        result_list = self.rpm_environment.get_files_for_package(PackageInfo(package="docker"))
+
+        result = [(f.full_pathname, f.mutable) for f in result_list]
+        assert result == [('/etc/sysconfig/docker-network', True),
+                          ('/etc/sysconfig/docker-storage', True),
+                          ('/etc/docker', False),
+                          ('/etc/docker/certs.d/redhat.com', False),
+                          ('/usr/bin/docker', False)]
+        assert self.command_manager_run_check_output_mock.call_count == 0
+
+    def test_add_package_digests(self):
+        self.common_environment_stat_file_mock.return_value = file_stat_result
+        files = [FileInfo('/usr/bin/docker'), FileInfo('/etc/docker')]
+
+        self.rpm_environment.add_package_digests(PackageInfo(package="docker"), files)
+
+        assert files[0].package_digests == {'sha256': '2f5e2f4c2f1d0d0e0b5e0e1c2f4c2f1d0d0e0b5e0e1c2f4c2f1d0d0e0ddddddd'}
+        assert files[0].package_stat == (14302432, 1490000000)
+        assert files[1].package_digests is None
+
+    def test_add_package_digests_unsupported_algorithm(self):
+        self.rpm_environment.load_file_index()
+        RpmEnvironment._file_index['docker']['digest_algorithm'] = '1'
+        files = [FileInfo('/usr/bin/docker')]
+
+        self.rpm_environment.add_package_digests(PackageInfo(package="docker"), files)
+
+        assert files[0].package_digests is None
+
+    def test_refresh_packages(self):
+        self.rpm_environment.load_file_index()
+        setup_entry = RpmEnvironment._file_index['setup']
+        self.command_manager_run_check_output_mock.reset_mock()
+
+        self.rpm_environment.refresh_packages({'docker', 'removed'})
+
+        # The upgraded package is queried on its own
+        assert list(RpmEnvironment._file_index.keys()) == ['setup']
+        assert RpmEnvironment._file_index['setup'] is setup_entry
+        self.rpm_environment.get_files_for_package(PackageInfo(package="docker"))
+        assert self.command_manager_run_check_output_mock.called
 
     @staticmethod
     def _check_rpm_result_list(list_to_check):
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import hashlib
+
+from nose_parameterized import parameterized
+from swid_generator.environments.rpm_package import RpmHeader, RpmPackage
+from swid_generator.exceptions import PackageFileError
+from tests.fixtures.package_files import CONFIG, FORTUNE, PackageFileTestCase, rpm_header, rpm_package
+
+
+class RpmPackageTests(PackageFileTestCase):
+    package_file_name = 'fortune.rpm'
+
+    def test_read_header_only(self):
+        package = RpmPackage(self._write_package(rpm_package())).read()
+
+        assert (package.name, package.version, package.release) == ('fortune', '2.0', '1.fc25')
+        assert package.config_files == ['/etc/fortune.conf']
+        assert [path for path, _, _, _ in package.file_entries][:3] == ['/etc/fortune.conf', '/usr/bin/fortune',
+                                                                        '/usr/bin/fortune-hard']
+        assert package.files == []
+
+    @parameterized.expand([('gzip', False), ('xz', False), ('', False), ('gzip', True)])
+    def test_read_files(self, compression, stripped):
+        package = RpmPackage(self._write_package(rpm_package(compression, stripped))).read(('sha256', 'sha384'))
+
+        fortune_digests = {'sha256': hashlib.sha256(FORTUNE).hexdigest(), 'sha384': hashlib.sha384(FORTUNE).hexdigest()}
+        config_digests = {'sha256': hashlib.sha256(CONFIG).hexdigest(), 'sha384': hashlib.sha384(CONFIG).hexdigest()}
+        empty_digests = {'sha256': hashlib.sha256(b'').hexdigest(), 'sha384': hashlib.sha384(b'').hexdigest()}
+        assert package.files == [('/etc/fortune.conf', len(CONFIG), config_digests),
+                                 ('/usr/bin/fortune', len(FORTUNE), fortune_digests),
+                                 ('/usr/bin/fortune-hard', len(FORTUNE), fortune_digests),
+                                 ('/usr/bin/fortune-sym', len(FORTUNE), fortune_digests),
+                                 ('/usr/share/fortune/empty', 0, empty_digests)]
+
+    def test_no_rpm_package(self):
+        with self.assertRaises(PackageFileError):
+            RpmPackage(self._write_package(b'Not a package' * 10)).read()
+
+    def test_truncated_package(self):
+        content = rpm_package('xz')
+
+        with self.assertRaises(PackageFileError):
+            RpmPackage(self._write_package(content[:-50])).read(('sha256',))
+
+        with self.assertRaises(PackageFileError):
+            RpmPackage(self._write_package(content[:200])).read()
+
+    @parameterized.expand([
+        ('no_dir_names', [(RpmPackage.RPMTAG_DIRINDEXES, RpmHeader.TYPE_INT32, [0])]),
+        ('no_dir_indexes', [(RpmPackage.RPMTAG_DIRNAMES, RpmHeader.TYPE_STRING_ARRAY, ['/usr/bin/'])]),
+        ('missing_dir_index', [(RpmPackage.RPMTAG_DIRNAMES, RpmHeader.TYPE_STRING_ARRAY, ['/usr/bin/']),
+                               (RpmPackage.RPMTAG_DIRINDEXES, RpmHeader.TYPE_INT32, [])]),
+        ('invalid_dir_index', [(RpmPackage.RPMTAG_DIRNAMES, RpmHeader.TYPE_STRING_ARRAY, ['/usr/bin/']),
+                               (RpmPackage.RPMTAG_DIRINDEXES, RpmHeader.TYPE_INT32, [1])]),
+        ('wrong_type', [(RpmPackage.RPMTAG_DIRNAMES, RpmHeader.TYPE_STRING_ARRAY, ['/usr/bin/']),
+                        (RpmPackage.RPMTAG_DIRINDEXES, RpmHeader.TYPE_STRING_ARRAY, ['0'])]),
+    ])
+    def test_inconsistent_file_list(self, _, entries):
+        header = rpm_header([(RpmPackage.RPMTAG_NAME, RpmHeader.TYPE_STRING, 'fortune'),
+                             (RpmPackage.RPMTAG_BASENAMES, RpmHeader.TYPE_STRING_ARRAY, ['fortune'])] + entries)
+        content = RpmPackage.lead_magic + b'\x00' * (RpmPackage.lead_size - 4) + rpm_header([]) + header
+
+        with self.assertRaises(PackageFileError):
+            RpmPackage(self._write_package(content)).read()
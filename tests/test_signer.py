@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+from swid_generator.command_manager import CommandManager as CM
+from swid_generator.generators.utils import TempWorkspace
+from swid_generator.print_functions import sign_xml
+from swid_generator.signer import XmlSigner, is_available, DSIG_NS
+
+if is_available():
+    from lxml import etree
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+    from cryptography.x509 import load_der_x509_certificate
+    from cryptography.hazmat.backends import default_backend
+
+
+PKCS12_FILE = 'tests/dumps/swidgen.pfx'
+PKCS12_PASSWORD = 'Q1w2e3r4t5'
+
+
+@unittest.skipUnless(is_available(), 'lxml and cryptography are not installed')
+class XmlSignerTests(unittest.TestCase):
+
+    def setUp(self):
+        with open('tests/dumps/signature/unsigned_tag.xml', 'rb') as unsigned_file:
+            self.unsigned_tag = unsigned_file.read()
+        self.signer = XmlSigner(PKCS12_FILE, PKCS12_PASSWORD)
+
+    def test_sign_like_xmlsec1(self):
+        # Signed with libxmlsec1 from the same template and key
+        with open('tests/dumps/signature/signed_tag.xml', 'rb') as signed_file:
+            expected = signed_file.read()
+
+        assert self.signer.sign(self.unsigned_tag) == expected
+
+    def test_signature_verifies(self):
+        root = etree.fromstring(self.signer.sign(self.unsigned_tag))
+        signature = root.find('{%s}Signature' % DSIG_NS)
+
+        signed_info = signature.find('{%s}SignedInfo' % DSIG_NS)
+        digest_value = signed_info.find('{%s}Reference/{%s}DigestValue' % (DSIG_NS, DSIG_NS)).text
+        signature_value = base64.b64decode(signature.find('{%s}SignatureValue' % DSIG_NS).text)
+        certificate = signature.find('{%s}KeyInfo/{%s}X509Data/{%s}X509Certificate' % (DSIG_NS, DSIG_NS, DSIG_NS)).text
+        certificate = load_der_x509_certificate(base64.b64decode(certificate), default_backend())
+
+        certificate.public_key().verify(signature_value, etree.tostring(signed_info, method='c14n'),
+                                        padding.PKCS1v15(), hashes.SHA256())
+
+        root.remove(signature)
+        digest = hashlib.sha256(etree.tostring(root, method='c14n', exclusive=True)).digest()
+        assert base64.b64decode(digest_value) == digest
+
+    def test_wrong_password(self):
+        with self.assertRaises(ValueError):
+            XmlSigner(PKCS12_FILE, 'wrong')
+
+    def test_missing_signature_template(self):
+        with self.assertRaises(ValueError):
+            self.signer.sign(b'<SoftwareIdentity name="test" />')
+
+    def test_sign_xml_uses_signer(self):
+        signature_args = {
+            'pkcs12_file': PKCS12_FILE,
+            'pkcs12_password': PKCS12_PASSWORD,
+            'signer': self.signer
+        }
+
+        assert sign_xml(self.unsigned_tag, signature_args) == self.signer.sign(self.unsigned_tag).decode('utf-8')
+
+
+class SignXmlTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_xmlsec1_uses_workspace(self):
+        signed_paths = []
+
+        def run_command(command):
+            signed_paths.append(command[-1])
+            with open(command[-1], 'rb') as tag_file:
+                return tag_file.read().decode('utf-8')
+
+        signature_args = {
+            'pkcs12_file': PKCS12_FILE,
+            'pkcs12_password': None,
+            'signer': None
+        }
+        with patch.object(CM, 'run_command_check_output', side_effect=run_command):
+            with TempWorkspace(self.folder) as workspace:
+                assert sign_xml(b'<SoftwareIdentity />', dict(signature_args, workspace=workspace)) == '<SoftwareIdentity />'
+                assert os.path.dirname(signed_paths[0]) == workspace.get_path()
+
+            # Without the workspace of the run, a workspace is used for this tag only
+            sign_xml(b'<SoftwareIdentity />', signature_args)
+
+        assert signed_paths[1] != signed_paths[0]
+        assert not os.path.exists(signed_paths[1])
+        assert os.listdir(self.folder) == []
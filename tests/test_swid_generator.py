@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function, division, absolute_import, unicode_literals
 
+import copy
+import random
 import sys
 from functools import partial
+from xml.dom import minidom
 from xml.etree import cElementTree as ET
 
 from swid_generator.generators import swid_generator
@@ -12,7 +15,8 @@ from swid_generator.environments.common import CommonEnvironment
 from swid_generator.generators.swid_generator import _create_flat_payload_tag, _create_hierarchic_payload_tag
 from swid_generator.generators.swid_generator import software_id_matcher, package_name_matcher
 from nose_parameterized import parameterized
-from swid_generator.generators.content_creator import _sort_files
+from swid_generator.generators.content_creator import _sort_files, flat_content_events
+from swid_generator.generators.xml_writer import build_element, START, END
 
 if sys.version_info < (2, 7):
     # We need the skip decorators from unittest2 on Python 2.6.
@@ -29,10 +33,32 @@ class FileInfoMock(object):
         self.mutable = mutable
         self.full_pathname = full_pathname
         self.full_pathname_splitted = full_pathname_splitted
+        self.digests = None
 
         self.actual_full_pathname = self.full_pathname
 
 
+def _legacy_sort_files(files):
+    """
+    The former implementation of ``_sort_files``: one stable sort per path depth over padded paths.
+    """
+    longest_path_length = len(max(files, key=lambda f: len(f.full_pathname_splitted)).full_pathname_splitted) - 1
+
+    for file_info in files:
+        del file_info.full_pathname_splitted[-1]
+        path_length = len(file_info.full_pathname_splitted)
+        file_info.full_pathname_splitted.extend([''] * (longest_path_length - path_length))
+
+    for path_length in range(longest_path_length, 0, -1):
+        files.sort(key=lambda f, i=path_length: f.full_pathname_splitted[i - 1])
+    return files
+
+
+class HashEngineMock(object):
+    def hash_files(self, files):
+        return ({} for _ in files)
+
+
 class Environment(CommonEnvironment):
     executable = 'asdfasdfa_env'
     os_string = 'SomeTestOS'
@@ -173,6 +199,27 @@ class SwidGeneratorTests(unittest.TestCase):
                             file_tag.attrib['mutable']
                     assert file_tag.attrib['size'] == test[0].size
 
+    @parameterized.expand([
+        (False,),
+        (True,)
+    ])
+    def test_streaming_output(self, hierarchic):
+        expected = list(self.swid_tag_generator(full=True, hierarchic=hierarchic, hash_algorithms='sha256,sha512'))
+        streamed = list(b''.join(chunks) for chunks in self.swid_tag_generator(full=True, hierarchic=hierarchic,
+                                                                                hash_algorithms='sha256,sha512',
+                                                                                streaming=True))
+        assert streamed == expected
+
+    @parameterized.expand([
+        (False,),
+        (True,)
+    ])
+    def test_pretty_output_like_minidom(self, hierarchic):
+        tags = self.swid_tag_generator(full=True, hierarchic=hierarchic, hash_algorithms='sha256,sha512')
+        expected = [minidom.parseString(tag).toprettyxml(indent='  ', encoding='utf-8')[:-1] for tag in tags]
+        pretty = list(self.swid_tag_generator(full=True, hierarchic=hierarchic, hash_algorithms='sha256,sha512', pretty=True))
+        assert pretty == expected
+
     @parameterized.expand([
         ('cowsay', 1234, 0),
         ('cowsay', '1.0', 1),
@@ -220,6 +267,29 @@ class SwidGeneratorTests(unittest.TestCase):
         for index, path in enumerate(expected_list):
             assert sorted_files[index].full_pathname == path
 
+    def test_sort_files_like_legacy_sort(self):
+        rng = random.Random(42)
+        components = ['usr', 'lib', 'share', 'doc', 'a', 'b', '']
+        files = []
+        for index in range(500):
+            folder = [rng.choice(components) for _ in range(rng.randint(0, 6))]
+            location = '/'.join([''] + folder)
+            full_pathname = location + '/file%d' % index
+            files.append(FileInfoMock('file%d' % index, location, '0', False, full_pathname, full_pathname.split('/')[1:]))
+
+        legacy_files = _legacy_sort_files(copy.deepcopy(files))
+        sorted_files = _sort_files(list(files))
+
+        assert [f.full_pathname for f in sorted_files] == [f.full_pathname for f in legacy_files]
+
+        # Same <Directory> grouping
+        def payload(sorted_list):
+            package_info = PackageInfo('test', '1.0', sorted_list)
+            events = flat_content_events(package_info, 'sha256', HashEngineMock())
+            return ET.tostring(build_element([(START, 'Payload', [])] + list(events) + [(END, 'Payload')]))
+
+        assert payload(sorted_files) == payload(legacy_files)
+
     def test_create_flat_payload(self):
         """
         Expected flat-payload-tag:
@@ -274,3 +344,36 @@ class SwidGeneratorTests(unittest.TestCase):
         assert payload_tag[0][0][0][0][1].attrib['name'] == 'pony-smaller.cow'
         assert payload_tag[0][0][0][0][2].attrib['name'] == 'etc'
         assert payload_tag[0][0][0][0][2][0].attrib['name'] == 'copyright.txt'
+
+    def test_create_hierarchic_payload_absolute_paths(self):
+        """
+        Expected hierarchic-payload-tag:
+        <Payload>
+            <Directory root="">
+              <Directory name="usr">
+                <Directory name="bin">
+                  <File name="b" />
+                  <File name="a" />
+                </Directory>
+                <Directory name="lib">
+                  <File name="c" />
+                </Directory>
+              </Directory>
+            </Directory>
+        </Payload>
+        """
+        files = [
+            FileInfoMock('c', '/usr/lib', '1', False, '/usr/lib/c', ['usr', 'lib', 'c']),
+            FileInfoMock('b', '/usr/bin', '2', False, '/usr/bin/b', ['usr', 'bin', 'b']),
+            FileInfoMock('a', '/usr/bin', '3', False, '/usr/bin/a', ['usr', 'bin', 'a'])
+        ]
+        package_info = PackageInfo('test', '1.0', files)
+
+        payload_tag = _create_hierarchic_payload_tag(package_info, 'sha256', HashEngineMock())
+
+        assert len(payload_tag) == 1
+        assert payload_tag[0].attrib == {'root': ''}
+        assert payload_tag[0][0].attrib == {'name': 'usr'}
+        assert [tag.attrib['name'] for tag in payload_tag[0][0]] == ['bin', 'lib']
+        assert [tag.attrib['name'] for tag in payload_tag[0][0][0]] == ['b', 'a']
+        assert [tag.attrib['name'] for tag in payload_tag[0][0][1]] == ['c']
@@ -80,10 +80,12 @@ class SwidGeneratorParserTests(unittest.TestCase):
         deb_result = package_path("/tmp/docker.deb")
         rpm_result = package_path("/tmp/docker.rpm")
         pacman_result = package_path("/tmp/docker.pkg.tar.xz")
+        pacman_zstd_result = package_path("/tmp/docker.pkg.tar.zst")
 
         assert deb_result == "/tmp/docker.deb"
         assert rpm_result == "/tmp/docker.rpm"
         assert pacman_result == "/tmp/docker.pkg.tar.xz"
+        assert pacman_zstd_result == "/tmp/docker.pkg.tar.zst"
 
     def test_invalid_package_path(self):
         with self.assertRaises(ArgumentTypeError):
@@ -103,6 +105,13 @@ class SwidGeneratorParserTests(unittest.TestCase):
         result = self.parser.parse('swid --pkcs12-pwd testpwd'.split())
         assert result.password == 'testpwd'
 
+    def test_temp_dir_parameter(self):
+        result = self.parser.parse('swid --pkcs12-pwd testpwd --temp-dir /tmp'.split())
+        assert result.temp_dir == '/tmp'
+
+        result = self.parser.parse('swid'.split())
+        assert result.temp_dir is None
+
     def test_evidence_valid_arguments(self):
         result = self.parser.parse('swid --evidence /tmp/ --name test --version-string 1.0'.split())
         assert result.evidence_path == "/tmp/"
@@ -122,6 +131,85 @@ class SwidGeneratorParserTests(unittest.TestCase):
         result = regid_string(None)
         assert result is None
 
+    def test_jobs_argument(self):
+        result = self.parser.parse('swid --full --jobs 8'.split())
+        assert result.jobs == 8
+
+        result = self.parser.parse('swid --full'.split())
+        assert result.jobs == 1
+
+    def test_since_state_arguments(self):
+        result = self.parser.parse('swid --since-state state.json --changed-only --removed-list removed.json'.split())
+        assert result.since_state == 'state.json'
+        assert result.changed_only is True
+        assert result.removed_list == 'removed.json'
+
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --changed-only'.split())
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --since-state state.json --evidence /tmp'.split())
+
+    def test_targeted_arguments(self):
+        result = self.parser.parse('swid --package bash --package vim'.split())
+        assert result.package_name == ['bash', 'vim']
+        assert result.matcher.keywords == {'package_names': frozenset(['bash', 'vim'])}
+
+        result = self.parser.parse('swid --software-id strongswan.org__Debian_9-x86_64-bash-4.4'.split())
+        assert result.match_software_id == ['strongswan.org__Debian_9-x86_64-bash-4.4']
+
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --package bash --software-id strongswan.org__Debian_9-x86_64-bash-4.4'.split())
+
+        result = self.parser.parse('swid --full --targets-from -'.split())
+        assert result.targets_from == '-'
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --package bash --targets-from targets.list'.split())
+
+    def test_package_batch_arguments(self):
+        result = self.parser.parse('swid --full --package-dir /tmp --jobs 4 --package-tag-cache'.split())
+        assert result.package_dir == '/tmp'
+        assert result.package_tag_cache == settings.DEFAULT_PACKAGE_TAG_CACHE
+
+        assert result.package_tag_cache_size == settings.DEFAULT_PACKAGE_TAG_CACHE_SIZE
+        assert not result.cache_stats
+
+        result = self.parser.parse('swid --package-file-list - --package-tag-cache tags.sqlite '
+                                   '--package-tag-cache-size 50 --cache-stats'.split())
+        assert result.package_file_list == '-'
+        assert result.package_tag_cache == 'tags.sqlite'
+        assert result.package_tag_cache_size == 50
+        assert result.cache_stats
+
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --package-dir /tmp --package-file-list -'.split())
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --package-tag-cache tags.sqlite'.split())
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --package-dir /tmp --since-state state.json'.split())
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --package-dir /tmp --cache-stats'.split())
+        with self.assertRaises(ArgumentTypeError):
+            folder_path('/nonexistent/pool')
+
+    def test_evidence_walker_arguments(self):
+        result = self.parser.parse('swid --evidence /opt --exclude *.pyc --exclude var/cache --max-depth 0 '
+                                   '--one-file-system --evidence-stats'.split())
+        assert result.exclude == ['*.pyc', 'var/cache']
+        assert result.max_depth == 0
+        assert result.one_file_system is True
+        assert result.evidence_stats is True
+
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --exclude *.pyc'.split())
+        with self.assertRaises(SystemExit):
+            self.parser.parse('swid --evidence /opt --max-depth -1'.split())
+
+    def test_invalid_positive_number(self):
+        with self.assertRaises(ArgumentTypeError):
+            positive_number('0')
+        with self.assertRaises(ArgumentTypeError):
+            positive_number('many')
+
     def test_invalid_hash_string(self):
         with self.assertRaises(ArgumentTypeError):
             hash_string("sha333")
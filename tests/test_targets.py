@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import unittest
+from functools import partial
+
+from swid_generator.environments.common import CommonEnvironment
+from swid_generator.generators.swid_generator import create_swid_tags, targets_matcher
+from swid_generator.generators.targets import match_targets, resolve_targets
+from swid_generator.package_info import PackageInfo
+from swid_generator.settings import DEFAULT_ENTITY_NAME, DEFAULT_REGID
+
+
+class Environment(CommonEnvironment):
+
+    def __init__(self, packages):
+        self.packages = packages
+        self.queried_names = []
+        self.listings = 0
+
+    def get_package_list(self):
+        self.listings += 1
+        return self.packages
+
+    def get_packages_by_name(self, package_names):
+        self.queried_names.append(sorted(package_names))
+        return [package_info for package_info in self.packages if package_info.package in package_names]
+
+    @staticmethod
+    def get_os_string():
+        return 'SomeTestOS'
+
+    @staticmethod
+    def get_architecture():
+        return 'i686'
+
+
+class TargetsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.packages = [PackageInfo('cowsay', '3.03'), PackageInfo('fortune', '2.0'),
+                         PackageInfo('libc6', '2.23'), PackageInfo('libc6', '2.23')]
+        self.environment = Environment(self.packages)
+
+    def _resolve(self, package_names=(), software_ids=()):
+        return resolve_targets(self.environment, DEFAULT_REGID, 'SomeTestOS', 'i686', package_names, software_ids)
+
+    def test_package_names(self):
+        packages, unmatched = self._resolve(package_names=['fortune', 'bash', 'libc6', 'fortune'])
+
+        assert packages == [self.packages[1], self.packages[2], self.packages[3]]
+        assert unmatched == ['bash']
+        # The names are queried at once, without listing all packages
+        assert self.environment.queried_names == [['bash', 'fortune', 'libc6']]
+        assert self.environment.listings == 0
+
+    def test_software_ids(self):
+        packages, unmatched = self._resolve(software_ids=['strongswan.org__SomeTestOS-i686-fortune-2.0',
+                                                          'strongswan.org__SomeTestOS-i686-fortune-1.0',
+                                                          'strongswan.org__SomeTestOS-i686-cowsay-3.03'])
+
+        assert packages == [self.packages[1], self.packages[0]]
+        assert unmatched == ['strongswan.org__SomeTestOS-i686-fortune-1.0']
+        assert self.environment.listings == 1
+
+    def test_match_targets(self):
+        targets = ['strongswan.org__SomeTestOS-i686-cowsay-3.03', 'libc6', 'bash', 'fortune',
+                   'strongswan.org__SomeTestOS-i686-fortune-2.0', 'strongswan.org__SomeTestOS-i686-fortune-1.0']
+
+        packages, unmatched = match_targets(self.environment.get_package_list(), targets, DEFAULT_REGID,
+                                            'SomeTestOS', 'i686')
+
+        assert packages == [self.packages[0], self.packages[2], self.packages[3], self.packages[1]]
+        assert unmatched == ['bash', 'strongswan.org__SomeTestOS-i686-fortune-1.0']
+
+    def test_targets_matcher(self):
+        matcher = partial(targets_matcher, package_names=frozenset(['cowsay']),
+                          software_ids=frozenset(['strongswan.org__SomeTestOS-i686-fortune-2.0']))
+
+        swid_tags = list(create_swid_tags(self.environment, DEFAULT_ENTITY_NAME, DEFAULT_REGID, matcher=matcher))
+
+        assert len(swid_tags) == 2
+        assert b'name="cowsay"' in swid_tags[0] and b'name="fortune"' in swid_tags[1]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch
+from swid_generator import watcher
+from swid_generator.watcher import InotifyWatcher, PollWatcher, create_watcher
+
+
+def inotify_available():
+    try:
+        InotifyWatcher([]).close()
+    except (OSError, AttributeError):
+        return False
+    return True
+
+
+class WatcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.status_path = os.path.join(self.folder, 'status')
+        self.info_path = os.path.join(self.folder, 'info')
+        os.mkdir(self.info_path)
+        self._write('status', 'Package: fortune\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.folder, name), 'w') as database_file:
+            database_file.write(content)
+
+    def _replace_status(self, content):
+        # Like dpkg, the new status file is renamed over the old one
+        self._write('status-new', content)
+        os.rename(os.path.join(self.folder, 'status-new'), self.status_path)
+
+    def test_poll_watcher(self):
+        database_watcher = PollWatcher([self.status_path, self.info_path, os.path.join(self.folder, 'missing')],
+                                       interval=0.01)
+
+        assert not database_watcher.wait(0.05)
+        self._replace_status('Package: fortune\nPackage: cowsay\n')
+        assert database_watcher.wait(0.05)
+        assert not database_watcher.wait(0.05)
+        self._write('info/cowsay.list', '/usr/games/cowsay\n')
+        assert database_watcher.wait(0.05)
+
+    @unittest.skipIf(not inotify_available(), 'inotify is not available')
+    def test_inotify_watcher(self):
+        database_watcher = InotifyWatcher([self.status_path, self.info_path, '/nonexistent/status'], settle=0.01)
+        try:
+            # Other files next to a watched file are ignored
+            self._write('lock', '')
+            assert not database_watcher.wait(0.05)
+
+            self._replace_status('Package: fortune\nPackage: cowsay\n')
+            assert database_watcher.wait(0.05)
+            assert not database_watcher.wait(0.05)
+
+            self._write('info/cowsay.list', '/usr/games/cowsay\n')
+            assert database_watcher.wait(0.05)
+        finally:
+            database_watcher.close()
+
+    def test_create_watcher(self):
+        assert isinstance(create_watcher([self.status_path], use_inotify=False), PollWatcher)
+
+        with patch.object(watcher, 'InotifyWatcher', side_effect=OSError('inotify is not available')):
+            assert isinstance(create_watcher([self.status_path]), PollWatcher)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function, division, absolute_import, unicode_literals
+
+import unittest
+from xml.dom import minidom
+from xml.etree import ElementTree as ET
+
+from swid_generator.generators.xml_writer import START, END, build_element, element_events, serialize_events
+from swid_generator.generators.xml_writer import serialize_events_pretty
+from swid_generator.signature_template import SIGNATURE
+
+DSIG_NS = 'http://www.w3.org/2000/09/xmldsig#'
+
+
+def minidom_pretty(element):
+    # The former implementation of --pretty, without XML declaration and final newline
+    output = minidom.parseString(ET.tostring(element, encoding='utf-8')).toprettyxml(indent='  ', encoding='utf-8')
+    return output.split(b'\n', 1)[1][:-1]
+
+
+class XmlWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.events = [
+            (START, 'SoftwareIdentity', [('xmlns', 'http://example.org'), ('name', 'fish & chips <"1">'), ('version', '1.0'),
+                                         ('xmlns:n8060', 'http://example.org/n8060'),
+                                         ('xmlns:SHA256', 'http://www.w3.org/2001/04/xmlenc#sha256')]),
+            (START, 'Entity', [('name', 'Some\nProject'), ('role', 'tagCreator')]),
+            (END, 'Entity'),
+            (START, 'Payload', []),
+            (START, 'Directory', [('root', '/usr'), ('name', 'bin')]),
+            (START, 'File', [('name', 'grüße\t.txt'), ('size', '12'), ('SHA256:hash', 'abc')]),
+            (END, 'File'),
+            (START, 'File', [('name', 'a\r\n b > &amp;'), ('size', '1')]),
+            (END, 'File'),
+            (START, 'File', [('name', 'b'), ('n8060:mutable', 'true'), ('size', '0')]),
+            (END, 'File'),
+            (END, 'Directory'),
+            (END, 'Payload'),
+            (START, 'Evidence', []),
+            (END, 'Evidence'),
+            (END, 'SoftwareIdentity')
+        ]
+
+    def test_build_element(self):
+        element = build_element(self.events)
+
+        assert element.tag == 'SoftwareIdentity'
+        assert element.attrib['name'] == 'fish & chips <"1">'
+        assert [child.tag for child in element] == ['Entity', 'Payload', 'Evidence']
+        assert element[1][0][2].attrib['n8060:mutable'] == 'true'
+
+    def test_serialize_events_like_tostring(self):
+        expected = ET.tostring(build_element(self.events), encoding='utf-8').replace(b'\n', b'')
+
+        assert b''.join(serialize_events(self.events)) == expected
+
+    def test_serialize_events_in_chunks(self):
+        expected = ET.tostring(build_element(self.events), encoding='utf-8').replace(b'\n', b'')
+
+        chunks = list(serialize_events(self.events, chunk_size=10))
+
+        assert len(chunks) > 1
+        assert b''.join(chunks) == expected
+
+    def test_serialize_events_lazily(self):
+        def events():
+            yield (START, 'Payload', [])
+            yield (START, 'File', [('name', 'a')])
+            yield (END, 'File')
+            raise AssertionError('More events than needed for the first chunk were consumed')
+
+        chunks = serialize_events(events(), chunk_size=1)
+        assert next(chunks) == b'<Payload>'
+
+    def test_serialize_events_pretty_like_minidom(self):
+        expected = minidom_pretty(build_element(self.events))
+
+        assert b''.join(serialize_events_pretty(self.events)) == expected
+
+    def test_serialize_events_pretty_in_chunks(self):
+        expected = minidom_pretty(build_element(self.events))
+
+        chunks = list(serialize_events_pretty(self.events, chunk_size=10))
+
+        assert len(chunks) > 1
+        assert b''.join(chunks) == expected
+
+    def test_serialize_events_pretty_empty_element(self):
+        events = [(START, 'Payload', [('name', 'a')]), (END, 'Payload')]
+
+        assert b''.join(serialize_events_pretty(events)) == b'<Payload name="a"/>'
+
+    def test_element_events_with_signature_template(self):
+        ET.register_namespace('dsig', DSIG_NS)
+        element = build_element(self.events)
+        element.append(ET.fromstring(SIGNATURE))
+
+        events = list(element_events(element, {DSIG_NS: 'dsig'}))
+
+        assert events[0][2][0] == ('xmlns:dsig', DSIG_NS)
+        assert (START, 'dsig:DigestValue', []) in events
+        assert b''.join(serialize_events(events)) == ET.tostring(element, encoding='utf-8').replace(b'\n', b'')
+        assert b''.join(serialize_events_pretty(events)) == minidom_pretty(element)
+
+    def test_element_events_unknown_namespace(self):
+        element = ET.Element('{http://example.org}Tag')
+
+        with self.assertRaises(ValueError):
+            list(element_events(element))